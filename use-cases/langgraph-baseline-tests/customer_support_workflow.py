@@ -8,10 +8,26 @@ This workflow demonstrates:
 4. Final response formatting
 """
 
+import asyncio
+import atexit
+import hashlib
+import inspect
+import json
 import os
-from typing import Literal, TypedDict
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextvars import ContextVar
+from functools import lru_cache
+from itertools import islice
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Literal, TypedDict
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic, DefaultAsyncHttpxClient, DefaultHttpxClient, Timeout
+from httpx import Limits
 
 
 # State definition - this is passed through the entire workflow
@@ -24,62 +40,407 @@ class TicketState(TypedDict):
     formatted_response: str
 
 
-# Initialize Anthropic client
-def get_anthropic_client():
-    """Initialize Anthropic client with API key from environment"""
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-    return Anthropic(api_key=api_key)
+# Instrumentation: per-node wall time, time-to-first-token, tokens, cost,
+# retries and cache hits, as structured events plus aggregated histograms
+METRICS_EVENTS_PATH = os.getenv("WORKFLOW_EVENTS_PATH")    # JSONL file, one event per node run
+METRICS_PROMETHEUS_PATH = os.getenv("WORKFLOW_METRICS_PATH")  # Prometheus text, written at exit
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
 
+# USD per million (input, output) tokens
+MODEL_PRICES = {
+    "claude-sonnet-4-5-20250929": (3.00, 15.00),
+}
 
-# Node 1: Classify the ticket
-def classify_ticket(state: TicketState) -> TicketState:
+# Record of the node run in progress (set by instrument_node)
+_node_run: ContextVar[dict | None] = ContextVar("node_run", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)"""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf above the last bucket)"""
+        target = q * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= target:
+                return bound
+        return float("inf")
+
+
+class WorkflowMetrics:
     """
-    Classifies the support ticket into one of three categories:
-    - billing: Payment, invoices, subscription issues
-    - technical: Product bugs, performance, technical errors
-    - general: General inquiries, questions, feedback
+    Collects one event per node run and aggregates them per node.
+
+    Events stay in memory (last `max_events`) and, with WORKFLOW_EVENTS_PATH,
+    are appended to a JSONL file; prometheus_text() renders the aggregates.
     """
-    client = get_anthropic_client()
 
-    prompt = f"""Analyze this customer support ticket and classify it into one of these categories:
+    COUNTERS = ("llm_calls", "input_tokens", "output_tokens", "retries", "cache_hits", "errors")
+
+    def __init__(self, events_path: str = METRICS_EVENTS_PATH, max_events: int = 10000):
+        self.events_path = events_path
+        self.events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.events.clear()
+            self.duration = defaultdict(Histogram)
+            self.ttft = defaultdict(Histogram)
+            self.counters = defaultdict(lambda: dict.fromkeys(self.COUNTERS, 0))
+            self.cost = defaultdict(float)
+
+    def record(self, event: dict):
+        node = event["node"]
+        with self._lock:
+            self.events.append(event)
+            self.duration[node].observe(event["wall_seconds"])
+            if event["ttft_seconds"] is not None:
+                self.ttft[node].observe(event["ttft_seconds"])
+            counters = self.counters[node]
+            counters["llm_calls"] += event["llm_calls"]
+            counters["input_tokens"] += event["input_tokens"]
+            counters["output_tokens"] += event["output_tokens"]
+            counters["retries"] += event["retries"]
+            counters["cache_hits"] += int(event["cache_hit"])
+            counters["errors"] += int(event["status"] == "error")
+            self.cost[node] += event["cost_usd"]
+            if self.events_path:
+                with open(self.events_path, "a") as f:
+                    f.write(json.dumps(event) + "\n")
+
+    def summary(self) -> dict:
+        """Per node: runs, mean and p95 wall time, tokens and cost - which node dominates"""
+        with self._lock:
+            return {
+                node: {
+                    "runs": hist.count,
+                    "total_seconds": round(hist.sum, 4),
+                    "mean_seconds": round(hist.sum / hist.count, 4) if hist.count else 0.0,
+                    "p95_seconds_le": hist.quantile(0.95),
+                    **self.counters[node],
+                    "cost_usd": round(self.cost[node], 6),
+                }
+                for node, hist in self.duration.items()
+            }
+
+    def prometheus_text(self) -> str:
+        """Aggregates in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, histograms, help_text in (
+                ("ticket_node_duration_seconds", self.duration, "Node wall time"),
+                ("ticket_node_ttft_seconds", self.ttft, "Time to first LLM token within a node"),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for node, hist in sorted(histograms.items()):
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        lines.append(f'{name}_bucket{{node="{node}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{node="{node}",le="+Inf"}} {hist.count}')
+                    lines.append(f'{name}_sum{{node="{node}"}} {hist.sum}')
+                    lines.append(f'{name}_count{{node="{node}"}} {hist.count}')
+            for counter in self.COUNTERS:
+                name = f"ticket_node_{counter}_total"
+                lines += [f"# HELP {name} Node {counter.replace('_', ' ')}", f"# TYPE {name} counter"]
+                for node, counters in sorted(self.counters.items()):
+                    lines.append(f'{name}{{node="{node}"}} {counters[counter]}')
+            lines += ["# HELP ticket_node_cost_usd_total Estimated LLM cost",
+                      "# TYPE ticket_node_cost_usd_total counter"]
+            for node, cost in sorted(self.cost.items()):
+                lines.append(f'ticket_node_cost_usd_total{{node="{node}"}} {cost}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.prometheus_text())
+
+
+metrics = WorkflowMetrics()
+if METRICS_PROMETHEUS_PATH:
+    atexit.register(metrics.write_prometheus, METRICS_PROMETHEUS_PATH)
+
+
+def instrument_node(name: str, node):
+    """Wrap a graph node so each run emits one metrics event"""
+    takes_config = "config" in inspect.signature(node).parameters
+
+    def start(state: TicketState) -> dict:
+        return {"ticket_id": state.get("ticket_id"), "node": name, "status": "ok",
+                "started": time.perf_counter(), "ttft_seconds": None, "llm_calls": 0,
+                "http_requests": 0, "input_tokens": 0, "output_tokens": 0, "cache_hit": False}
+
+    def finish(run: dict):
+        input_price, output_price = MODEL_PRICES.get(MODEL, (0.0, 0.0))
+        started = run.pop("started")
+        run["retries"] = max(0, run.pop("http_requests") - run["llm_calls"])
+        run["wall_seconds"] = time.perf_counter() - started
+        run["cost_usd"] = (run["input_tokens"] * input_price + run["output_tokens"] * output_price) / 1e6
+        run["ts"] = time.time()
+        metrics.record(run)
+
+    if asyncio.iscoroutinefunction(node):
+        async def instrumented(state: TicketState, config: RunnableConfig) -> TicketState:
+            run = start(state)
+            token = _node_run.set(run)
+            try:
+                return await (node(state, config) if takes_config else node(state))
+            except Exception:
+                run["status"] = "error"
+                raise
+            finally:
+                _node_run.reset(token)
+                finish(run)
+    else:
+        def instrumented(state: TicketState, config: RunnableConfig) -> TicketState:
+            run = start(state)
+            token = _node_run.set(run)
+            try:
+                return node(state, config) if takes_config else node(state)
+            except Exception:
+                run["status"] = "error"
+                raise
+            finally:
+                _node_run.reset(token)
+                finish(run)
+
+    instrumented.__name__ = node.__name__
+    instrumented.__doc__ = node.__doc__
+    return instrumented
+
+
+def record_llm_call(message, started: float, first_token_at: float = None):
+    """Add one LLM call's usage and time-to-first-token to the running node's event"""
+    run = _node_run.get()
+    if run is None:
+        return
+    run["llm_calls"] += 1
+    usage = getattr(message, "usage", None)
+    if usage is not None:
+        run["input_tokens"] += usage.input_tokens
+        run["output_tokens"] += usage.output_tokens
+    if run["ttft_seconds"] is None:
+        # Without streaming the first token arrives with the whole response
+        run["ttft_seconds"] = (first_token_at or time.perf_counter()) - started
+
+
+def record_cache_hit():
+    run = _node_run.get()
+    if run is not None:
+        run["cache_hit"] = True
+
+
+# HTTP request hooks on the shared clients: requests beyond one per LLM call are SDK retries
+def _count_http_request(request):
+    run = _node_run.get()
+    if run is not None:
+        run["http_requests"] += 1
+
+
+async def _acount_http_request(request):
+    _count_http_request(request)
+
+
+# Connection pool settings (override via environment)
+MAX_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("ANTHROPIC_KEEPALIVE_EXPIRY", "60"))
+REQUEST_TIMEOUT = float(os.getenv("ANTHROPIC_REQUEST_TIMEOUT", "60"))
+CONNECT_TIMEOUT = float(os.getenv("ANTHROPIC_CONNECT_TIMEOUT", "5"))
+MAX_RETRIES = int(os.getenv("ANTHROPIC_MAX_RETRIES", "2"))
+
+
+class AnthropicClientManager:
+    """
+    Process-wide Anthropic client shared by all workflow nodes.
+
+    Creating a client per node call opens a new connection pool, so every
+    ticket paid a TCP + TLS handshake per LLM call. One client with keep-alive
+    reuses warm connections across nodes and tickets.
+
+    The async nodes get an AsyncAnthropic client with the same settings, one
+    per event loop (async connections cannot move between loops).
+    """
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS,
+                 max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry: float = KEEPALIVE_EXPIRY,
+                 timeout: float = REQUEST_TIMEOUT,
+                 connect_timeout: float = CONNECT_TIMEOUT,
+                 max_retries: int = MAX_RETRIES):
+        self._client = None
+        self._pid = None
+        self._async_client = None
+        self._async_loop = None
+        self._lock = threading.Lock()
+        self._apply(max_connections, max_keepalive_connections, keepalive_expiry,
+                    timeout, connect_timeout, max_retries)
+
+    def _apply(self, max_connections, max_keepalive_connections, keepalive_expiry,
+               timeout, connect_timeout, max_retries):
+        self.limits = Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+
+    @staticmethod
+    def _api_key() -> str:
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+        return api_key
+
+    def get_client(self) -> Anthropic:
+        """Shared client, created on first use (thread-safe)"""
+        # A forked worker must not reuse the parent's sockets
+        if self._client is not None and self._pid == os.getpid():
+            return self._client
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                self._client = Anthropic(
+                    api_key=self._api_key(),
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=DefaultHttpxClient(
+                        limits=self.limits, event_hooks={"request": [_count_http_request]}),
+                )
+                self._pid = os.getpid()
+            return self._client
+
+    def get_async_client(self) -> AsyncAnthropic:
+        """Shared async client for the running event loop, created on first use (thread-safe)"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is not None and self._async_loop is loop:
+            return self._async_client
+        with self._lock:
+            if self._async_client is None or self._async_loop is not loop:
+                self._discard_async_client()
+                self._async_client = AsyncAnthropic(
+                    api_key=self._api_key(),
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=DefaultAsyncHttpxClient(
+                        limits=self.limits, event_hooks={"request": [_acount_http_request]}),
+                )
+                self._async_loop = loop
+            return self._async_client
+
+    def has_async_client(self) -> bool:
+        """Whether the running event loop already has its async client"""
+        return self._async_client is not None and self._async_loop is asyncio.get_running_loop()
+
+    def _discard_async_client(self):
+        """Drop the async client, closing it on its own loop (caller holds the lock)"""
+        client, loop = self._async_client, self._async_loop
+        self._async_client = None
+        self._async_loop = None
+        # Its connections belong to its loop: close there while the loop still
+        # runs. Once a loop has ended nothing can await the close - aclose()
+        # before the loop ends (aprocess_tickets does) to avoid that case.
+        if client is not None and loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.close(), loop)
+
+    async def aclose(self):
+        """Close the async client's connections (call before the event loop ends)"""
+        with self._lock:
+            if not self.has_async_client():
+                return
+            client = self._async_client
+            self._async_client = None
+            self._async_loop = None
+        await client.close()
+
+    def configure(self, max_connections: int = MAX_CONNECTIONS,
+                  max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+                  keepalive_expiry: float = KEEPALIVE_EXPIRY,
+                  timeout: float = REQUEST_TIMEOUT,
+                  connect_timeout: float = CONNECT_TIMEOUT,
+                  max_retries: int = MAX_RETRIES):
+        """Change pool settings (same arguments as __init__); the next call reconnects"""
+        with self._lock:
+            self._apply(max_connections, max_keepalive_connections, keepalive_expiry,
+                        timeout, connect_timeout, max_retries)
+            self._close_client()
+            self._discard_async_client()
+
+    def _close_client(self):
+        """Close the sync client's connections (caller holds the lock)"""
+        if self._client is not None and self._pid == os.getpid():
+            self._client.close()
+        self._client = None
+        self._pid = None
+
+    def close(self):
+        """Close pooled connections (also registered at interpreter exit)"""
+        with self._lock:
+            self._close_client()
+
+
+client_manager = AnthropicClientManager()
+atexit.register(client_manager.close)
+
+
+# Get the shared Anthropic client
+def get_anthropic_client():
+    """Shared Anthropic client with API key from environment (pooled connections)"""
+    return client_manager.get_client()
+
+
+def get_async_anthropic_client():
+    """Shared AsyncAnthropic client for the running event loop"""
+    return client_manager.get_async_client()
+
+
+# Model and prompts shared by the sync and async nodes
+MODEL = "claude-sonnet-4-5-20250929"
+CLASSIFY_MAX_TOKENS = 50
+HANDLER_MAX_TOKENS = 500
+CATEGORIES = ["billing", "technical", "general"]
+
+
+def classification_prompt(ticket_content: str) -> str:
+    """Prompt asking for the ticket category only"""
+    return f"""Analyze this customer support ticket and classify it into one of these categories:
 - billing: For payment, invoices, refunds, subscription issues
 - technical: For bugs, errors, performance issues, technical problems
 - general: For general questions, feedback, or other inquiries
 
-Ticket content: {state['ticket_content']}
+Ticket content: {ticket_content}
 
 Respond with ONLY the category name (billing, technical, or general), nothing else."""
 
-    message = client.messages.create(
-        model="claude-sonnet-4-5-20250929",
-        max_tokens=50,
-        messages=[
-            {"role": "user", "content": prompt}
-        ]
-    )
 
-    classification = message.content[0].text.strip().lower()
+def parse_classification(text: str) -> str:
+    """Normalize the model's answer to a valid category"""
+    classification = text.strip().lower()
 
     # Ensure classification is valid
-    if classification not in ["billing", "technical", "general"]:
+    if classification not in CATEGORIES:
         classification = "general"  # Default fallback
 
-    state["classification"] = classification
-    print(f"[CLASSIFY] Ticket {state['ticket_id']} classified as: {classification}")
-
-    return state
-
+    return classification
 
-# Node 2a: Handle billing tickets
-def handle_billing(state: TicketState) -> TicketState:
-    """Generates a response for billing-related tickets"""
-    client = get_anthropic_client()
 
-    prompt = f"""You are a billing support specialist. A customer has submitted this billing inquiry:
+HANDLER_PROMPTS = {
+    "billing": """You are a billing support specialist. A customer has submitted this billing inquiry:
 
-{state['ticket_content']}
+{ticket_content}
 
 Provide a helpful, professional response that:
 1. Acknowledges their concern
@@ -87,88 +448,427 @@ Provide a helpful, professional response that:
 3. Offers next steps or solutions
 4. Mentions escalation to the billing team if needed
 
-Keep the response concise (2-3 paragraphs)."""
+Keep the response concise (2-3 paragraphs).""",
+    "technical": """You are a technical support specialist. A customer has reported this technical issue:
 
-    message = client.messages.create(
-        model="claude-sonnet-4-5-20250929",
-        max_tokens=500,
-        messages=[
-            {"role": "user", "content": prompt}
-        ]
-    )
+{ticket_content}
 
-    state["handler_response"] = message.content[0].text.strip()
-    print(f"[BILLING HANDLER] Generated response for ticket {state['ticket_id']}")
+Provide a helpful, professional response that:
+1. Acknowledges the technical issue
+2. Suggests troubleshooting steps or workarounds
+3. Asks for additional information if needed (error logs, screenshots, etc.)
+4. Sets expectations for resolution timeline
+
+Keep the response concise (2-3 paragraphs).""",
+    "general": """You are a customer support representative. A customer has submitted this general inquiry:
+
+{ticket_content}
+
+Provide a helpful, professional response that:
+1. Acknowledges their message
+2. Answers their questions or provides relevant information
+3. Offers additional resources or assistance
+4. Thanks them for reaching out
+
+Keep the response concise (2-3 paragraphs).""",
+}
+
+
+# Fused mode: classification and response from one call (override via environment)
+FUSED_MODE = os.getenv("TICKET_FUSED_MODE", "").lower() in ("1", "true", "yes")
+FUSED_MAX_TOKENS = CLASSIFY_MAX_TOKENS + HANDLER_MAX_TOKENS
+
+# Structured output: the model must answer through this tool
+FUSED_TOOL = {
+    "name": "ticket_response",
+    "description": "Record the ticket category and the response to send to the customer",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "category": {"type": "string", "enum": CATEGORIES},
+            "response": {"type": "string", "description": "Response to the customer (2-3 paragraphs)"},
+        },
+        "required": ["category", "response"],
+    },
+}
+FUSED_TOOL_CHOICE = {"type": "tool", "name": FUSED_TOOL["name"]}
+
+
+def fused_prompt(ticket_content: str) -> str:
+    """Prompt asking for the category and the response in one ticket_response call"""
+    return f"""Analyze this customer support ticket, classify it into one of these categories and write the response:
+- billing: For payment, invoices, refunds, subscription issues
+- technical: For bugs, errors, performance issues, technical problems
+- general: For general questions, feedback, or other inquiries
+
+Ticket content: {ticket_content}
+
+Write a helpful, professional response as the matching specialist:
+- billing: acknowledge the concern, explain the relevant billing process, offer next steps or solutions, mention escalation to the billing team if needed
+- technical: acknowledge the issue, suggest troubleshooting steps or workarounds, ask for additional information if needed (error logs, screenshots, etc.), set expectations for the resolution timeline
+- general: acknowledge the message, answer their questions or provide relevant information, offer additional resources or assistance, thank them for reaching out
+
+Keep the response concise (2-3 paragraphs). Record the category and the response with the ticket_response tool."""
+
+
+def parse_fused_response(message) -> tuple[str, str, str]:
+    """
+    (category, response, raw category) from the ticket_response tool call.
+
+    The category is normalized like parse_classification; the response is
+    empty when the call did not produce one (the handler then writes it).
+    """
+    for block in message.content:
+        if getattr(block, "type", None) == "tool_use" and block.name == FUSED_TOOL["name"]:
+            raw = str(block.input.get("category", ""))
+            return parse_classification(raw), str(block.input.get("response", "")).strip(), raw
+    return parse_classification(""), "", ""
+
+
+# Classification cache settings (override via environment; size 0 disables)
+CLASSIFICATION_CACHE_SIZE = int(os.getenv("CLASSIFICATION_CACHE_SIZE", "10000"))
+CLASSIFICATION_CACHE_TTL = float(os.getenv("CLASSIFICATION_CACHE_TTL", "86400"))
+CLASSIFICATION_CACHE_PATH = os.getenv("CLASSIFICATION_CACHE_PATH")  # SQLite file for the disk tier
 
+
+def normalize_ticket(ticket_content: str) -> str:
+    """
+    Cache key text: lower-case words with numbers masked.
+
+    "Charged TWICE for order #4471!" and "charged twice for order 9120" are
+    the same request for classification purposes.
+    """
+    text = re.sub(r"\d+", "0", ticket_content.lower())
+    return " ".join(re.findall(r"\w+", text))
+
+
+class ClassificationCache:
+    """
+    Ticket classifications keyed on normalized content: in-memory LRU plus an
+    optional SQLite tier that survives restarts and is shared by workers.
+
+    Entries expire after `ttl` seconds so prompt or policy changes age out.
+    Thread-safe (process_tickets runs nodes on a thread pool).
+    """
+
+    def __init__(self, max_size: int = CLASSIFICATION_CACHE_SIZE,
+                 ttl: float = CLASSIFICATION_CACHE_TTL, path: str = CLASSIFICATION_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()  # key -> (classification, expires_at)
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS classifications "
+                             "(key TEXT PRIMARY KEY, classification TEXT, expires_at REAL)")
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def key(ticket_content: str) -> str:
+        return hashlib.sha256(normalize_ticket(ticket_content).encode()).hexdigest()
+
+    def get(self, ticket_content: str) -> str | None:
+        """Cached classification, or None on a miss"""
+        if not self.enabled:
+            return None
+        key = self.key(ticket_content)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+                self.expired += 1
+
+            if self._db is not None:
+                row = self._db.execute("SELECT classification, expires_at FROM classifications "
+                                       "WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+                if row is not None:
+                    self.expired += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, ticket_content: str, classification: str):
+        if not self.enabled:
+            return
+        key = self.key(ticket_content)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, classification, expires_at)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO classifications VALUES (?, ?, ?)",
+                                 (key, classification, expires_at))
+                self._db.commit()
+
+    def _remember(self, key: str, classification: str, expires_at: float):
+        self._entries[key] = (classification, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries (both tiers) and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = self.expired = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM classifications")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and hit rate (one consistent snapshot)"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "size": len(self._entries),
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+classification_cache = ClassificationCache()
+
+
+def cache_classification(ticket_content: str, answer: str):
+    """Cache the model's answer if it was a valid category (not the fallback)"""
+    if answer.strip().lower() in CATEGORIES:
+        classification_cache.put(ticket_content, answer.strip().lower())
+
+
+# Local pre-classifier: clear billing/technical tickets skip the LLM call
+PRECLASSIFIER_THRESHOLD = float(os.getenv("PRECLASSIFIER_THRESHOLD", "0.75"))  # > 1 disables
+PRECLASSIFIER_MIN_MATCHES = int(os.getenv("PRECLASSIFIER_MIN_MATCHES", "2"))  # rules of the winning category
+
+# Weighted keyword rules; "general" has none: it is what the LLM decides
+# when nothing specific stands out
+PRECLASSIFIER_RULES = {
+    "billing": {
+        r"\brefund": 3.0, r"\b(?:over|double[- ]?)?charged\b|\bovercharg|\bdouble charg": 3.0,
+        r"\binvoice": 3.0, r"\bbill(?:ing|ed)\b": 3.0, r"\bbills?\b": 2.0, r"\bpayments?\b": 2.0,
+        r"\bcredit card": 2.0, r"\breceipt": 2.0, r"\bvat\b": 2.0, r"\bsubscription": 1.5,
+        r"\bpaid\b": 1.5, r"\bpric(?:e|es|ing)\b": 1.0,
+    },
+    "technical": {
+        r"\berror code": 3.0, r"\bcrash": 3.0, r"\bbugs?\b": 3.0, r"\boutages?\b": 3.0,
+        r"\bstack ?trace": 3.0, r"\berrors?\b": 2.5, r"\bexceptions?\b": 2.5,
+        r"\btime ?outs?\b|\btimed out\b": 2.5, r"\bfreez|\bfroze": 2.5,
+        r"\bnot working|\bdoesn.t work|\bdoes not work": 2.0, r"\bapi\b": 1.5, r"\bslow": 1.5,
+    },
+}
+
+
+class KeywordPreClassifier:
+    """
+    Weighted keyword scores per category; confident tickets skip the LLM.
+
+    confidence = best score / (sum of scores + smoothing), and at least
+    min_matches rules of the winning category must match: a single keyword
+    ("fully charged" phone, "bug bounty") or keywords of two categories go
+    to the LLM.
+    Counts fast-path tickets and LLM fallbacks; classify_ticket reports its
+    LLM latency so report() can estimate the time saved.
+    """
+
+    def __init__(self, rules: dict = PRECLASSIFIER_RULES,
+                 threshold: float = PRECLASSIFIER_THRESHOLD, smoothing: float = 1.0,
+                 min_matches: int = PRECLASSIFIER_MIN_MATCHES):
+        self.rules = {category: [(re.compile(pattern), weight) for pattern, weight in patterns.items()]
+                      for category, patterns in rules.items()}
+        self.threshold = threshold
+        self.smoothing = smoothing
+        self.min_matches = min_matches
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.fallback = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+    def matches(self, ticket_content: str) -> dict:
+        """Weights of the matching rules, per category"""
+        text = ticket_content.lower()
+        return {category: [weight for pattern, weight in patterns if pattern.search(text)]
+                for category, patterns in self.rules.items()}
+
+    def scores(self, ticket_content: str) -> dict:
+        return {category: sum(weights) for category, weights in self.matches(ticket_content).items()}
+
+    def predict(self, ticket_content: str) -> tuple[str | None, float]:
+        """(category, confidence), category None when below the threshold or too few rules matched"""
+        matched = self.matches(ticket_content)
+        scores = {category: sum(weights) for category, weights in matched.items()}
+        category = max(scores, key=scores.get)
+        confidence = scores[category] / (sum(scores.values()) + self.smoothing)
+        with self._lock:
+            if confidence >= self.threshold and len(matched[category]) >= self.min_matches:
+                self.fast_path += 1
+                return category, confidence
+            self.fallback += 1
+        return None, confidence
+
+    def record_llm_latency(self, seconds: float):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+
+    def reset(self):
+        with self._lock:
+            self.fast_path = self.fallback = self.llm_calls = 0
+            self.llm_seconds = 0.0
+
+    def report(self) -> dict:
+        """Tickets decided locally and the LLM time they saved (at the average LLM latency)"""
+        tickets = self.fast_path + self.fallback
+        avg_llm = self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+        return {
+            "tickets": tickets,
+            "fast_path": self.fast_path,
+            "llm_fallback": self.fallback,
+            "fast_path_rate": self.fast_path / tickets if tickets else 0.0,
+            "avg_llm_classify_seconds": avg_llm,
+            "estimated_seconds_saved": self.fast_path * avg_llm,
+        }
+
+
+preclassifier = KeywordPreClassifier()
+
+
+# Node 0: Local pre-classification
+def preclassify_ticket(state: TicketState) -> TicketState:
+    """Sets the classification when the keyword rules are confident, else leaves it empty"""
+    category, confidence = preclassifier.predict(state['ticket_content'])
+    if category is not None:
+        state["classification"] = category
+        print(f"[PRECLASSIFY] Ticket {state['ticket_id']} classified as: {category} "
+              f"(local, confidence {confidence:.2f})")
+    else:
+        print(f"[PRECLASSIFY] Ticket {state['ticket_id']} ambiguous "
+              f"(confidence {confidence:.2f}), using LLM")
     return state
 
 
-# Node 2b: Handle technical tickets
-def handle_technical(state: TicketState) -> TicketState:
-    """Generates a response for technical support tickets"""
-    client = get_anthropic_client()
+async def apreclassify_ticket(state: TicketState) -> TicketState:
+    """Async variant of preclassify_ticket (no I/O)"""
+    return preclassify_ticket(state)
 
-    prompt = f"""You are a technical support specialist. A customer has reported this technical issue:
 
-{state['ticket_content']}
+def apply_cached_classification(state: TicketState) -> bool:
+    """Set the classification from classification_cache; True on a hit"""
+    cached = classification_cache.get(state['ticket_content'])
+    if cached is None:
+        return False
+    record_cache_hit()
+    state["classification"] = cached
+    print(f"[CLASSIFY] Ticket {state['ticket_id']} classified as: {cached} (cached)")
+    return True
 
-Provide a helpful, professional response that:
-1. Acknowledges the technical issue
-2. Suggests troubleshooting steps or workarounds
-3. Asks for additional information if needed (error logs, screenshots, etc.)
-4. Sets expectations for resolution timeline
 
-Keep the response concise (2-3 paragraphs)."""
+# Node 1: Classify the ticket
+def classify_ticket(state: TicketState) -> TicketState:
+    """
+    Classifies the support ticket into one of three categories:
+    - billing: Payment, invoices, subscription issues
+    - technical: Product bugs, performance, technical errors
+    - general: General inquiries, questions, feedback
+
+    Repeated tickets are answered from classification_cache without a model call.
+    """
+    if apply_cached_classification(state):
+        return state
+
+    client = get_anthropic_client()
 
+    start = time.perf_counter()
     message = client.messages.create(
-        model="claude-sonnet-4-5-20250929",
-        max_tokens=500,
+        model=MODEL,
+        max_tokens=CLASSIFY_MAX_TOKENS,
         messages=[
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": classification_prompt(state['ticket_content'])}
         ]
     )
+    preclassifier.record_llm_latency(time.perf_counter() - start)
+    record_llm_call(message, start)
 
-    state["handler_response"] = message.content[0].text.strip()
-    print(f"[TECHNICAL HANDLER] Generated response for ticket {state['ticket_id']}")
-
-    return state
+    classification = parse_classification(message.content[0].text)
+    cache_classification(state['ticket_content'], message.content[0].text)
 
+    state["classification"] = classification
+    print(f"[CLASSIFY] Ticket {state['ticket_id']} classified as: {classification}")
 
-# Node 2c: Handle general tickets
-def handle_general(state: TicketState) -> TicketState:
-    """Generates a response for general inquiry tickets"""
-    client = get_anthropic_client()
+    return state
 
-    prompt = f"""You are a customer support representative. A customer has submitted this general inquiry:
 
-{state['ticket_content']}
+# Node 1 (fused mode): Classify the ticket and draft the response in one call
+def classify_respond_ticket(state: TicketState) -> TicketState:
+    """
+    Fused mode: one structured-output call returns the category and the
+    response, so the handler routed to next makes no LLM call of its own.
 
-Provide a helpful, professional response that:
-1. Acknowledges their message
-2. Answers their questions or provides relevant information
-3. Offers additional resources or assistance
-4. Thanks them for reaching out
+    Cached classifications skip the call; the handler then writes the response.
+    """
+    if apply_cached_classification(state):
+        return state
 
-Keep the response concise (2-3 paragraphs)."""
+    client = get_anthropic_client()
 
+    start = time.perf_counter()
     message = client.messages.create(
-        model="claude-sonnet-4-5-20250929",
-        max_tokens=500,
+        model=MODEL,
+        max_tokens=FUSED_MAX_TOKENS,
+        tools=[FUSED_TOOL],
+        tool_choice=FUSED_TOOL_CHOICE,
         messages=[
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": fused_prompt(state['ticket_content'])}
         ]
     )
+    preclassifier.record_llm_latency(time.perf_counter() - start)
+    record_llm_call(message, start)
+
+    return apply_fused_response(state, message)
 
-    state["handler_response"] = message.content[0].text.strip()
-    print(f"[GENERAL HANDLER] Generated response for ticket {state['ticket_id']}")
+
+def apply_fused_response(state: TicketState, message) -> TicketState:
+    classification, response, raw = parse_fused_response(message)
+    cache_classification(state['ticket_content'], raw)
+
+    state["classification"] = classification
+    state["handler_response"] = response
+    print(f"[CLASSIFY+RESPOND] Ticket {state['ticket_id']} classified as: {classification}"
+          f"{'' if response else ' (no response drafted)'}")
 
     return state
 
 
-# Node 3: Format the final response
-def format_response(state: TicketState) -> TicketState:
-    """Formats the final response with professional email template"""
-    formatted = f"""
+# Streaming: with {"configurable": {"stream_tokens": True}} the handler writes the
+# response header, then each generated text delta, to LangGraph's "custom"
+# stream; format_response writes the footer (see stream_ticket)
+def stream_tokens_enabled(config: RunnableConfig = None) -> bool:
+    return bool((config or {}).get("configurable", {}).get("stream_tokens"))
+
+
+def response_header(state: TicketState) -> str:
+    """Formatted response up to the handler text"""
+    return f"""
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 CUSTOMER SUPPORT RESPONSE
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -178,7 +878,12 @@ Category: {state['classification'].upper()}
 
 Dear Valued Customer,
 
-{state['handler_response']}
+"""
+
+
+def response_footer(state: TicketState) -> str:
+    """Formatted response after the handler text"""
+    return f"""
 
 Best regards,
 Customer Support Team
@@ -187,12 +892,281 @@ Support Ticket: {state['ticket_id']}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 """
 
+
+class StrippedTextWriter:
+    """
+    Forwards text deltas with leading and trailing whitespace held back, so
+    the streamed text matches the stored, .strip()-ed handler_response.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.started = False
+        self.pending = ""
+
+    def __call__(self, text: str):
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return
+            self.started = True
+        body = text.rstrip()
+        if body:
+            self.writer(self.pending + body)
+            self.pending = text[len(body):]
+        else:
+            self.pending += text
+
+
+def drafted_handler_response(state: TicketState, config: RunnableConfig = None) -> str:
+    """Response already drafted by classify_respond_ticket (no LLM call)"""
+    if stream_tokens_enabled(config):
+        get_stream_writer()(response_header(state) + state['handler_response'])
+    return state['handler_response']
+
+
+def generate_handler_response(category: str, state: TicketState, config: RunnableConfig = None) -> str:
+    """Handler LLM call; streams header + tokens when the run asks for it"""
+    if state['handler_response']:
+        return drafted_handler_response(state, config)
+
+    client = get_anthropic_client()
+    messages = [
+        {"role": "user", "content": HANDLER_PROMPTS[category].format(ticket_content=state['ticket_content'])}
+    ]
+
+    started = time.perf_counter()
+    if not stream_tokens_enabled(config):
+        message = client.messages.create(model=MODEL, max_tokens=HANDLER_MAX_TOKENS, messages=messages)
+        record_llm_call(message, started)
+        return message.content[0].text.strip()
+
+    writer = get_stream_writer()
+    writer(response_header(state))
+    write_text = StrippedTextWriter(writer)
+    first_token_at = None
+    with client.messages.stream(model=MODEL, max_tokens=HANDLER_MAX_TOKENS, messages=messages) as stream:
+        for text in stream.text_stream:
+            first_token_at = first_token_at or time.perf_counter()
+            write_text(text)
+        message = stream.get_final_message()
+    record_llm_call(message, started, first_token_at)
+    return message.content[0].text.strip()
+
+
+# Node 2a: Handle billing tickets
+def handle_billing(state: TicketState, config: RunnableConfig = None) -> TicketState:
+    """Generates a response for billing-related tickets"""
+    state["handler_response"] = generate_handler_response("billing", state, config)
+    print(f"[BILLING HANDLER] Generated response for ticket {state['ticket_id']}")
+
+    return state
+
+
+# Node 2b: Handle technical tickets
+def handle_technical(state: TicketState, config: RunnableConfig = None) -> TicketState:
+    """Generates a response for technical support tickets"""
+    state["handler_response"] = generate_handler_response("technical", state, config)
+    print(f"[TECHNICAL HANDLER] Generated response for ticket {state['ticket_id']}")
+
+    return state
+
+
+# Node 2c: Handle general tickets
+def handle_general(state: TicketState, config: RunnableConfig = None) -> TicketState:
+    """Generates a response for general inquiry tickets"""
+    state["handler_response"] = generate_handler_response("general", state, config)
+    print(f"[GENERAL HANDLER] Generated response for ticket {state['ticket_id']}")
+
+    return state
+
+
+# Node 3: Format the final response
+def format_response(state: TicketState, config: RunnableConfig = None) -> TicketState:
+    """Formats the final response with professional email template"""
+    formatted = response_header(state) + state['handler_response'] + response_footer(state)
+
+    # Header and handler text were already streamed by the handler
+    if stream_tokens_enabled(config):
+        get_stream_writer()(response_footer(state))
+
     state["formatted_response"] = formatted
     print(f"[FORMAT] Formatted final response for ticket {state['ticket_id']}")
 
     return state
 
 
+# Rate limiting for async runs: token buckets for requests and tokens per minute
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` / 60 per second.
+
+    Single event loop only: acquire() checks and takes tokens without an
+    await in between, so no lock is needed.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        """Wait until `amount` tokens are available, then take them"""
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Take (or give back, if negative) tokens without waiting"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits for LLM calls.
+
+    A call reserves its estimated tokens (prompt ~4 chars/token + max_tokens)
+    up front; settle() then corrects the bucket with the real usage.
+    """
+
+    def __init__(self, requests_per_minute: float = None, tokens_per_minute: float = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    @staticmethod
+    def estimate_tokens(prompt: str, max_tokens: int) -> int:
+        return len(prompt) // 4 + max_tokens
+
+    async def acquire(self, estimated_tokens: int):
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens:
+            await self.tokens.acquire(estimated_tokens)
+
+    def settle(self, estimated_tokens: int, used_tokens: int):
+        if self.tokens:
+            self.tokens.adjust(used_tokens - estimated_tokens)
+
+
+async def acreate_message(prompt: str, max_tokens: int, config: RunnableConfig = None,
+                          on_text=None, **params):
+    """
+    client.messages.create on the async client, through the run's rate limiter.
+
+    With on_text, the message is streamed and on_text receives each text delta.
+    Extra params (tools, tool_choice) are passed to the API unchanged.
+    """
+    limiter = (config or {}).get("configurable", {}).get("rate_limiter")
+    estimated = RateLimiter.estimate_tokens(prompt, max_tokens)
+    if limiter:
+        await limiter.acquire(estimated)
+
+    client = get_async_anthropic_client()
+    messages = [
+        {"role": "user", "content": prompt}
+    ]
+    started = time.perf_counter()
+    first_token_at = None
+    if on_text is None:
+        message = await client.messages.create(model=MODEL, max_tokens=max_tokens, messages=messages,
+                                               **params)
+    else:
+        async with client.messages.stream(model=MODEL, max_tokens=max_tokens, messages=messages,
+                                          **params) as stream:
+            async for text in stream.text_stream:
+                first_token_at = first_token_at or time.perf_counter()
+                on_text(text)
+            message = await stream.get_final_message()
+    record_llm_call(message, started, first_token_at)
+
+    usage = getattr(message, "usage", None)
+    if limiter and usage is not None:
+        limiter.settle(estimated, usage.input_tokens + usage.output_tokens)
+    return message
+
+
+# Async nodes: same prompts and state updates as the sync nodes
+async def aclassify_ticket(state: TicketState, config: RunnableConfig) -> TicketState:
+    """Async variant of classify_ticket"""
+    if apply_cached_classification(state):
+        return state
+
+    start = time.perf_counter()
+    message = await acreate_message(classification_prompt(state['ticket_content']),
+                                    CLASSIFY_MAX_TOKENS, config)
+    preclassifier.record_llm_latency(time.perf_counter() - start)
+    classification = parse_classification(message.content[0].text)
+    cache_classification(state['ticket_content'], message.content[0].text)
+
+    state["classification"] = classification
+    print(f"[CLASSIFY] Ticket {state['ticket_id']} classified as: {classification}")
+
+    return state
+
+
+async def aclassify_respond_ticket(state: TicketState, config: RunnableConfig) -> TicketState:
+    """Async variant of classify_respond_ticket"""
+    if apply_cached_classification(state):
+        return state
+
+    start = time.perf_counter()
+    message = await acreate_message(fused_prompt(state['ticket_content']), FUSED_MAX_TOKENS, config,
+                                    tools=[FUSED_TOOL], tool_choice=FUSED_TOOL_CHOICE)
+    preclassifier.record_llm_latency(time.perf_counter() - start)
+    return apply_fused_response(state, message)
+
+
+async def _ahandle(category: str, state: TicketState, config: RunnableConfig) -> TicketState:
+    if state['handler_response']:
+        drafted_handler_response(state, config)
+        print(f"[{category.upper()} HANDLER] Using drafted response for ticket {state['ticket_id']}")
+        return state
+
+    prompt = HANDLER_PROMPTS[category].format(ticket_content=state['ticket_content'])
+    on_text = None
+    if stream_tokens_enabled(config):
+        writer = get_stream_writer()
+        writer(response_header(state))
+        on_text = StrippedTextWriter(writer)
+    message = await acreate_message(prompt, HANDLER_MAX_TOKENS, config, on_text)
+
+    state["handler_response"] = message.content[0].text.strip()
+    print(f"[{category.upper()} HANDLER] Generated response for ticket {state['ticket_id']}")
+
+    return state
+
+
+async def ahandle_billing(state: TicketState, config: RunnableConfig) -> TicketState:
+    """Async variant of handle_billing"""
+    return await _ahandle("billing", state, config)
+
+
+async def ahandle_technical(state: TicketState, config: RunnableConfig) -> TicketState:
+    """Async variant of handle_technical"""
+    return await _ahandle("technical", state, config)
+
+
+async def ahandle_general(state: TicketState, config: RunnableConfig) -> TicketState:
+    """Async variant of handle_general"""
+    return await _ahandle("general", state, config)
+
+
+async def aformat_response(state: TicketState, config: RunnableConfig) -> TicketState:
+    """Async variant of format_response (no I/O, shares its template)"""
+    return format_response(state, config)
+
+
 # Routing function: decides which handler to use based on classification
 def route_ticket(state: TicketState) -> Literal["billing", "technical", "general"]:
     """
@@ -204,30 +1178,73 @@ def route_ticket(state: TicketState) -> Literal["billing", "technical", "general
     return classification
 
 
+# Routing after pre-classification: handler if decided locally, else the LLM
+def route_preclassified(state: TicketState) -> Literal["billing", "technical", "general", "classify"]:
+    """Routes like route_ticket once classified; unclassified tickets go to classify"""
+    if state["classification"]:
+        return route_ticket(state)
+    return "classify"
+
+
 # Build the workflow graph
-def build_workflow() -> StateGraph:
+def build_workflow(use_async: bool = False, fused: bool = FUSED_MODE) -> StateGraph:
     """
     Constructs the LangGraph workflow with all nodes and edges.
 
     Graph structure:
-    START -> classify_ticket -> route_ticket -> {billing|technical|general}_handler -> format_response -> END
+    START -> preclassify_ticket -> [classify_ticket if ambiguous] -> route_ticket
+          -> {billing|technical|general}_handler -> format_response -> END
+
+    With use_async=True the nodes are the async variants (run with ainvoke).
+    With fused=True classify_ticket is replaced by classify_respond_ticket
+    ("classify_respond"), whose drafted response the handlers pass through.
+    Every node is wrapped by instrument_node (one metrics event per run).
     """
+    classify_node = "classify_respond" if fused else "classify"
+
     # Initialize the graph with our state schema
     workflow = StateGraph(TicketState)
 
     # Add all nodes
-    workflow.add_node("classify", classify_ticket)
-    workflow.add_node("billing", handle_billing)
-    workflow.add_node("technical", handle_technical)
-    workflow.add_node("general", handle_general)
-    workflow.add_node("format", format_response)
+    if use_async:
+        workflow.add_node("preclassify", instrument_node("preclassify", apreclassify_ticket))
+        if fused:
+            workflow.add_node(classify_node, instrument_node(classify_node, aclassify_respond_ticket))
+        else:
+            workflow.add_node(classify_node, instrument_node(classify_node, aclassify_ticket))
+        workflow.add_node("billing", instrument_node("billing", ahandle_billing))
+        workflow.add_node("technical", instrument_node("technical", ahandle_technical))
+        workflow.add_node("general", instrument_node("general", ahandle_general))
+        workflow.add_node("format", instrument_node("format", aformat_response))
+    else:
+        workflow.add_node("preclassify", instrument_node("preclassify", preclassify_ticket))
+        if fused:
+            workflow.add_node(classify_node, instrument_node(classify_node, classify_respond_ticket))
+        else:
+            workflow.add_node(classify_node, instrument_node(classify_node, classify_ticket))
+        workflow.add_node("billing", instrument_node("billing", handle_billing))
+        workflow.add_node("technical", instrument_node("technical", handle_technical))
+        workflow.add_node("general", instrument_node("general", handle_general))
+        workflow.add_node("format", instrument_node("format", format_response))
 
     # Set the entry point
-    workflow.set_entry_point("classify")
+    workflow.set_entry_point("preclassify")
+
+    # Confident local classifications go straight to the handlers
+    workflow.add_conditional_edges(
+        "preclassify",
+        route_preclassified,
+        {
+            "billing": "billing",
+            "technical": "technical",
+            "general": "general",
+            "classify": classify_node
+        }
+    )
 
     # Add conditional routing from classify to handlers
     workflow.add_conditional_edges(
-        "classify",
+        classify_node,
         route_ticket,
         {
             "billing": "billing",
@@ -247,14 +1264,39 @@ def build_workflow() -> StateGraph:
     return workflow
 
 
+# Compiled graph cache: the graph is static, so build and compile it once
+@lru_cache(maxsize=None)  # one graph per mode
+def get_compiled_workflow(fused: bool = FUSED_MODE):
+    """Compiled workflow, built on first use and reused for every ticket"""
+    return build_workflow(fused=fused).compile()
+
+
+@lru_cache(maxsize=None)  # one graph per mode
+def get_compiled_async_workflow(fused: bool = FUSED_MODE):
+    """Compiled workflow with async nodes, built on first use"""
+    return build_workflow(use_async=True, fused=fused).compile()
+
+
+def initial_ticket_state(ticket_id: str, ticket_content: str) -> TicketState:
+    """Empty workflow state for a new ticket"""
+    return {
+        "ticket_id": ticket_id,
+        "ticket_content": ticket_content,
+        "classification": "",
+        "handler_response": "",
+        "formatted_response": ""
+    }
+
+
 # Main execution function
-def process_ticket(ticket_id: str, ticket_content: str) -> dict:
+def process_ticket(ticket_id: str, ticket_content: str, fused: bool = FUSED_MODE) -> dict:
     """
     Process a customer support ticket through the workflow.
 
     Args:
         ticket_id: Unique identifier for the ticket
         ticket_content: The customer's message/issue description
+        fused: One LLM call for classification and response (env TICKET_FUSED_MODE)
 
     Returns:
         Final state dict containing all processing results
@@ -263,23 +1305,296 @@ def process_ticket(ticket_id: str, ticket_content: str) -> dict:
     print(f"Processing Ticket: {ticket_id}")
     print(f"{'='*60}\n")
 
-    # Build and compile the workflow
-    workflow = build_workflow()
-    app = workflow.compile()
+    # Run the workflow on the cached compiled graph
+    app = get_compiled_workflow(fused)
+    final_state = app.invoke(initial_ticket_state(ticket_id, ticket_content))
 
-    # Initialize the state
-    initial_state: TicketState = {
-        "ticket_id": ticket_id,
-        "ticket_content": ticket_content,
-        "classification": "",
-        "handler_response": "",
-        "formatted_response": ""
-    }
+    return final_state
 
-    # Run the workflow
-    final_state = app.invoke(initial_state)
 
-    return final_state
+# Bulk execution: bounded concurrency through LangGraph's batch execution
+MAX_CONCURRENCY = int(os.getenv("TICKET_MAX_CONCURRENCY", "16"))
+BATCH_WINDOW = 4  # tickets submitted per batch, in multiples of max_concurrency
+
+
+def process_tickets(tickets: Iterable[tuple[str, str]],
+                    max_concurrency: int = MAX_CONCURRENCY,
+                    fused: bool = FUSED_MODE) -> Iterator[tuple[str, dict | Exception]]:
+    """
+    Process many tickets concurrently, yielding results as tickets finish.
+
+    Args:
+        tickets: Iterable of (ticket_id, ticket_content) pairs; consumed
+                 lazily, so it can be a generator over an inbox
+        max_concurrency: Tickets in flight at once (keep it at or below the
+                         client pool's max_connections)
+        fused: One LLM call for classification and response
+
+    Yields:
+        (ticket_id, final_state) in completion order; final_state is the
+        exception instead when that ticket failed, so one bad ticket does
+        not stop the batch
+    """
+    app = get_compiled_workflow(fused)
+    config = {"max_concurrency": max_concurrency}
+    tickets = iter(tickets)
+
+    while True:
+        window = list(islice(tickets, max_concurrency * BATCH_WINDOW))
+        if not window:
+            return
+        states = [initial_ticket_state(ticket_id, content) for ticket_id, content in window]
+        for i, result in app.batch_as_completed(states, config, return_exceptions=True):
+            yield window[i][0], result
+
+
+# Async execution: many LLM calls in flight from one worker
+REQUESTS_PER_MINUTE = float(os.getenv("ANTHROPIC_RPM", "0")) or None
+TOKENS_PER_MINUTE = float(os.getenv("ANTHROPIC_TPM", "0")) or None
+
+
+async def aprocess_ticket(ticket_id: str, ticket_content: str,
+                          rate_limiter: RateLimiter = None, fused: bool = FUSED_MODE) -> dict:
+    """
+    Async variant of process_ticket (ainvoke on the async graph).
+
+    Args:
+        ticket_id: Unique identifier for the ticket
+        ticket_content: The customer's message/issue description
+        rate_limiter: Optional RateLimiter shared with other concurrent tickets
+        fused: One LLM call for classification and response
+
+    Returns:
+        Final state dict containing all processing results
+    """
+    app = get_compiled_async_workflow(fused)
+    config = {"configurable": {"rate_limiter": rate_limiter}}
+    return await app.ainvoke(initial_ticket_state(ticket_id, ticket_content), config)
+
+
+async def aprocess_tickets(tickets: Iterable[tuple[str, str]] | AsyncIterable[tuple[str, str]],
+                           max_concurrency: int = MAX_CONCURRENCY,
+                           requests_per_minute: float = REQUESTS_PER_MINUTE,
+                           tokens_per_minute: float = TOKENS_PER_MINUTE,
+                           fused: bool = FUSED_MODE,
+                           ) -> AsyncIterator[tuple[str, dict | Exception]]:
+    """
+    Process many tickets on one event loop, yielding results as tickets finish.
+
+    At most max_concurrency tickets run at once, and every LLM call waits for
+    the shared requests/tokens-per-minute buckets, so hundreds of calls can be
+    in flight without tripping the API's rate limits.
+
+    Args:
+        tickets: (ticket_id, ticket_content) pairs, sync or async iterable,
+                 consumed lazily
+        max_concurrency: Tickets in flight at once
+        requests_per_minute: RPM limit (None = unlimited; env ANTHROPIC_RPM)
+        tokens_per_minute: TPM limit (None = unlimited; env ANTHROPIC_TPM)
+        fused: One LLM call for classification and response
+
+    Yields:
+        (ticket_id, final_state or exception) in completion order
+    """
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    if isinstance(tickets, AsyncIterable):
+        source = tickets.__aiter__()
+    else:
+        source = _aiter_sync(tickets)
+
+    async def run(ticket_id: str, content: str):
+        try:
+            return ticket_id, await aprocess_ticket(ticket_id, content, limiter, fused)
+        except Exception as e:
+            return ticket_id, e
+
+    # A client opened here is closed here, before the caller's loop ends
+    owns_client = not client_manager.has_async_client()
+    pending = set()
+    exhausted = False
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_concurrency:
+                try:
+                    ticket_id, content = await source.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending.add(asyncio.ensure_future(run(ticket_id, content)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # The consumer stopped early (break, exception, aclose): stop the rest
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if owns_client:
+            await client_manager.aclose()
+
+
+# Streaming execution: the response text as it is generated, then the final state
+def stream_ticket(ticket_id: str, ticket_content: str,
+                  fused: bool = FUSED_MODE) -> Iterator[tuple[str, str | dict]]:
+    """
+    Process a ticket, streaming the formatted response as it is written.
+
+    Yields:
+        ("text", chunk) for the response header, each handler text delta and
+        the footer - together exactly the final formatted_response - then
+        ("state", final_state) once the graph finishes. In fused mode the
+        response text arrives in one chunk (structured output is not streamed)
+    """
+    app = get_compiled_workflow(fused)
+    config = {"configurable": {"stream_tokens": True}}
+    final_state = None
+    for mode, chunk in app.stream(initial_ticket_state(ticket_id, ticket_content), config,
+                                  stream_mode=["custom", "values"]):
+        if mode == "custom":
+            yield "text", chunk
+        else:
+            final_state = chunk
+    yield "state", final_state
+
+
+async def astream_ticket(ticket_id: str, ticket_content: str, rate_limiter: RateLimiter = None,
+                         fused: bool = FUSED_MODE) -> AsyncIterator[tuple[str, str | dict]]:
+    """Async variant of stream_ticket (astream on the async graph)"""
+    app = get_compiled_async_workflow(fused)
+    config = {"configurable": {"stream_tokens": True, "rate_limiter": rate_limiter}}
+    final_state = None
+    async for mode, chunk in app.astream(initial_ticket_state(ticket_id, ticket_content), config,
+                                         stream_mode=["custom", "values"]):
+        if mode == "custom":
+            yield "text", chunk
+        else:
+            final_state = chunk
+    yield "state", final_state
+
+
+async def _aiter_sync(items: Iterable):
+    for item in items:
+        yield item
+
+
+# Offline bulk mode: Message Batches API for non-urgent queues (results within
+# 24h, at a lower price and outside the interactive rate limits)
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", str(24 * 3600)))
+
+
+class BatchRequestError(RuntimeError):
+    """A request in a message batch did not succeed (errored, canceled or expired)"""
+
+
+def run_message_batch(requests: dict[str, dict], client=None,
+                      poll_interval: float = BATCH_POLL_INTERVAL,
+                      timeout: float = BATCH_TIMEOUT) -> dict:
+    """
+    Submit one message batch and wait for its results.
+
+    Args:
+        requests: {custom_id: messages.create params}
+        client: Anthropic client (default: the shared client)
+
+    Returns:
+        {custom_id: Message, or BatchRequestError for a failed request}
+    """
+    client = client or get_anthropic_client()
+    batch = client.messages.batches.create(
+        requests=[{"custom_id": custom_id, "params": params} for custom_id, params in requests.items()]
+    )
+    print(f"[BATCH] Submitted {batch.id} with {len(requests)} requests")
+
+    deadline = time.monotonic() + timeout
+    while batch.processing_status != "ended":
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Message batch {batch.id} not ended after {timeout:.0f}s")
+        time.sleep(poll_interval)
+        batch = client.messages.batches.retrieve(batch.id)
+
+    results = {}
+    for entry in client.messages.batches.results(batch.id):
+        if entry.result.type == "succeeded":
+            results[entry.custom_id] = entry.result.message
+        else:
+            results[entry.custom_id] = BatchRequestError(f"{entry.custom_id}: {entry.result.type}")
+    for custom_id in requests.keys() - results.keys():
+        results[custom_id] = BatchRequestError(f"{custom_id}: no result")
+    print(f"[BATCH] {batch.id} ended")
+    return results
+
+
+def process_tickets_offline(tickets: Iterable[tuple[str, str]], client=None,
+                            poll_interval: float = BATCH_POLL_INTERVAL,
+                            timeout: float = BATCH_TIMEOUT) -> list[tuple[str, dict | Exception]]:
+    """
+    Process a backlog with two message batches instead of per-ticket calls.
+
+    1. Pre-classifier and classification cache, as in the graph
+    2. One batch with the classify calls of the remaining tickets
+    3. route_ticket, then one batch with the handler calls grouped by category
+    4. format_response
+
+    Args:
+        tickets: Iterable of (ticket_id, ticket_content) pairs
+        client: Anthropic client (default: the shared client); any object
+                with the messages.batches API, e.g. a local stand-in
+
+    Returns:
+        (ticket_id, final_state or exception) in input order; final states
+        are the same TicketState the graph produces
+    """
+    states = [initial_ticket_state(ticket_id, content) for ticket_id, content in tickets]
+    errors = {}
+
+    # 1-2. Classification: local first, then one batch for the rest
+    classify_requests = {}
+    for i, state in enumerate(states):
+        preclassify_ticket(state)
+        if not state["classification"]:
+            cached = classification_cache.get(state["ticket_content"])
+            if cached is not None:
+                state["classification"] = cached
+            else:
+                classify_requests[f"classify-{i}"] = {
+                    "model": MODEL,
+                    "max_tokens": CLASSIFY_MAX_TOKENS,
+                    "messages": [{"role": "user", "content": classification_prompt(state["ticket_content"])}],
+                }
+    if classify_requests:
+        for custom_id, result in run_message_batch(classify_requests, client, poll_interval, timeout).items():
+            i = int(custom_id.rsplit("-", 1)[1])
+            if isinstance(result, Exception):
+                errors[i] = result
+                continue
+            states[i]["classification"] = parse_classification(result.content[0].text)
+            cache_classification(states[i]["ticket_content"], result.content[0].text)
+            print(f"[CLASSIFY] Ticket {states[i]['ticket_id']} classified as: {states[i]['classification']}")
+
+    # 3. Handlers, grouped by category
+    handler_requests = {}
+    routed = sorted((route_ticket(state), i) for i, state in enumerate(states) if i not in errors)
+    for category, i in routed:
+        prompt = HANDLER_PROMPTS[category].format(ticket_content=states[i]["ticket_content"])
+        handler_requests[f"{category}-{i}"] = {
+            "model": MODEL,
+            "max_tokens": HANDLER_MAX_TOKENS,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+    if handler_requests:
+        for custom_id, result in run_message_batch(handler_requests, client, poll_interval, timeout).items():
+            i = int(custom_id.rsplit("-", 1)[1])
+            if isinstance(result, Exception):
+                errors[i] = result
+                continue
+            states[i]["handler_response"] = result.content[0].text.strip()
+
+    # 4. Format
+    return [(state["ticket_id"], errors[i] if i in errors else format_response(state))
+            for i, state in enumerate(states)]
 
 
 def visualize_graph():
@@ -290,8 +1605,7 @@ def visualize_graph():
     try:
         from IPython.display import Image, display
 
-        workflow = build_workflow()
-        app = workflow.compile()
+        app = get_compiled_workflow()
 
         # Generate graph visualization
         graph_image = app.get_graph().draw_mermaid_png()
@@ -0,0 +1,398 @@
+"""
+Fake Anthropic API Server for Tests and Load Tests
+
+A local stand-in for the Anthropic Messages API, so the ticket workflow and
+the agents can run without an API key:
+1. POST /v1/messages - JSON or streamed (SSE) responses
+2. Message Batches - create, retrieve and .jsonl results
+3. Responses replayed from recordings (regex on the last user message)
+4. Configurable latency, jitter, per-token delay, errors and rate limits
+
+Point the SDKs at it with ANTHROPIC_BASE_URL (anthropic) and
+ANTHROPIC_API_URL (langchain-anthropic); any API key is accepted.
+
+Usage:
+    python fake_anthropic_server.py --port 8765 --latency 0.5 --jitter 0.2
+    python fake_anthropic_server.py --error-rate 0.02 --rate-limit-rate 0.05
+"""
+
+import argparse
+import copy
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+REPLIES = {
+    "billing": (
+        "Thank you for reaching out about your billing concern. I have reviewed your account "
+        "and can confirm we are looking into the charge.\n\nIf a refund is due, it will be "
+        "issued to your original payment method within 5-7 business days. Our billing team "
+        "will follow up if anything else is needed."),
+    "technical": (
+        "Thank you for reporting this issue. Please try clearing your cache, updating to the "
+        "latest version and restarting the app.\n\nIf the problem persists, please send us "
+        "the error message and the steps to reproduce it; we aim to resolve it within 48 hours."),
+    "general": (
+        "Thank you for your message. You can find this information in our help center, and "
+        "our team is happy to walk you through it.\n\nThanks again for reaching out!"),
+}
+
+# Category keywords, searched in the ticket only (up to the blank line after it)
+TICKET_KEYWORDS = {
+    "billing": r"(?s)Ticket content:(?:(?!\n\n).)*?\b(charged|refund|invoice|payment|billing)\b",
+    "technical": r"(?s)Ticket content:(?:(?!\n\n).)*?\b(error|crash\w*|bug|timeout|500)\b",
+    "general": r"(?s)Ticket content:",
+}
+
+# Recorded responses: the first rule whose regex matches the last user
+# message wins. "{0}" in a string is replaced by the regex match; rules with
+# "requires_tools" only apply when the request offers tools.
+DEFAULT_RECORDINGS = [
+    # Ticket classification
+    *({"match": TICKET_KEYWORDS[category] + r".*Respond with ONLY the category name",
+       "content": [{"type": "text", "text": category}]} for category in REPLIES),
+
+    # Ticket handlers
+    {"match": r"billing support specialist", "content": [{"type": "text", "text": REPLIES["billing"]}]},
+    {"match": r"technical support specialist", "content": [{"type": "text", "text": REPLIES["technical"]}]},
+    {"match": r"customer support representative", "content": [{"type": "text", "text": REPLIES["general"]}]},
+
+    # Fused classify-and-respond (structured output through the ticket_response tool)
+    *({"match": TICKET_KEYWORDS[category] + r".*ticket_response tool", "requires_tools": True,
+       "content": [{"type": "tool_use", "name": "ticket_response",
+                    "input": {"category": category, "response": REPLIES[category]}}]}
+      for category in REPLIES),
+
+    # ReAct agent tools
+    {"match": r"\d+(?:\.\d+)?\s*[-+*/]\s*\d+(?:\.\d+)?", "requires_tools": True,
+     "content": [{"type": "tool_use", "name": "calculator", "input": {"expression": "{0}"}}]},
+    {"match": r"(?is)^(?:who|search|find|look up)\b.*", "requires_tools": True,
+     "content": [{"type": "tool_use", "name": "web_search", "input": {"query": "{0}"}}]},
+]
+
+FALLBACK_TEXT = "Thanks for your message. This is a deterministic reply from the fake Anthropic server."
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _user_text(message: dict) -> tuple[str, list]:
+    """(text, tool results) of a user message in string or block form"""
+    content = message.get("content", "")
+    if isinstance(content, str):
+        return content, []
+    texts, tool_results = [], []
+    for block in content:
+        if block.get("type") == "text":
+            texts.append(block["text"])
+        elif block.get("type") == "tool_result":
+            result = block.get("content", "")
+            if isinstance(result, list):
+                result = " ".join(part.get("text", "") for part in result)
+            tool_results.append(str(result))
+    return "\n".join(texts), tool_results
+
+
+def _fill(value, matched: str):
+    """Replace "{0}" with the regex match in every string of a recorded block"""
+    if isinstance(value, str):
+        return value.replace("{0}", matched)
+    if isinstance(value, dict):
+        return {key: _fill(item, matched) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, matched) for item in value]
+    return value
+
+
+class FakeAnthropicServer:
+    """
+    Anthropic-compatible HTTP server on a background thread.
+
+    Response content is deterministic (recordings); latency, errors and rate
+    limits are drawn from a seeded random generator.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, token_latency: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 0.01,
+                 batch_delay: float = 0.0, recordings: list = None, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.batch_delay = batch_delay
+        self.recordings = [dict(rule, pattern=re.compile(rule["match"]))
+                           for rule in (recordings if recordings is not None else DEFAULT_RECORDINGS)]
+        self.random = random.Random(seed)
+        self.batches = {}
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "streamed": 0}
+        self._ids = 0
+        self._lock = threading.Lock()
+        self.httpd = _HTTPServer((host, port), _Handler)
+        self.httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAnthropicServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:  # shutdown() blocks unless serve_forever is running
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # Behaviour -----------------------------------------------------------
+
+    def next_id(self, prefix: str) -> str:
+        with self._lock:
+            self._ids += 1
+            return f"{prefix}_fake_{self._ids:06d}"
+
+    def draw_delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def draw_failure(self) -> str | None:
+        """'rate_limit', 'overloaded' or None for the next request"""
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self.random.random()
+            if roll < self.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return "rate_limit"
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.stats["errors"] += 1
+                return "overloaded"
+            return None
+
+    def reply_content(self, body: dict) -> list:
+        """Response content blocks for a messages request"""
+        messages = body.get("messages") or [{"content": ""}]
+        text, tool_results = _user_text(messages[-1])
+        if tool_results:
+            return [{"type": "text", "text": "Based on the tool results: " + " ".join(tool_results)}]
+        for rule in self.recordings:
+            if rule.get("requires_tools") and not body.get("tools"):
+                continue
+            match = rule["pattern"].search(text)
+            if match:
+                content = _fill(copy.deepcopy(rule["content"]), match.group(0))
+                for block in content:
+                    if block["type"] == "tool_use":
+                        block["id"] = self.next_id("toolu")
+                return content
+        return [{"type": "text", "text": FALLBACK_TEXT}]
+
+    def message(self, body: dict) -> dict:
+        content = self.reply_content(body)
+        output = sum(len(block.get("text", json.dumps(block.get("input", {})))) for block in content)
+        return {
+            "id": self.next_id("msg"),
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "claude-fake"),
+            "content": content,
+            "stop_reason": "tool_use" if any(b["type"] == "tool_use" for b in content) else "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": max(1, len(json.dumps(body.get("messages", []))) // 4),
+                      "output_tokens": max(1, output // 4)},
+        }
+
+    def batch_json(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        ended = time.time() - batch["created"] >= self.batch_delay
+        counts = {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        if ended:
+            for line in batch["results"]:
+                counts[line["result"]["type"]] += 1
+        else:
+            counts["processing"] = len(batch["results"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": counts,
+            "created_at": _iso(batch["created"]),
+            "expires_at": _iso(batch["created"] + 24 * 3600),
+            "ended_at": _iso(batch["created"] + self.batch_delay) if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def create_batch(self, body: dict) -> dict:
+        batch_id = self.next_id("msgbatch")
+        results = []
+        for request in body.get("requests", []):
+            if self.draw_failure():
+                result = {"type": "errored", "error": {"type": "error", "error": {
+                    "type": "api_error", "message": "Simulated failure"}}}
+            else:
+                result = {"type": "succeeded", "message": self.message(request["params"])}
+            results.append({"custom_id": request["custom_id"], "result": result})
+        self.batches[batch_id] = {"created": time.time(), "results": results}
+        return self.batch_json(batch_id)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the default of 5 drops connections under load
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self) -> FakeAnthropicServer:
+        return self.server.fake
+
+    def send_json(self, status: int, payload, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.send_header("request-id", self.fake.next_id("req"))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status: int, error_type: str, message: str, headers: dict = None):
+        self.send_json(status, {"type": "error", "error": {"type": error_type, "message": message}}, headers)
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("content-length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        body = self.read_json()
+        if self.path.startswith("/v1/messages/batches"):
+            self.send_json(200, self.fake.create_batch(body))
+            return
+        if not self.path.startswith("/v1/messages"):
+            self.send_error_json(404, "not_found_error", f"Unknown path {self.path}")
+            return
+
+        time.sleep(self.fake.draw_delay())
+        retry = {"retry-after-ms": str(int(self.fake.retry_after * 1000))}
+        failure = self.fake.draw_failure()
+        if failure == "rate_limit":
+            self.send_error_json(429, "rate_limit_error", "Simulated rate limit", retry)
+        elif failure == "overloaded":
+            self.send_error_json(529, "overloaded_error", "Simulated overload", retry)
+        elif body.get("stream"):
+            self.stream_message(self.fake.message(body))
+        else:
+            self.send_json(200, self.fake.message(body))
+
+    def do_GET(self):
+        match = re.fullmatch(r"/v1/messages/batches/([^/?]+)(/results)?", self.path.split("?")[0])
+        if not match or match.group(1) not in self.fake.batches:
+            self.send_error_json(404, "not_found_error", f"Unknown path {self.path}")
+            return
+        batch_id = match.group(1)
+        if not match.group(2):
+            self.send_json(200, self.fake.batch_json(batch_id))
+            return
+        body = "".join(json.dumps(line) + "\n" for line in self.fake.batches[batch_id]["results"]).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/x-jsonl")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_message(self, message: dict):
+        """Server-sent events in the Messages streaming format, one text delta per word"""
+        with self.fake._lock:
+            self.fake.stats["streamed"] += 1
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("cache-control", "no-cache")
+        self.send_header("connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(name: str, data: dict):
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+            self.wfile.flush()
+
+        start = dict(message, content=[], stop_reason=None,
+                     usage={"input_tokens": message["usage"]["input_tokens"], "output_tokens": 1})
+        event("message_start", {"type": "message_start", "message": start})
+        for index, block in enumerate(message["content"]):
+            if block["type"] == "text":
+                event("content_block_start", {"type": "content_block_start", "index": index,
+                                              "content_block": {"type": "text", "text": ""}})
+                for delta in re.findall(r"\S+\s*|\s+", block["text"]):
+                    time.sleep(self.fake.token_latency)
+                    event("content_block_delta", {"type": "content_block_delta", "index": index,
+                                                  "delta": {"type": "text_delta", "text": delta}})
+            else:
+                event("content_block_start", {"type": "content_block_start", "index": index,
+                                              "content_block": dict(block, input={})})
+                event("content_block_delta", {"type": "content_block_delta", "index": index,
+                                              "delta": {"type": "input_json_delta",
+                                                        "partial_json": json.dumps(block["input"])}})
+            event("content_block_stop", {"type": "content_block_stop", "index": index})
+        event("message_delta", {"type": "message_delta",
+                                "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                                "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+        event("message_stop", {"type": "message_stop"})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Anthropic API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- seconds on the latency")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per streamed delta")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 529 overloaded responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of 429 responses")
+    parser.add_argument("--batch-delay", type=float, default=0.0, help="Seconds until a batch ends")
+    parser.add_argument("--recordings", help="JSON file with recorded responses (replaces the defaults)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    recordings = None
+    if args.recordings:
+        with open(args.recordings) as f:
+            recordings = json.load(f)
+
+    server = FakeAnthropicServer(args.host, args.port, args.latency, args.jitter, args.token_latency,
+                                 args.error_rate, args.rate_limit_rate, batch_delay=args.batch_delay,
+                                 recordings=recordings, seed=args.seed)
+    print(f"Fake Anthropic API on {server.url}")
+    print(f"  export ANTHROPIC_BASE_URL={server.url} ANTHROPIC_API_URL={server.url} ANTHROPIC_API_KEY=fake")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
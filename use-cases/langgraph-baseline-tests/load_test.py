@@ -0,0 +1,241 @@
+"""
+Load Test Driver
+
+Pushes N tickets or conversations through the real graphs, with a bounded
+number in flight, and reports throughput and p50/p95/p99 latency.
+
+By default the graphs talk to an in-process fake Anthropic server
+(fake_anthropic_server.py) with the given latency, jitter and error rates,
+so runs need no API key and cost nothing. Pass --base-url to target another
+server instead.
+
+Targets:
+    tickets        process_ticket on a thread pool (sync graph)
+    tickets-async  aprocess_ticket on one event loop (async graph)
+    chat           multi-turn conversations (langgraph_conversational_agent)
+    agent          ReAct questions with tool calls (langgraph_react_agent)
+
+Usage:
+    python load_test.py --target tickets --n 200 --concurrency 20 --latency 0.3 --jitter 0.1
+    python load_test.py --target tickets-async --n 1000 --concurrency 100 --error-rate 0.02
+    python load_test.py --target tickets --n 200 --fused     # one LLM call per ticket
+    python load_test.py --target chat --n 50 --turns 3
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+from fake_anthropic_server import FakeAnthropicServer
+
+
+SAMPLE_TICKETS = [
+    "I was charged twice for my subscription this month. Can you please refund the duplicate charge?",
+    "The app keeps crashing whenever I try to upload a file larger than 10MB. Error code: ERR_TIMEOUT",
+    "How do I add a second user to account #4471?",
+    "I can't log in since the update and my invoice for March is missing.",
+    "What are your business hours? I'd like to speak with someone about upgrading my plan.",
+    "My dashboard shows a 500 page after I changed my payment method.",
+]
+
+SAMPLE_CONVERSATION = [
+    "Hi! My name is Alice and I'm planning a trip to Lisbon.",
+    "What should I pack for a week there in April?",
+    "Thanks! Can you summarize that in three bullet points?",
+]
+
+SAMPLE_QUESTIONS = [
+    "What is 25 * 48 + 100?",
+    "Who created Python?",
+    "Search for the latest LangGraph release notes",
+    "What is 1337 / 7?",
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))  # ceil(n * q / 100)
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    """Throughput and latency percentiles of one run"""
+    report = {
+        "completed": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    if latencies:
+        report.update({
+            "p50_seconds": round(percentile(latencies, 50), 4),
+            "p95_seconds": round(percentile(latencies, 95), 4),
+            "p99_seconds": round(percentile(latencies, 99), 4),
+            "max_seconds": round(max(latencies), 4),
+        })
+    return report
+
+
+def run_threads(jobs: list, concurrency: int) -> dict:
+    """Run callables on a thread pool, timing each one"""
+    def timed(job):
+        start = time.perf_counter()
+        try:
+            job()
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, jobs))
+    elapsed = time.perf_counter() - start
+    latencies = [r for r in results if r is not None]
+    return summarize(latencies, len(results) - len(latencies), elapsed)
+
+
+async def run_tasks(jobs: list, concurrency: int) -> dict:
+    """Run coroutine functions on the event loop, at most `concurrency` at once"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(job):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await job()
+            except Exception:
+                return None
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed(job) for job in jobs))
+    elapsed = time.perf_counter() - start
+    latencies = [r for r in results if r is not None]
+    return summarize(latencies, len(results) - len(latencies), elapsed)
+
+
+def ticket_load(n: int, concurrency: int, use_async: bool = False, cache: bool = False) -> dict:
+    """
+    N tickets (cycling SAMPLE_TICKETS) through the customer support graph.
+
+    The classification cache starts empty and is off unless cache=True: with
+    only a handful of distinct tickets, every repeat would otherwise skip the
+    classify call and the run would measure cache hits.
+    """
+    import customer_support_workflow as workflow
+
+    cache_size = workflow.classification_cache.max_size
+    workflow.classification_cache.clear()
+    if not cache:
+        workflow.classification_cache.max_size = 0
+
+    tickets = [(f"LOAD-{i:05d}", SAMPLE_TICKETS[i % len(SAMPLE_TICKETS)]) for i in range(n)]
+
+    async def main():
+        try:
+            return await run_tasks([lambda t=t: workflow.aprocess_ticket(*t) for t in tickets], concurrency)
+        finally:
+            await workflow.client_manager.aclose()
+
+    try:
+        if use_async:
+            report = asyncio.run(main())
+        else:
+            report = run_threads([lambda t=t: workflow.process_ticket(*t) for t in tickets], concurrency)
+    finally:
+        workflow.classification_cache.max_size = cache_size
+    report["classification_cache"] = workflow.classification_cache.stats()
+    return report
+
+
+def chat_load(n: int, concurrency: int, turns: int = len(SAMPLE_CONVERSATION)) -> dict:
+    """N conversations of `turns` messages each; latency is per conversation"""
+    from langgraph_conversational_agent import chat, create_agent
+
+    app = create_agent()
+
+    def conversation(thread_id: str):
+        for i in range(turns):
+            chat(app, thread_id, SAMPLE_CONVERSATION[i % len(SAMPLE_CONVERSATION)])
+
+    return run_threads([lambda i=i: conversation(f"load-{i:05d}") for i in range(n)], concurrency)
+
+
+def agent_load(n: int, concurrency: int) -> dict:
+    """N ReAct questions (cycling SAMPLE_QUESTIONS), each with its tool loop"""
+    from langgraph_react_agent import run_agent
+
+    questions = [SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)] for i in range(n)]
+    return run_threads([lambda q=q: run_agent(q) for q in questions], concurrency)
+
+
+def run_load(target: str, n: int, concurrency: int, turns: int = len(SAMPLE_CONVERSATION),
+             cache: bool = False) -> dict:
+    """Run one load test against whatever ANTHROPIC_BASE_URL points at"""
+    if target == "tickets":
+        return ticket_load(n, concurrency, cache=cache)
+    if target == "tickets-async":
+        return ticket_load(n, concurrency, use_async=True, cache=cache)
+    if target == "chat":
+        return chat_load(n, concurrency, turns)
+    if target == "agent":
+        return agent_load(n, concurrency)
+    raise ValueError(f"Unknown target: {target}")
+
+
+def point_sdks_at(base_url: str):
+    """Route the anthropic and langchain-anthropic clients to base_url"""
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ["ANTHROPIC_API_URL"] = base_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "fake-key")
+
+
+def print_report(target: str, report: dict, server: FakeAnthropicServer = None):
+    print(f"\n{'='*60}")
+    print(f"LOAD TEST: {target}")
+    print(f"{'='*60}")
+    for key, value in report.items():
+        print(f"  {key:<24} {value}")
+    if server is not None:
+        print(f"  {'server':<24} {server.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the LangGraph workflows")
+    parser.add_argument("--target", choices=["tickets", "tickets-async", "chat", "agent"], default="tickets")
+    parser.add_argument("--n", type=int, default=100, help="Tickets, conversations or questions")
+    parser.add_argument("--concurrency", type=int, default=16, help="Units in flight at once")
+    parser.add_argument("--turns", type=int, default=len(SAMPLE_CONVERSATION), help="Messages per conversation")
+    parser.add_argument("--cache", action="store_true", help="Keep the classification cache on (off by default)")
+    parser.add_argument("--fused", action="store_true", help="Fused classify-and-respond ticket graph")
+    parser.add_argument("--base-url", help="Use this API server instead of the fake one")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake server: seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Fake server: +/- seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake server: share of 529 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fake server: share of 429 responses")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url:
+        point_sdks_at(args.base_url)
+    else:
+        server = FakeAnthropicServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                     rate_limit_rate=args.rate_limit_rate, seed=args.seed).start()
+        point_sdks_at(server.url)
+
+    if args.fused:
+        os.environ["TICKET_FUSED_MODE"] = "1"  # read when the workflow module is imported
+
+    try:
+        # The graphs print per-ticket progress; keep the report readable
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            report = run_load(args.target, args.n, args.concurrency, args.turns, args.cache)
+        print_report(args.target, report, server)
+    finally:
+        if server is not None:
+            server.stop()
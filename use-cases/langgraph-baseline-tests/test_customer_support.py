@@ -5,8 +5,198 @@ This script tests the workflow without actually calling the API,
 demonstrating the structure and flow.
 """
 
+import asyncio
+import importlib.util
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
 from customer_support_workflow import build_workflow, TicketState
 
+# The chat and ReAct agents need langchain-anthropic (langgraph_requirements.txt)
+LANGCHAIN_ANTHROPIC = importlib.util.find_spec("langchain_anthropic") is not None
+needs_langchain_anthropic = pytest.mark.skipif(not LANGCHAIN_ANTHROPIC,
+                                               reason="langchain_anthropic is not installed")
+AGENT_MODULES = ("langgraph_conversational_agent", "langgraph_react_agent")
+
+
+class FakeMessages:
+    """Stands in for client.messages: keyword classification, canned replies"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model, max_tokens, messages, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        if "boom" in prompt:
+            raise RuntimeError("simulated API failure")
+        usage = SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=20)
+        reply = "Thank you for contacting us. Here is what we will do next."
+        if "Ticket content:" in prompt:
+            ticket = prompt.split("Ticket content:")[1].split("\n\n")[0].lower()
+            category = ("billing" if "charged" in ticket or "refund" in ticket
+                        else "technical" if "error" in ticket or "crash" in ticket
+                        else "general")
+        if kwargs.get("tools"):  # fused mode: structured output through the forced tool
+            block = SimpleNamespace(type="tool_use", name=kwargs["tools"][0]["name"],
+                                    input={"category": category, "response": reply})
+            return SimpleNamespace(content=[block], usage=usage)
+        text = category if "Respond with ONLY the category name" in prompt else reply
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], usage=usage)
+
+
+    def stream(self, **kwargs):
+        return FakeStream(self.create(**kwargs))
+
+
+class FakeStream:
+    """client.messages.stream(...) context manager: word-sized text deltas"""
+
+    def __init__(self, message):
+        self.message = message
+        text = message.content[0].text
+        self.deltas = ["\n"] + [" " + word for word in text.split(" ")] + ["\n"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        return iter(self.deltas)
+
+    def get_final_message(self):
+        return self.message
+
+
+class FakeAsyncStream(FakeStream):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for delta in self.deltas:
+            await asyncio.sleep(0)
+            yield delta
+
+    async def get_final_message(self):
+        return self.message
+
+
+class FakeBatches:
+    """Stand-in Message Batches endpoint: answers with FakeMessages, ends after one poll"""
+
+    def __init__(self):
+        self.messages = FakeMessages()
+        self.batches = {}
+        self.submitted = []
+
+    def create(self, requests):
+        batch_id = f"msgbatch_{len(self.batches) + 1:03d}"
+        results = []
+        for request in requests:
+            try:
+                result = SimpleNamespace(type="succeeded", message=self.messages.create(**request["params"]))
+            except RuntimeError:
+                result = SimpleNamespace(type="errored", message=None)
+            results.append(SimpleNamespace(custom_id=request["custom_id"], result=result))
+        self.batches[batch_id] = results
+        self.submitted.append([request["custom_id"] for request in requests])
+        return SimpleNamespace(id=batch_id, processing_status="in_progress")
+
+    def retrieve(self, batch_id):
+        return SimpleNamespace(id=batch_id, processing_status="ended")
+
+    def results(self, batch_id):
+        return iter(self.batches[batch_id])
+
+
+class FakeAsyncMessages(FakeMessages):
+    """Async client.messages: same replies after a short simulated latency"""
+
+    def __init__(self, latency: float = 0.01):
+        super().__init__()
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return FakeMessages.create(self, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+    def stream(self, **kwargs):
+        return FakeAsyncStream(FakeMessages.create(self, **kwargs))
+
+
+@contextmanager
+def fake_client():
+    """Route every node's get_anthropic_client() to a FakeMessages client"""
+    from customer_support_workflow import client_manager
+
+    saved = client_manager._client, client_manager._pid
+    fake = SimpleNamespace(messages=FakeMessages())
+    client_manager._client, client_manager._pid = fake, os.getpid()
+    try:
+        yield fake
+    finally:
+        client_manager._client, client_manager._pid = saved
+
+
+@contextmanager
+def fake_async_client(messages: FakeAsyncMessages = None):
+    """Route get_async_anthropic_client() to FakeAsyncMessages (enter inside the event loop)"""
+    from customer_support_workflow import client_manager
+
+    saved = client_manager._async_client, client_manager._async_loop
+    fake = SimpleNamespace(messages=messages or FakeAsyncMessages())
+    client_manager._async_client, client_manager._async_loop = fake, asyncio.get_running_loop()
+    try:
+        yield fake
+    finally:
+        client_manager._async_client, client_manager._async_loop = saved
+
+
+@contextmanager
+def fake_server_env(server):
+    """Point the anthropic and langchain-anthropic SDKs at a FakeAnthropicServer"""
+    from load_test import point_sdks_at
+
+    saved_env = {key: os.environ.get(key)
+                 for key in ("ANTHROPIC_BASE_URL", "ANTHROPIC_API_URL", "ANTHROPIC_API_KEY")}
+    # The ReAct agent builds its LLM at import: import the agents afresh
+    saved_modules = {name: sys.modules.pop(name, None) for name in AGENT_MODULES}
+    os.environ["ANTHROPIC_API_KEY"] = "fake-key"
+    point_sdks_at(server.url)
+    try:
+        yield
+    finally:
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        for name, module in saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
 
 def test_graph_structure():
     """Test that the graph is constructed correctly"""
@@ -91,6 +281,492 @@ def test_routing_logic():
     print("\nRouting logic test: PASSED")
 
 
+def test_shared_client():
+    """Test that all nodes share one pooled Anthropic client (no API call)"""
+    print("\n" + "="*60)
+    print("Testing shared client manager...")
+    print("="*60)
+
+    from customer_support_workflow import AnthropicClientManager, get_anthropic_client
+
+    saved_key = os.environ.get("ANTHROPIC_API_KEY")
+    os.environ["ANTHROPIC_API_KEY"] = saved_key or "test-key"
+    try:
+        first, second = get_anthropic_client(), get_anthropic_client()
+        print(f"  Same client across calls: {first is second}")
+        assert first is second
+
+        manager = AnthropicClientManager(max_connections=8, max_keepalive_connections=4)
+        client = manager.get_client()
+        print(f"  Pool limits: {manager.limits}")
+        assert manager.limits.max_connections == 8
+
+        manager.close()
+        assert manager.get_client() is not client
+        print("  Closed client is replaced on next use")
+
+        client, lock = manager.get_client(), manager._lock
+        manager.configure(max_connections=4)
+        assert manager.limits.max_connections == 4 and manager._lock is lock
+        assert client.is_closed() and manager.get_client() is not client
+        print("  configure() closes the client and keeps the lock")
+        manager.close()
+
+        # A loop change closes the stale async client on its own (still running) loop
+        other_loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+        thread.start()
+
+        async def get_async():
+            return manager.get_async_client()
+
+        async def swap_and_close():
+            client = manager.get_async_client()
+            await manager.aclose()
+            return client
+
+        try:
+            stale = asyncio.run_coroutine_threadsafe(get_async(), other_loop).result()
+            fresh = asyncio.run(swap_and_close())
+            deadline = time.monotonic() + 5
+            while not stale.is_closed() and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            other_loop.call_soon_threadsafe(other_loop.stop)
+            thread.join()
+            other_loop.close()
+        assert fresh is not stale and stale.is_closed() and fresh.is_closed()
+        print("  Stale async client closed on loop change")
+    finally:
+        if saved_key is None:
+            os.environ.pop("ANTHROPIC_API_KEY", None)
+
+    print("\nShared client test: PASSED")
+
+
+def test_bulk_processing():
+    """Test the cached compiled graph and process_tickets (fake client, no API)"""
+    print("\n" + "="*60)
+    print("Testing bulk processing...")
+    print("="*60)
+
+    from customer_support_workflow import get_compiled_workflow, process_tickets
+
+    assert get_compiled_workflow() is get_compiled_workflow()
+    print("  Compiled graph is built once and reused")
+
+    tickets = (
+        (f"BULK-{i:03d}", content)
+        for i, content in enumerate([
+            "I was charged twice, please refund me.",
+            "The app crashes with an error on upload.",
+            "What are your business hours?",
+            "boom",
+        ] * 5)
+    )
+    with fake_client():
+        results = dict(process_tickets(tickets, max_concurrency=4))
+
+    failures = {tid: r for tid, r in results.items() if isinstance(r, Exception)}
+    print(f"  Processed: {len(results)} tickets, failed: {len(failures)}")
+    assert len(results) == 20 and len(failures) == 5
+    assert results["BULK-000"]["classification"] == "billing"
+    assert results["BULK-001"]["classification"] == "technical"
+    assert results["BULK-002"]["classification"] == "general"
+    assert "BULK-002" in results["BULK-002"]["formatted_response"]
+
+    print("\nBulk processing test: PASSED")
+
+
+def test_async_processing():
+    """Test aprocess_ticket / aprocess_tickets on the async graph (fake client, no API)"""
+    print("\n" + "="*60)
+    print("Testing async processing...")
+    print("="*60)
+
+    from customer_support_workflow import aprocess_ticket, aprocess_tickets
+
+    fake = FakeAsyncMessages()
+
+    async def run():
+        with fake_async_client(fake):
+            single = await aprocess_ticket("ASYNC-000", "I was charged twice, refund please")
+            tickets = [(f"ASYNC-{i:03d}", content) for i, content in enumerate(
+                ["The app crashes with an error", "What are your opening hours?", "boom"] * 10, 1)]
+            results = [r async for r in aprocess_tickets(tickets, max_concurrency=10,
+                                                         requests_per_minute=6000,
+                                                         tokens_per_minute=1_000_000)]
+            return single, dict(results)
+
+    async def stop_early():
+        with fake_async_client(fake):
+            # The failing ticket finishes first, with nine others mid-call
+            tickets = [("EARLY-000", "boom")] + [
+                (f"EARLY-{i:03d}", "What are your opening hours?") for i in range(1, 50)]
+            results = aprocess_tickets(tickets, max_concurrency=10)
+            async for _ in results:
+                break
+            await results.aclose()
+            return len(asyncio.all_tasks()) - 1  # minus this task
+
+    single, results = asyncio.run(run())
+    left_running = asyncio.run(stop_early())
+    failures = [tid for tid, r in results.items() if isinstance(r, Exception)]
+    print(f"  Single ticket classified as: {single['classification']}")
+    print(f"  Batch: {len(results)} tickets, {len(failures)} failed, "
+          f"max LLM calls in flight: {fake.max_in_flight}")
+    assert single["classification"] == "billing"
+    assert len(results) == 30 and len(failures) == 10
+    assert results["ASYNC-001"]["classification"] == "technical"
+    assert 1 < fake.max_in_flight <= 10
+    print(f"  Stopped after one result: {left_running} tickets left running")
+    assert left_running == 0 and fake.in_flight == 0
+
+    print("\nAsync processing test: PASSED")
+
+
+def test_rate_limiter():
+    """Test that the token bucket delays calls once it is drained"""
+    print("\n" + "="*60)
+    print("Testing rate limiter...")
+    print("="*60)
+
+    from customer_support_workflow import RateLimiter
+
+    async def run():
+        limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=60_000)
+        limiter.requests.tokens = 0  # drained: 100 requests/second refill
+        start = time.monotonic()
+        for _ in range(10):
+            await limiter.acquire(estimated_tokens=10)
+        return time.monotonic() - start, limiter
+
+    elapsed, limiter = asyncio.run(run())
+    print(f"  10 requests at 100/s from an empty bucket took {elapsed:.2f}s")
+    assert elapsed >= 0.08
+
+    limiter.tokens.tokens = 0
+    limiter.settle(estimated_tokens=500, used_tokens=100)
+    print("  Over-estimate of 400 tokens returned to the bucket")
+    assert limiter.tokens.tokens >= 400
+
+    print("\nRate limiter test: PASSED")
+
+
+def test_classification_cache():
+    """Test that repeated tickets skip the classification call (fake client, no API)"""
+    print("\n" + "="*60)
+    print("Testing classification cache...")
+    print("="*60)
+
+    import tempfile
+    from customer_support_workflow import ClassificationCache, classification_cache, process_ticket
+
+    classification_cache.clear()
+    with fake_client() as fake:
+        process_ticket("CACHE-001", "How do I add a second user to account #4471?")
+        calls_first = fake.messages.calls
+        result = process_ticket("CACHE-002", "how do I add a second user to account 9120")
+        calls_second = fake.messages.calls - calls_first
+
+    print(f"  LLM calls: first ticket {calls_first}, near-identical ticket {calls_second}")
+    print(f"  Stats: {classification_cache.stats()}")
+    assert result["classification"] == "general"
+    assert calls_first == 2 and calls_second == 1
+    assert classification_cache.hits == 1
+
+    short_lived = ClassificationCache(ttl=0.05)
+    short_lived.put("Server error 500", "technical")
+    time.sleep(0.1)
+    assert short_lived.get("Server error 500") is None and short_lived.expired == 1
+    print("  Expired entries are not returned")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "classifications.db")
+        ClassificationCache(path=path).put("Where is my invoice?", "billing")
+        restarted = ClassificationCache(path=path)
+        assert restarted.get("where is my invoice") == "billing" and restarted.disk_hits == 1
+        restarted._db.close()
+    print("  Disk tier survives a restart")
+
+    print("\nClassification cache test: PASSED")
+
+
+def test_preclassifier():
+    """Test that clear tickets skip the LLM classification (fake client, no API)"""
+    print("\n" + "="*60)
+    print("Testing local pre-classifier...")
+    print("="*60)
+
+    from customer_support_workflow import classification_cache, preclassifier, process_ticket
+
+    classification_cache.clear()
+    preclassifier.reset()
+    with fake_client() as fake:
+        clear = process_ticket("PRE-001", "I was charged twice, please refund the duplicate charge")
+        calls_clear = fake.messages.calls
+        ambiguous = process_ticket("PRE-002", "The invoice page shows an error")
+        calls_ambiguous = fake.messages.calls - calls_clear
+
+    report = preclassifier.report()
+    print(f"  Clear ticket: {clear['classification']} with {calls_clear} LLM call(s)")
+    print(f"  Ambiguous ticket: {ambiguous['classification']} with {calls_ambiguous} LLM call(s)")
+    print(f"  Report: {report}")
+    assert clear["classification"] == "billing" and calls_clear == 1
+    assert calls_ambiguous == 2
+    assert report["fast_path"] == 1 and report["llm_fallback"] == 1
+
+    # One keyword, or a keyword inside another word, is never enough
+    for ticket in ["My phone will not turn on even though it is fully charged",
+                   "Is there a bug bounty program?",
+                   "My recharged battery discharged overnight, is that normal?",
+                   "Can I get a refund?"]:
+        category, confidence = preclassifier.predict(ticket)
+        print(f"  {ticket!r}: {category} ({confidence:.2f})")
+        assert category is None
+    print("  Single-keyword tickets go to the LLM")
+
+    print("\nPre-classifier test: PASSED")
+
+
+def test_streaming():
+    """Test that stream_ticket streams the formatted response, then the state (fake client, no API)"""
+    print("\n" + "="*60)
+    print("Testing streaming...")
+    print("="*60)
+
+    from customer_support_workflow import astream_ticket, stream_ticket
+
+    with fake_client():
+        events = list(stream_ticket("STREAM-001", "The app crashes with an error"))
+
+    chunks = [payload for kind, payload in events if kind == "text"]
+    kind, final_state = events[-1]
+    print(f"  Text chunks: {len(chunks)}, first chunk is the header: {'Ticket ID' in chunks[0]}")
+    assert kind == "state"
+    assert "Ticket ID: STREAM-001" in chunks[0] and "Dear Valued Customer" in chunks[0]
+    assert len(chunks) > 5
+    assert "".join(chunks) == final_state["formatted_response"]
+
+    async def run():
+        with fake_async_client():
+            return [event async for event in astream_ticket("STREAM-002", "What are your hours?")]
+
+    events = asyncio.run(run())
+    chunks = [payload for kind, payload in events if kind == "text"]
+    assert "".join(chunks) == events[-1][1]["formatted_response"]
+    print("  Streamed text equals the final formatted_response (sync and async)")
+
+    print("\nStreaming test: PASSED")
+
+
+def test_offline_batches():
+    """Test the two-batch offline mode against a stand-in batch endpoint (no API)"""
+    print("\n" + "="*60)
+    print("Testing offline batch mode...")
+    print("="*60)
+
+    from customer_support_workflow import classification_cache, process_tickets_offline
+
+    classification_cache.clear()
+    batches = FakeBatches()
+    client = SimpleNamespace(messages=SimpleNamespace(batches=batches))
+    tickets = [
+        ("OFF-001", "I was charged twice, please refund me"),   # pre-classified locally
+        ("OFF-002", "How do I add a second user to my account?"),
+        ("OFF-003", "Can I move my plan to another address? boom"),
+        ("OFF-004", "Where can I read the terms of service?"),
+    ]
+    results = process_tickets_offline(tickets, client=client, poll_interval=0)
+
+    print(f"  Batches submitted: {batches.submitted}")
+    assert [ticket_id for ticket_id, _ in results] == [ticket_id for ticket_id, _ in tickets]
+    assert len(batches.submitted) == 2
+    assert batches.submitted[0] == ["classify-1", "classify-2", "classify-3"]
+    assert batches.submitted[1] == ["billing-0", "general-1", "general-3"]
+    assert isinstance(results[2][1], Exception)
+    billing = results[0][1]
+    assert billing["classification"] == "billing" and billing["handler_response"]
+    assert "Ticket ID: OFF-002" in results[1][1]["formatted_response"]
+    print("  Classify calls in one batch, handler calls grouped by category in a second")
+
+    print("\nOffline batch test: PASSED")
+
+
+def test_instrumentation():
+    """Test per-node metrics events and the Prometheus dump (fake client, no API)"""
+    print("\n" + "="*60)
+    print("Testing node instrumentation...")
+    print("="*60)
+
+    from customer_support_workflow import classification_cache, metrics, process_ticket
+
+    classification_cache.clear()
+    metrics.reset()
+    with fake_client():
+        process_ticket("METRICS-001", "How do I add a second user to my account?")
+        process_ticket("METRICS-002", "How do I add a second user to my account?")
+
+    events = list(metrics.events)
+    print(f"  Events: {[(e['ticket_id'], e['node']) for e in events]}")
+    assert [e["node"] for e in events[:4]] == ["preclassify", "classify", "general", "format"]
+    classify_first, classify_second = [e for e in events if e["node"] == "classify"]
+    assert classify_first["llm_calls"] == 1 and classify_first["input_tokens"] > 0
+    assert classify_first["ttft_seconds"] is not None and classify_first["cost_usd"] > 0
+    assert classify_second["cache_hit"] and classify_second["llm_calls"] == 0
+
+    summary = metrics.summary()
+    print(f"  Summary (classify): {summary['classify']}")
+    assert summary["general"]["runs"] == 2 and summary["classify"]["cache_hits"] == 1
+
+    text = metrics.prometheus_text()
+    assert 'ticket_node_duration_seconds_count{node="format"} 2' in text
+    assert 'ticket_node_cache_hits_total{node="classify"} 1' in text
+    print("  Prometheus text dump rendered")
+
+    print("\nInstrumentation test: PASSED")
+
+
+def test_fused_mode():
+    """Test the fused classify-and-respond mode: one LLM call per ticket (fake client, no API)"""
+    print("\n" + "="*60)
+    print("Testing fused classify-and-respond mode...")
+    print("="*60)
+
+    from customer_support_workflow import (aprocess_ticket, classification_cache, metrics,
+                                           preclassifier, process_ticket, stream_ticket)
+
+    ticket = "How do I add a second user to my account?"  # ambiguous: no local pre-classification
+    classification_cache.clear()
+    with fake_client() as fake:
+        two_step = process_ticket("FUSED-001", ticket, fused=False)
+        two_step_calls = fake.messages.calls
+        classification_cache.clear()
+        metrics.reset()
+        preclassifier.reset()
+        fused = process_ticket("FUSED-002", ticket, fused=True)
+        fused_calls = fake.messages.calls - two_step_calls
+        events = list(stream_ticket("FUSED-003", "Can I change the email on my account?", fused=True))
+
+    print(f"  LLM calls: two-step {two_step_calls}, fused {fused_calls}")
+    assert two_step_calls == 2 and fused_calls == 1
+    assert fused["classification"] == two_step["classification"] == "general"
+    assert fused["handler_response"] and "Category: GENERAL" in fused["formatted_response"]
+    nodes = [(e["node"], e["llm_calls"]) for e in metrics.events if e["ticket_id"] == "FUSED-002"]
+    print(f"  Nodes (LLM calls): {nodes}")
+    assert nodes == [("preclassify", 0), ("classify_respond", 1), ("general", 0), ("format", 0)]
+    assert "".join(payload for kind, payload in events if kind == "text") == events[-1][1]["formatted_response"]
+
+    async def run():
+        with fake_async_client():
+            return await aprocess_ticket("FUSED-004", "Is there a discount for students?", fused=True)
+
+    result = asyncio.run(run())
+    assert result["classification"] == "general" and result["handler_response"]
+    print("  Classification and response from one call; routing unchanged (sync, stream, async)")
+    # The fused call is the LLM classification the pre-classifier's savings are measured against
+    assert preclassifier.llm_calls == 3 and preclassifier.llm_seconds > 0
+
+    print("\nFused mode test: PASSED")
+
+
+def test_fake_server():
+    """Test the real SDK against the local fake Anthropic server (HTTP, no API key)"""
+    print("\n" + "="*60)
+    print("Testing against the fake Anthropic server...")
+    print("="*60)
+
+    from customer_support_workflow import (AnthropicClientManager, classification_cache, client_manager,
+                                           metrics, process_ticket, process_tickets_offline, stream_ticket)
+    from fake_anthropic_server import FakeAnthropicServer
+    from load_test import run_load
+
+    saved_client = client_manager._client, client_manager._pid
+    with FakeAnthropicServer(error_rate=0.3, seed=3) as server, fake_server_env(server):
+        client = AnthropicClientManager(max_retries=5).get_client()
+        client_manager._client, client_manager._pid = client, os.getpid()
+        try:
+            classification_cache.clear()
+            metrics.reset()
+            result = process_ticket("FAKE-001", "How do I add a second user to account #4471?")
+            assert result["classification"] == "general" and result["handler_response"]
+            retries = sum(e["retries"] for e in metrics.events)
+            print(f"  Server stats: {server.stats}, client retries: {retries}")
+            assert server.stats["errors"] > 0 and retries == server.stats["errors"]
+
+            server.error_rate = 0.0
+            chunks, final = [], None
+            for kind, payload in stream_ticket("FAKE-002", "The export keeps failing with an error"):
+                if kind == "text":
+                    chunks.append(payload)
+                else:
+                    final = payload
+            assert "".join(chunks) == final["formatted_response"] and server.stats["streamed"] == 1
+            print("  Streamed over SSE")
+
+            offline = process_tickets_offline([("FAKE-003", "Where can I read the terms of service?"),
+                                               ("FAKE-004", "I was charged twice, please refund me")],
+                                              client=client, poll_interval=0)
+            assert [state["classification"] for _, state in offline] == ["general", "billing"]
+            print(f"  Offline batches over HTTP: {len(server.batches)} batches")
+
+            fused = process_ticket("FAKE-005", "Does the app crash for anyone else with error 42?", fused=True)
+            assert fused["classification"] == "technical" and fused["handler_response"]
+            print("  Fused mode over HTTP (forced tool call)")
+
+            for target in ("tickets", "tickets-async"):
+                report = run_load(target, 12, 4)
+                print(f"  Load test ({target}): {report}")
+                assert report["completed"] == 12 and report["errors"] == 0
+                assert report["classification_cache"]["hits"] == 0  # off by default: no cached runs
+                assert report["p50_seconds"] <= report["p95_seconds"] <= report["p99_seconds"]
+        finally:
+            client.close()
+            client_manager._client, client_manager._pid = saved_client
+
+    print("\nFake server test: PASSED")
+
+
+@needs_langchain_anthropic
+def test_chat_load():
+    """Test the chat load target: conversations through the conversational graph (fake server)"""
+    print("\n" + "="*60)
+    print("Testing chat load against the fake Anthropic server...")
+    print("="*60)
+
+    from fake_anthropic_server import FakeAnthropicServer
+    from load_test import run_load
+
+    with FakeAnthropicServer() as server, fake_server_env(server):
+        report = run_load("chat", 4, 2, turns=2)
+
+    print(f"  Load test (chat): {report}, server: {server.stats}")
+    assert report["completed"] == 4 and report["errors"] == 0
+    assert server.stats["requests"] == 8  # one LLM call per turn
+
+    print("\nChat load test: PASSED")
+
+
+@needs_langchain_anthropic
+def test_agent_load():
+    """Test the agent load target: ReAct questions with a tool call each (fake server)"""
+    print("\n" + "="*60)
+    print("Testing ReAct agent load against the fake Anthropic server...")
+    print("="*60)
+
+    from fake_anthropic_server import FakeAnthropicServer
+    from load_test import run_load
+
+    with FakeAnthropicServer() as server, fake_server_env(server):
+        report = run_load("agent", 4, 2)
+
+    print(f"  Load test (agent): {report}, server: {server.stats}")
+    assert report["completed"] == 4 and report["errors"] == 0
+    assert server.stats["requests"] == 8  # tool call, then the answer from its result
+
+    print("\nAgent load test: PASSED")
+
+
 def show_example_tickets():
     """Show example tickets that would be processed"""
     print("\n" + "="*60)
@@ -209,6 +885,20 @@ if __name__ == "__main__":
     test_graph_structure()
     test_state_flow()
     test_routing_logic()
+    test_shared_client()
+    test_bulk_processing()
+    test_async_processing()
+    test_rate_limiter()
+    test_classification_cache()
+    test_preclassifier()
+    test_streaming()
+    test_offline_batches()
+    test_instrumentation()
+    test_fused_mode()
+    test_fake_server()
+    if LANGCHAIN_ANTHROPIC:
+        test_chat_load()
+        test_agent_load()
     show_example_tickets()
     show_workflow_benefits()
     show_production_checklist()
@@ -24,6 +24,9 @@ from pathlib import Path
 from datetime import datetime
 import re
 
+from dedup_orange_cx import matching_text, near_duplicate_clusters
+from schema_orange_cx import SCHEMA_FILENAME, load_schema, read_dtypes
+
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
@@ -39,6 +42,25 @@ FILES = {
     'full_shop_infos': 'orange-cx-intelligence-db - full-shop-infos.csv'
 }
 
+# Column types inferred by eda_orange_cx.py (optional: plain read_csv without it)
+SCHEMA_PATH = Path(__file__).parent / 'eda_output' / SCHEMA_FILENAME
+
+# =============================================================================
+# SOURCE LOADING
+# =============================================================================
+
+def load_source(name: str) -> pd.DataFrame:
+    """
+    Read a raw source file with dtypes pinned from the EDA's inferred schema.
+
+    WHY: Every column gets the type the EDA profiled instead of whatever
+         read_csv guesses from this drop's values, so the cleaning steps
+         always see the same types. Columns the EDA has not seen are inferred.
+    """
+    dtypes = read_dtypes(load_schema(SCHEMA_PATH).get(name, {}))
+    return pd.read_csv(BASE_PATH / FILES[name], dtype=dtypes)  # pins for absent columns are ignored
+
+
 # =============================================================================
 # CLEANING LOG
 # =============================================================================
@@ -132,6 +154,17 @@ def extract_mobis_code(shop_name_code: str) -> str:
     return match.group(1) if match else None
 
 
+def flag_near_duplicates(df: pd.DataFrame, table: str, source: str) -> pd.DataFrame:
+    """Add near_dup_cluster (MinHash LSH cluster id, NULL if unique) and log it."""
+    df['near_dup_cluster'] = near_duplicate_clusters(matching_text(df['verbatim'], source))
+    clustered = df['near_dup_cluster'].notna().sum()
+    clusters = df['near_dup_cluster'].nunique()
+    print(f"  Near-duplicate verbatims: {clustered} rows in {clusters} clusters")
+    log.log(table, 'FLAG', f"Clustered {clustered} near-duplicate verbatims into {clusters} clusters",
+            len(df), len(df))
+    return df
+
+
 # =============================================================================
 # TABLE 1: dim_shops
 # =============================================================================
@@ -147,8 +180,8 @@ def create_dim_shops() -> pd.DataFrame:
     print_section("CREATING dim_shops")
 
     # Load sources
-    id_biz = pd.read_csv(BASE_PATH / FILES['id_business'])
-    shop_info = pd.read_csv(BASE_PATH / FILES['full_shop_infos'])
+    id_biz = load_source('id_business')
+    shop_info = load_source('full_shop_infos')
 
     rows_before = len(id_biz)
     print(f"id_business: {len(id_biz)} rows")
@@ -253,7 +286,7 @@ def create_fact_google_reviews(dim_shops: pd.DataFrame) -> pd.DataFrame:
     print_section("CREATING fact_google_reviews")
 
     # Load source
-    df = pd.read_csv(BASE_PATH / FILES['google_reviews'])
+    df = load_source('google_reviews')
     rows_before = len(df)
     cols_before = len(df.columns)
     print(f"Loaded: {rows_before} rows × {cols_before} columns")
@@ -318,11 +351,16 @@ def create_fact_google_reviews(dim_shops: pd.DataFrame) -> pd.DataFrame:
     valid_count = df['shop_id_valid'].sum()
     print(f"Shop ID validation: {valid_count}/{len(df)} ({valid_count/len(df)*100:.1f}%) link to dim_shops")
 
-    # Step 9: Final column selection
+    # Step 9: Cluster near-duplicate verbatims
+    # WHY: duplicate_flag is a raw source flag; the same text re-posted (or
+    #      posted in two languages) skews shop ratings and repeats LLM work.
+    df = flag_near_duplicates(df, 'fact_google_reviews', 'google_reviews')
+
+    # Step 10: Final column selection
     final_columns = [
         'review_id', 'shop_id', 'review_timestamp', 'rating', 'verbatim',
         'client_name', 'response_timestamp', 'ai_response',
-        'is_corrected', 'correction_text', 'duplicate_flag'
+        'is_corrected', 'correction_text', 'duplicate_flag', 'near_dup_cluster'
     ]
     final_columns = [c for c in final_columns if c in df.columns]
     df = df[final_columns]
@@ -347,7 +385,7 @@ def create_fact_sms_surveys(dim_shops: pd.DataFrame) -> pd.DataFrame:
     print_section("CREATING fact_sms_surveys")
 
     # Load source
-    df = pd.read_csv(BASE_PATH / FILES['sms_surveys'])
+    df = load_source('sms_surveys')
     rows_before = len(df)
     print(f"Loaded: {rows_before} rows × {len(df.columns)} columns")
 
@@ -410,13 +448,16 @@ def create_fact_sms_surveys(dim_shops: pd.DataFrame) -> pd.DataFrame:
     unmapped = (~df['is_mappable']).sum()
     print(f"  Unmappable records (kept with NULL shop_id): {unmapped}")
 
-    # Step 8: Final column selection
+    # Step 8: Cluster near-duplicate verbatims
+    df = flag_near_duplicates(df, 'fact_sms_surveys', 'sms_surveys')
+
+    # Step 9: Final column selection
     final_columns = [
         'survey_id', 'shop_id', 'mobis_code', 'interaction_date', 'response_date',
         'rating', 'verbatim', 'vendor_id',
         'audience_type', 'customer_type', 'channel', 'case_type',
         'case_level_1', 'case_level_2', 'case_level_3',
-        'source_system', 'is_mappable'
+        'source_system', 'is_mappable', 'near_dup_cluster'
     ]
     final_columns = [c for c in final_columns if c in df.columns]
     df = df[final_columns]
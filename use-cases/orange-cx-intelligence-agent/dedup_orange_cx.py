@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Near-Duplicate Verbatims: Orange CX Intelligence
+================================================
+MinHash + LSH banding over verbatims, so copy-pasted, lightly edited and
+re-posted texts are grouped without comparing every pair (O(n) instead of O(n^2)).
+
+1. Shingles: character 5-grams of the normalized text
+2. MinHash: 128 multiply-shift hashes, min per document (vectorized)
+3. LSH: 16 bands x 8 rows; documents sharing a band bucket are candidates
+   (expected detection threshold ~ (1/16)^(1/8) = 0.71 Jaccard)
+4. Verify: candidate pairs need estimated Jaccard >= 0.8
+5. Clusters: connected components of verified pairs (label propagation)
+
+Used by: clean_orange_cx.py (near_dup_cluster column of both fact tables)
+
+Usage:
+    uv run python dedup_orange_cx.py     # report on clean_output fact tables
+"""
+
+import argparse
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from text_orange_cx import split_google_translation
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 16                 # NUM_PERM / BANDS rows per band
+SIMILARITY_THRESHOLD = 0.8
+MIN_WORDS = 5              # "Top", "Merci!" repeat naturally: not duplicates
+MINHASH_SEED = 42
+PERM_BLOCK = 16            # permutations hashed at once (bounds memory)
+
+CLEAN_PATH = Path(__file__).parent / 'clean_output'
+
+
+# =============================================================================
+# SIGNATURES
+# =============================================================================
+
+def normalize_text(text: pd.Series) -> pd.Series:
+    """Lower-case, strip accents and punctuation, collapse whitespace."""
+    text = text.astype('string').str.lower()
+    text = text.map(lambda s: unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode()
+                    if isinstance(s, str) else s)
+    return text.astype('string').str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+
+
+def shingle_hashes(text: pd.Series, k: int = SHINGLE_SIZE) -> tuple:
+    """
+    (doc ids, 64-bit shingle hashes) for every character k-gram of every doc.
+
+    Sorted by doc id, as minhash_signatures() expects.
+    """
+    docs, shingles = [], []
+    for i, s in zip(text.index, text.to_numpy()):
+        if len(s) < k:
+            grams = {s}
+        else:
+            grams = {s[j:j + k] for j in range(len(s) - k + 1)}
+        docs.append(np.full(len(grams), i, dtype=np.int64))
+        shingles.extend(grams)
+    if not shingles:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+    hashes = pd.util.hash_array(np.asarray(shingles, dtype=object))
+    return np.concatenate(docs), hashes
+
+
+def minhash_signatures(doc_ids: np.ndarray, hashes: np.ndarray, n_docs: int,
+                       num_perm: int = NUM_PERM, seed: int = MINHASH_SEED) -> np.ndarray:
+    """
+    (n_docs, num_perm) uint32 MinHash signatures.
+
+    Permutation i is the multiply-shift hash (a_i * x + b_i) >> 32 (mod 2^64,
+    odd a_i); the minimum per document is one np.minimum.reduceat per block.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    signatures = np.full((n_docs, num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    if len(hashes) == 0:
+        return signatures
+
+    starts = np.flatnonzero(np.r_[True, doc_ids[1:] != doc_ids[:-1]])
+    present = doc_ids[starts]
+    for lo in range(0, num_perm, PERM_BLOCK):
+        hi = min(lo + PERM_BLOCK, num_perm)
+        permuted = (a[lo:hi, None] * hashes[None, :] + b[lo:hi, None]) >> np.uint64(32)
+        signatures[present, lo:hi] = np.minimum.reduceat(permuted, starts, axis=1).T
+    return signatures
+
+
+def matching_text(verbatim: pd.Series, source: str) -> pd.Series:
+    """Text to compare: the English translation for Google reviews, else as-is."""
+    if source == 'google_reviews':
+        return split_google_translation(verbatim)['translated']
+    return verbatim
+
+
+# =============================================================================
+# LSH + CLUSTERS
+# =============================================================================
+
+def lsh_candidate_pairs(signatures: np.ndarray, bands: int = BANDS) -> np.ndarray:
+    """
+    (k, 2) candidate pairs: documents sharing a bucket in any band.
+
+    Each bucket member is paired with the bucket's first member only (a star
+    instead of all pairs), so a bucket of m documents costs m - 1 pairs and
+    clustering still connects them.
+    """
+    rows = signatures.shape[1] // bands
+    pairs = []
+    for band in range(bands):
+        # Bucket key: FNV-style fold of the band's rows (collisions are
+        # harmless: candidates are verified on the full signature)
+        keys = np.full(len(signatures), 0xcbf29ce484222325, dtype=np.uint64)
+        for col in range(band * rows, (band + 1) * rows):
+            keys = (keys ^ signatures[:, col].astype(np.uint64)) * np.uint64(0x100000001b3)
+        codes, _ = pd.factorize(keys)
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        first = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+        leader = order[np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))]
+        member = ~first
+        pairs.append(np.column_stack([leader[member], order[member]]))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(pairs), axis=0)
+
+
+def connected_components(n: int, pairs: np.ndarray) -> np.ndarray:
+    """Component label (smallest member index) per node, by label propagation."""
+    labels = np.arange(n)
+    if len(pairs) == 0:
+        return labels
+    u, v = pairs[:, 0], pairs[:, 1]
+    while True:
+        low = np.minimum(labels[u], labels[v])
+        updated = labels.copy()
+        np.minimum.at(updated, u, low)
+        np.minimum.at(updated, v, low)
+        updated = updated[updated]  # pointer jumping
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def near_duplicate_clusters(text: pd.Series, threshold: float = SIMILARITY_THRESHOLD,
+                            min_words: int = MIN_WORDS) -> pd.Series:
+    """
+    Near-duplicate cluster id per row (Int64, 1..k in order of first
+    appearance); <NA> for rows without a near-duplicate or too short to judge.
+
+    Pass Google verbatims as their English translation (matching_text()) so
+    the same review posted in French and in Dutch also matches.
+    """
+    normalized = normalize_text(text.reset_index(drop=True))
+    eligible = (normalized.str.count(' ') + 1 >= min_words).fillna(False).astype(bool)
+    docs = normalized[eligible]
+    clusters = pd.Series(pd.NA, index=text.index, dtype='Int64')
+    if len(docs) < 2:
+        return clusters
+
+    positions = np.flatnonzero(eligible.to_numpy())
+    local = pd.Series(docs.to_numpy(), index=np.arange(len(docs)))
+    doc_ids, hashes = shingle_hashes(local)
+    signatures = minhash_signatures(doc_ids, hashes, len(docs))
+
+    pairs = lsh_candidate_pairs(signatures)
+    if len(pairs):
+        similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+        pairs = pairs[similarity >= threshold]
+    labels = connected_components(len(docs), pairs)
+
+    sizes = np.bincount(labels, minlength=len(docs))
+    in_cluster = sizes[labels] > 1
+    cluster_ids, _ = pd.factorize(labels[in_cluster])  # numbered in order of first appearance
+    values = np.zeros(len(text), dtype=np.int64)
+    values[positions[in_cluster]] = cluster_ids + 1
+    clusters[:] = pd.array(values, dtype='Int64')
+    clusters[values == 0] = pd.NA
+    return clusters
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def print_section(title: str):
+    """Print a formatted section header."""
+    print(f"\n{'='*70}")
+    print(f"  {title}")
+    print(f"{'='*70}\n")
+
+
+def report(df: pd.DataFrame, name: str, id_col: str, examples: int = 5):
+    """Cluster summary for one fact table (near_dup_cluster already set)."""
+    clustered = df[df['near_dup_cluster'].notna()]
+    print(f"--- {name} ---")
+    print(f"Near-duplicate clusters: {clustered['near_dup_cluster'].nunique()} "
+          f"({len(clustered)} of {len(df)} rows)")
+    if clustered.empty:
+        return
+    summary = clustered.groupby('near_dup_cluster').agg(
+        rows=(id_col, 'size'), shops=('shop_id', 'nunique'),
+        ratings=('rating', lambda r: sorted(r.dropna().unique().tolist())),
+        text=('verbatim', 'first'),
+    ).sort_values('rows', ascending=False)
+    summary['text'] = summary['text'].str.replace(r'\s+', ' ', regex=True).str[:80]
+    print(summary.head(examples).to_string())
+
+
+def main():
+    print_section("ORANGE CX INTELLIGENCE - NEAR-DUPLICATE VERBATIMS")
+    tables = [('fact_google_reviews', 'google_reviews', 'review_id'),
+              ('fact_sms_surveys', 'sms_surveys', 'survey_id')]
+    for name, source, id_col in tables:
+        df = pd.read_csv(CLEAN_PATH / f'{name}.csv')
+        if 'near_dup_cluster' not in df.columns:
+            df['near_dup_cluster'] = near_duplicate_clusters(matching_text(df['verbatim'], source))
+        report(df, name, id_col)
+        print()
+
+
+if __name__ == '__main__':
+    argparse.ArgumentParser(description='Near-duplicate verbatim report').parse_args()
+    main()
@@ -9,15 +9,30 @@ WHY: EDA before cleaning reveals data quality issues, patterns, and informs
 
 Usage:
     uv run python eda_orange_cx.py
+    uv run python eda_orange_cx.py --parallel [--workers 4]
+    uv run python eda_orange_cx.py --stream [--chunksize 100000]
+    uv run python eda_orange_cx.py --sample 500 [--stratify]
+    uv run python eda_orange_cx.py --summary [--no-cache]
 """
 
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import warnings
+import io
 import json
+import os
+import hashlib
+import pickle
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from datetime import datetime
 
+from schema_orange_cx import NUMERIC_TYPES, TEMPORAL_TYPES, infer_schema, save_schema
+from sketches_orange_cx import (HyperLogLog, MisraGries, ReservoirSampler, RunningMoments,
+                                TDigest, hash_values)
+
 warnings.filterwarnings('ignore')
 
 # Configure pandas display
@@ -40,6 +55,14 @@ FILES = {
     'full_shop_infos': 'orange-cx-intelligence-db - full-shop-infos.csv'
 }
 
+# Shop column per source for --sample --stratify (reference tables: one row per shop)
+SAMPLE_STRATA = {
+    'google_reviews': 'Business_ID',
+    'sms_surveys': 'SHOP_Shop Name + Aramis code',
+}
+SAMPLE_SEED = 42
+SAMPLE_Z = 1.96  # 95% error bars
+
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
@@ -51,78 +74,892 @@ def print_section(title: str):
     print(f"{'='*70}\n")
 
 
-def analyze_column(series: pd.Series, col_name: str) -> dict:
-    """Analyze a single column and return stats."""
-    stats = {
-        'column': col_name,
-        'dtype': str(series.dtype),
-        'non_null': int(series.notna().sum()),
-        'null_count': int(series.isna().sum()),
-        'null_pct': round(series.isna().mean() * 100, 2),
-        'unique': int(series.nunique()),
-        'unique_pct': round(series.nunique() / len(series) * 100, 2) if len(series) > 0 else 0,
-    }
-
-    if pd.api.types.is_numeric_dtype(series):
-        clean = series.dropna()
-        if len(clean) > 0:
-            stats['mean'] = round(clean.mean(), 2)
-            stats['std'] = round(clean.std(), 2)
-            stats['min'] = clean.min()
-            stats['max'] = clean.max()
-            stats['median'] = clean.median()
-            # Outlier detection (IQR)
-            Q1, Q3 = clean.quantile(0.25), clean.quantile(0.75)
-            IQR = Q3 - Q1
-            outliers = clean[(clean < Q1 - 1.5*IQR) | (clean > Q3 + 1.5*IQR)]
-            stats['outlier_count'] = len(outliers)
-            stats['outlier_pct'] = round(len(outliers) / len(clean) * 100, 2)
-    else:
-        # Categorical analysis
-        if series.notna().any():
-            mode = series.mode()
-            stats['mode'] = str(mode.iloc[0]) if not mode.empty else None
-            stats['mode_freq'] = round((series == stats['mode']).mean() * 100, 2) if stats['mode'] else 0
+def _mode(counts: pd.Series):
+    """Mode from value_counts(): smallest value among the most frequent (Series.mode order)."""
+    top = counts.index[counts.to_numpy() == counts.iloc[0]]
+    try:
+        return min(top)
+    except TypeError:  # mixed, unorderable object values
+        return pd.Series(top).mode().iloc[0]
+
+
+def profile_columns(df: pd.DataFrame) -> list:
+    """
+    Column stats for every column of a dataframe, in batched passes.
+
+    WHY: analyzing column by column ran isna() and nunique() twice each, then
+         mode() plus a full (series == mode) pass and three .str scans per column.
+         Here nulls come from one df.isna() pass, numeric stats from one
+         reduction per dtype block, and every categorical stat (unique, mode,
+         mode frequency, whitespace, case) from a single value_counts() whose
+         (small) index is the only thing the string checks touch.
+
+    Returns the same dicts as analyze_column(), in column order.
+    """
+    n = len(df)
+    null_counts = df.isna().sum()
+    numeric_cols = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    numeric_set = set(numeric_cols)
+    nunique = df[numeric_cols].nunique() if numeric_cols else pd.Series(dtype=int)
+
+    # Numeric stats: one reduction per dtype block (keeps int min/max as int)
+    numeric_stats = {}
+    by_dtype = {}
+    for c in numeric_cols:
+        by_dtype.setdefault(str(df[c].dtype), []).append(c)
+    for cols in by_dtype.values():
+        block = df[cols]
+        non_null = len(df) - null_counts[cols]
+        means, stds = block.mean(), block.std()
+        mins, maxs = block.min(), block.max()
+        q = block.quantile([0.25, 0.5, 0.75])
+        q1, median, q3 = q.loc[0.25], q.loc[0.5], q.loc[0.75]
+        iqr = q3 - q1
+        outliers = ((block < q1 - 1.5*iqr) | (block > q3 + 1.5*iqr)).sum()
+        for c in cols:
+            if non_null[c] == 0:
+                continue
+            numeric_stats[c] = {
+                'mean': round(means[c], 2),
+                'std': round(stds[c], 2),
+                'min': mins[c],
+                'max': maxs[c],
+                'median': median[c],
+                'outlier_count': int(outliers[c]),
+                'outlier_pct': round(outliers[c] / non_null[c] * 100, 2),
+            }
+
+    all_stats = []
+    for col in df.columns:
+        series = df[col]
+        nulls = int(null_counts[col])
+        counts = None if col in numeric_set else series.value_counts(dropna=True)
+        unique = int(nunique[col]) if counts is None else len(counts)
+        stats = {
+            'column': col,
+            'dtype': str(series.dtype),
+            'non_null': n - nulls,
+            'null_count': nulls,
+            'null_pct': round(nulls / n * 100, 2) if n > 0 else np.nan,
+            'unique': unique,
+            'unique_pct': round(unique / n * 100, 2) if n > 0 else 0,
+        }
+
+        if col in numeric_set:
+            stats.update(numeric_stats.get(col, {}))
+        elif nulls < n:
+            # Categorical analysis
+            mode = _mode(counts)
+            stats['mode'] = str(mode)
+            if stats['mode']:
+                matches = counts.iloc[0] if isinstance(mode, str) else (series == stats['mode']).sum()
+                stats['mode_freq'] = round(matches / n * 100, 2)
+            else:
+                stats['mode_freq'] = 0
 
-            # Check for whitespace issues
+            # Check for whitespace issues (on distinct values only)
             if series.dtype == 'object':
-                str_series = series.dropna().astype(str)
-                stats['has_leading_space'] = str_series.str.startswith(' ').any()
-                stats['has_trailing_space'] = str_series.str.endswith(' ').any()
-                stats['case_inconsistent'] = str_series.str.lower().nunique() < str_series.nunique()
+                values = counts.index.astype(str)
+                stats['has_leading_space'] = bool(values.str.startswith(' ').any())
+                stats['has_trailing_space'] = bool(values.str.endswith(' ').any())
+                stats['case_inconsistent'] = values.str.lower().nunique() < values.nunique()
+
+        all_stats.append(stats)
+
+    return all_stats
 
-    return stats
 
+def analyze_column(series: pd.Series, col_name: str) -> dict:
+    """Analyze a single column and return stats."""
+    return profile_columns(series.to_frame(col_name))[0]
 
-def analyze_dataframe(df: pd.DataFrame, name: str) -> dict:
-    """Comprehensive analysis of a dataframe."""
+
+def analyze_dataframe(df: pd.DataFrame, name: str, column_stats: list = None) -> dict:
+    """Comprehensive analysis of a dataframe (column_stats: precomputed, e.g. cached)."""
+    complete_rows = int(df.notna().all(axis=1).sum())
     results = {
         'name': name,
         'rows': len(df),
         'columns': len(df.columns),
         'memory_mb': round(df.memory_usage(deep=True).sum() / 1e6, 2),
         'duplicate_rows': int(df.duplicated().sum()),
-        'complete_rows': int(len(df.dropna())),
-        'complete_rows_pct': round(len(df.dropna()) / len(df) * 100, 2) if len(df) > 0 else 0,
-        'column_stats': []
+        'complete_rows': complete_rows,
+        'complete_rows_pct': round(complete_rows / len(df) * 100, 2) if len(df) > 0 else 0,
+        'column_stats': column_stats if column_stats is not None else profile_columns(df)
     }
 
-    # Analyze each column
-    for col in df.columns:
-        stats = analyze_column(df[col], col)
-        results['column_stats'].append(stats)
-
     return results
 
 
+def quality_issues_from_results(all_results: dict) -> list:
+    """
+    Quality issues (high missing, duplicates, empty columns) per dataset.
+
+    Built from analyze_dataframe() results rather than the dataframes, so the
+    streaming profiler - which never holds a whole file - reports the same issues.
+    """
+    issues = []
+
+    # Check each dataset
+    for name, res in all_results.items():
+        n = res['rows']
+
+        # Missing values
+        for stats in res['column_stats']:
+            if n > 0 and stats['null_count'] / n > 0.5:
+                issues.append({
+                    'Dataset': name,
+                    'Issue': f"High missing: {stats['column']}",
+                    'Severity': 'Major',
+                    'Records': f"{stats['null_count']}/{n}",
+                    'Action': 'Consider drop or investigate'
+                })
+
+        # Duplicates
+        if res['duplicate_rows'] > 0:
+            issues.append({
+                'Dataset': name,
+                'Issue': 'Exact duplicate rows',
+                'Severity': 'Major',
+                'Records': str(res['duplicate_rows']),
+                'Action': 'Deduplicate'
+            })
+
+        # Empty columns
+        for stats in res['column_stats']:
+            if stats['null_count'] == n:
+                issues.append({
+                    'Dataset': name,
+                    'Issue': f"Empty column: {stats['column']}",
+                    'Severity': 'Minor',
+                    'Records': str(n),
+                    'Action': 'Drop column'
+                })
+
+    return issues
+
+
+# =============================================================================
+# PARALLEL PROFILING
+# =============================================================================
+
+class SharedFrame:
+    """
+    A dataframe's columns exported to shared memory for pool workers.
+
+    WHY: Pickling each column to every worker costs as much as the profiling.
+         Numeric columns are copied once into a shared block and mapped
+         zero-copy by workers. Object columns are dictionary-encoded: the int
+         codes go to shared memory, only the distinct values are pickled.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.columns = []  # picklable descriptors, one per column
+        self._blocks = []
+        for col in df.columns:
+            series = df[col]
+            if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+                self.columns.append(('array', col, *self._share(series.to_numpy()), None))
+            elif series.dtype == 'object':
+                codes, uniques = pd.factorize(series)
+                self.columns.append(('dict', col, *self._share(codes),
+                                     np.asarray(uniques, dtype=object)))
+            else:  # extension dtypes: ship as-is
+                self.columns.append(('pickle', col, None, None, None, series))
+
+    def _share(self, values: np.ndarray) -> tuple:
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, values.dtype, buffer=shm.buf)[:] = values
+        self._blocks.append(shm)
+        return shm.name, values.dtype.str, len(values)
+
+    def select(self, columns: list) -> list:
+        wanted = set(columns)
+        return [d for d in self.columns if d[1] in wanted]
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+
+def _attach_frame(descriptors: list) -> tuple:
+    """Rebuild a dataframe from SharedFrame descriptors (worker side)."""
+    handles, data = [], {}
+    for kind, col, shm_name, dtype, length, extra in descriptors:
+        if kind == 'pickle':
+            data[col] = extra
+            continue
+        # Pool workers share the parent's resource tracker: the parent unlinks
+        shm = shared_memory.SharedMemory(name=shm_name)
+        handles.append(shm)
+        values = np.ndarray((length,), np.dtype(dtype), buffer=shm.buf)
+        if kind == 'array':
+            data[col] = pd.Series(values, copy=False)
+        else:
+            decoded = extra.take(values) if len(extra) else np.full(length, np.nan, dtype=object)
+            decoded[values < 0] = np.nan
+            data[col] = pd.Series(decoded, dtype=object)
+    return pd.DataFrame(data, copy=False), handles
+
+
+def _release(handles: list):
+    for shm in handles:
+        shm.close()
+
+
+def _profile_columns_task(descriptors: list) -> list:
+    """Worker: column stats for a chunk of columns."""
+    df, handles = _attach_frame(descriptors)
+    try:
+        return profile_columns(df)
+    finally:
+        del df
+        _release(handles)
+
+
+def _frame_stats_task(descriptors: list) -> dict:
+    """Worker: whole-frame stats (duplicates, complete rows)."""
+    df, handles = _attach_frame(descriptors)
+    try:
+        return {
+            'duplicate_rows': int(df.duplicated().sum()),
+            'complete_rows': int(df.notna().all(axis=1).sum()),
+        }
+    finally:
+        del df
+        _release(handles)
+
+
+def analyze_dataframes_parallel(dfs: dict, workers: int = None) -> dict:
+    """
+    analyze_dataframe() for several dataframes on a process pool.
+
+    Each file is split into column chunks (one per worker) plus a whole-frame
+    task; results are merged back in column order into the same structure.
+    """
+    workers = workers or os.cpu_count() or 1
+    shared = {name: SharedFrame(df) for name, df in dfs.items()}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            column_jobs, frame_jobs = {}, {}
+            for name, df in dfs.items():
+                chunks = np.array_split(np.arange(len(df.columns)), min(workers, len(df.columns)) or 1)
+                column_jobs[name] = [
+                    pool.submit(_profile_columns_task,
+                                shared[name].select(list(df.columns[chunk])))
+                    for chunk in chunks if len(chunk)
+                ]
+                frame_jobs[name] = pool.submit(_frame_stats_task, shared[name].columns)
+
+            all_results = {}
+            for name, df in dfs.items():
+                frame_stats = frame_jobs[name].result()
+                n = len(df)
+                all_results[name] = {
+                    'name': name,
+                    'rows': n,
+                    'columns': len(df.columns),
+                    'memory_mb': round(df.memory_usage(deep=True).sum() / 1e6, 2),
+                    'duplicate_rows': frame_stats['duplicate_rows'],
+                    'complete_rows': frame_stats['complete_rows'],
+                    'complete_rows_pct': round(frame_stats['complete_rows'] / n * 100, 2) if n > 0 else 0,
+                    'column_stats': [s for job in column_jobs[name] for s in job.result()]
+                }
+    finally:
+        for frame in shared.values():
+            frame.close()
+    return all_results
+
+
+# =============================================================================
+# STREAMING PROFILING
+# =============================================================================
+
+CASE_TRACK_LIMIT = 100_000  # distinct strings remembered for the case check
+
+
+def _counts_quantile(counts: pd.Series, q: float) -> float:
+    """Exact quantile (pandas 'linear') from a value -> frequency table."""
+    counts = counts.sort_index()
+    values = counts.index.to_numpy(dtype=np.float64)
+    upper = np.cumsum(counts.to_numpy())  # last rank (exclusive) of each value
+    pos = q * (upper[-1] - 1)
+    lo, hi = int(np.floor(pos)), int(np.ceil(pos))
+    v_lo = values[np.searchsorted(upper, lo, side='right')]
+    v_hi = values[np.searchsorted(upper, hi, side='right')]
+    return v_lo + (v_hi - v_lo) * (pos - lo)
+
+
+class ColumnSketch:
+    """
+    Per-column accumulator for profile_csv_streaming().
+
+    Holds only bounded sketches (see sketches_orange_cx.py), never the values.
+    While a column has at most `heavy_k` distinct values the Misra-Gries table
+    is an exact frequency table, so unique/mode/quantiles/outliers stay exact;
+    beyond that they fall back to HyperLogLog and t-digest estimates.
+    """
+
+    def __init__(self, name: str, heavy_k: int = 1000):
+        self.name = name
+        self.n = 0
+        self.nulls = 0
+        self.dtypes = []
+        self.distinct = HyperLogLog()
+        self.moments = RunningMoments()
+        self.digest = TDigest()
+        self.heavy = MisraGries(k=heavy_k)
+        self.has_leading_space = False
+        self.has_trailing_space = False
+        self.case_inconsistent = False
+        self.smallest = None
+        self._case_seen = {}
+
+    def update(self, series: pd.Series):
+        self.n += len(series)
+        if str(series.dtype) not in self.dtypes:
+            self.dtypes.append(str(series.dtype))
+        counts = series.value_counts(dropna=True)
+        self.nulls += len(series) - int(counts.sum())
+        if counts.empty:
+            return
+        self.distinct.update(counts.index)
+        self.heavy.update_counts(counts)
+        try:
+            smallest = counts.index.min()
+            self.smallest = smallest if self.smallest is None else min(self.smallest, smallest)
+        except TypeError:  # mixed types across chunks: keep the first
+            pass
+
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            values = series.dropna().to_numpy(dtype=np.float64)
+            self.moments.update(values)
+            self.digest.update(values)
+        elif series.dtype == 'object':
+            values = counts.index.astype(str)
+            self.has_leading_space |= bool(values.str.startswith(' ').any())
+            self.has_trailing_space |= bool(values.str.endswith(' ').any())
+            self._track_case(values)
+
+    def _track_case(self, values: pd.Index):
+        """Case collisions within the chunk, then against earlier chunks (bounded)."""
+        if self.case_inconsistent:
+            return
+        lowered = values.str.lower()
+        if lowered.nunique() < len(values):
+            self.case_inconsistent = True
+            return
+        for low, original in zip(lowered, values):
+            seen = self._case_seen.get(low)
+            if seen is not None and seen != original:
+                self.case_inconsistent = True
+                self._case_seen = {}
+                return
+            if seen is None and len(self._case_seen) < CASE_TRACK_LIMIT:
+                self._case_seen[low] = original
+
+    @staticmethod
+    def _as_text(heavy: MisraGries) -> MisraGries:
+        """
+        Re-key counts as text when chunks of a text column parsed as numbers.
+
+        WHY: a chunk holding only '5' and '4' is read as int64, another chunk
+             of the same column as object; the full read keeps '5' as text.
+        """
+        keys = heavy.counts.index
+        if keys.inferred_type == 'string':
+            return heavy
+        text = heavy.counts.groupby([
+            str(int(v)) if isinstance(v, float) and v.is_integer() else str(v) for v in keys
+        ]).sum()
+        merged = MisraGries(k=heavy.k)
+        merged.counts, merged.n, merged.error = text, heavy.n, heavy.error
+        return merged
+
+    @property
+    def exact(self) -> bool:
+        return self.heavy.error == 0
+
+    def dtype(self) -> str:
+        """dtype a full read_csv would give: object wins, numeric types promote."""
+        if len(self.dtypes) == 1:
+            return self.dtypes[0]
+        if 'object' in self.dtypes:
+            return 'object'
+        try:
+            return str(np.result_type(*self.dtypes))
+        except TypeError:
+            return 'object'
+
+    def stats(self) -> dict:
+        """Same keys as profile_columns(); approximate once a column outgrows heavy_k."""
+        n, nulls = self.n, self.nulls
+        dtype = self.dtype()
+        if self.exact:
+            counts = self.heavy.counts if dtype != 'object' else self._as_text(self.heavy).counts
+            unique = len(counts)
+        else:
+            unique = min(self.distinct.estimate(), n - nulls)
+        stats = {
+            'column': self.name,
+            'dtype': dtype,
+            'non_null': n - nulls,
+            'null_count': nulls,
+            'null_pct': round(nulls / n * 100, 2) if n > 0 else np.nan,
+            'unique': unique,
+            'unique_pct': round(unique / n * 100, 2) if n > 0 else 0,
+        }
+        if nulls == n:
+            return stats
+
+        numeric = pd.api.types.is_numeric_dtype(np.dtype(dtype)) and dtype != 'bool'
+        if numeric:
+            if self.exact:
+                counts = self.heavy.counts
+                q1, median, q3 = (_counts_quantile(counts, q) for q in (0.25, 0.5, 0.75))
+                iqr = q3 - q1
+                values = counts.index.to_numpy(dtype=np.float64)
+                outside = (values < q1 - 1.5*iqr) | (values > q3 + 1.5*iqr)
+                outliers = int(counts.to_numpy()[outside].sum())
+            else:
+                q1, median, q3 = (self.digest.quantile(q) for q in (0.25, 0.5, 0.75))
+                iqr = q3 - q1
+                below, upto_hi = self.digest.cdf([q1 - 1.5*iqr, q3 + 1.5*iqr])
+                outliers = int(round((below + 1 - upto_hi) * self.moments.n))
+            stats.update({
+                'mean': round(self.moments.mean, 2),
+                'std': round(self.moments.std, 2),
+                'min': self.moments.min,
+                'max': self.moments.max,
+                'median': median,
+                'outlier_count': outliers,
+                'outlier_pct': round(outliers / (n - nulls) * 100, 2),
+            })
+        else:
+            mode, count = MisraGries.top(self._as_text(self.heavy))
+            if mode is None:  # every value rarer than n/k: all ties, smallest wins
+                mode, count = self.smallest, 1
+            stats['mode'] = str(mode)
+            stats['mode_freq'] = round(count / n * 100, 2) if stats['mode'] else 0
+            if dtype == 'object':
+                stats['has_leading_space'] = self.has_leading_space
+                stats['has_trailing_space'] = self.has_trailing_space
+                stats['case_inconsistent'] = self.case_inconsistent
+        return stats
+
+
+def _row_hashes(chunk: pd.DataFrame) -> np.ndarray:
+    """One 64-bit hash per row, stable across chunks (FNV-style column fold)."""
+    hashes = np.full(len(chunk), 0xcbf29ce484222325, dtype=np.uint64)
+    prime = np.uint64(0x100000001b3)
+    for col in chunk.columns:
+        hashes = (hashes ^ hash_values(chunk[col])) * prime
+    return hashes
+
+
+def profile_csv_streaming(path: Path, name: str, chunksize: int = 100_000) -> dict:
+    """
+    analyze_dataframe() in one bounded-memory pass over a CSV.
+
+    WHY: Files larger than RAM cannot be read whole. Each chunk updates
+         mergeable sketches (Welford moments, t-digest, HyperLogLog,
+         Misra-Gries) and is then dropped, so memory is bounded by the
+         chunk size plus a few KB per column.
+
+    Exact: rows, nulls, complete rows, mean/std/min/max, whitespace flags, and
+    unique/mode/quantiles/outliers for columns with <= 1000 distinct values.
+    Approximate: the same stats for high-cardinality columns, and duplicate
+    rows (rows minus a HyperLogLog row count; reported only when above the
+    sketch's 3-sigma noise).
+    """
+    sketches = {}
+    rows_seen = HyperLogLog(p=16)
+    rows = complete_rows = 0
+    memory = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        rows += len(chunk)
+        complete_rows += int(chunk.notna().all(axis=1).sum())
+        memory += int(chunk.memory_usage(deep=True).sum())
+        rows_seen.update_hashes(_row_hashes(chunk))
+        for col in chunk.columns:
+            sketches.setdefault(col, ColumnSketch(col)).update(chunk[col])
+
+    duplicates = max(rows - rows_seen.estimate(), 0)
+    if duplicates <= 3 * rows_seen.relative_error * rows:
+        duplicates = 0
+    return {
+        'name': name,
+        'rows': rows,
+        'columns': len(sketches),
+        'memory_mb': round(memory / 1e6, 2),
+        'duplicate_rows': int(duplicates),
+        'complete_rows': complete_rows,
+        'complete_rows_pct': round(complete_rows / rows * 100, 2) if rows > 0 else 0,
+        'column_stats': [sketch.stats() for sketch in sketches.values()]
+    }
+
+
+# =============================================================================
+# JOIN COVERAGE
+# =============================================================================
+
+# (dataset, column, key space, extraction regex or None)
+JOIN_KEYS = [
+    ('id_business', 'id', 'business_id', None),
+    ('google_reviews', 'Business_ID', 'business_id', None),
+    ('id_business', 'code', 'mobis_code', None),
+    ('full_shop_infos', 'Aramis code', 'mobis_code', None),
+    ('sms_surveys', 'SHOP_Shop Name + Aramis code', 'mobis_code', r'(MOBIS\d+)'),
+]
+CASE_INSENSITIVE_KEYS = {'mobis_code'}  # id_business mixes mobis467 / MOBIS467
+ORPHAN_EXAMPLES = 5
+
+
+def build_key_index(series: pd.Series, pattern: str = None, upper: bool = False) -> dict:
+    """
+    Hash index of one candidate key column: {key -> rows}, in one pass.
+
+    Keys are stripped (and upper-cased for case-insensitive key spaces); with
+    `pattern`, the key is the regex capture (e.g. the MOBIS code embedded in
+    the SMS shop name), and rows without a match count as missing.
+    """
+    keys = series.astype('string').str.strip()
+    if pattern:
+        keys = keys.str.extract(pattern, expand=False)
+    if upper:
+        keys = keys.str.upper()
+    counts = keys.value_counts(dropna=True)
+    return {
+        'counts': counts,
+        'rows': len(series),
+        'missing': int(len(series) - counts.sum()),
+    }
+
+
+def join_coverage(dfs: dict, join_keys: list = JOIN_KEYS) -> pd.DataFrame:
+    """
+    Coverage, orphan keys and fan-out for every pair of sources sharing a key space.
+
+    WHY: Unlinked rows (e.g. the SMS surveys whose shop has no MOBIS code in
+         dim_shops) should be known before cleaning, not found in the final
+         join counts. Each file's key column is indexed once; every pair is
+         then scored from the indexes alone, in both directions:
+         - row coverage: left rows whose key exists on the right
+         - key coverage: distinct left keys that exist on the right
+         - orphans: left keys missing on the right (most frequent first)
+         - fan-out: right rows per matched key; max 1 means the join cannot
+           multiply left rows (cheap, safe lookup)
+    """
+    indexes = [(name, col, space,
+                build_key_index(dfs[name][col], pattern, upper=space in CASE_INSENSITIVE_KEYS))
+               for name, col, space, pattern in join_keys
+               if name in dfs and col in dfs[name].columns]
+
+    rows = []
+    for left_name, left_col, space, left in indexes:
+        for right_name, right_col, right_space, right in indexes:
+            if right_space != space or right_name == left_name:
+                continue
+            left_counts, right_counts = left['counts'], right['counts']
+            matched = left_counts.index.isin(right_counts.index)
+            orphans = left_counts[~matched]
+            fan_out = right_counts.reindex(left_counts.index[matched])
+            joined_rows = int((left_counts[matched] * fan_out).sum())
+            rows.append({
+                'left': f"{left_name}.{left_col}",
+                'right': f"{right_name}.{right_col}",
+                'key': space,
+                'left_rows': left['rows'],
+                'left_missing_key': left['missing'],
+                'left_keys': len(left_counts),
+                'matched_keys': int(matched.sum()),
+                'key_coverage_pct': round(matched.mean() * 100, 2) if len(left_counts) else 0,
+                'matched_rows': int(left_counts[matched].sum()),
+                'row_coverage_pct': round(left_counts[matched].sum() / left['rows'] * 100, 2)
+                                    if left['rows'] else 0,
+                'orphan_keys': len(orphans),
+                'orphan_rows': int(orphans.sum()),
+                'orphan_examples': ', '.join(orphans.index[:ORPHAN_EXAMPLES]),
+                'max_fan_out': int(fan_out.max()) if len(fan_out) else 0,
+                'joined_rows': joined_rows,
+                'safe_lookup': bool(len(fan_out) == 0 or fan_out.max() == 1),
+            })
+    return pd.DataFrame(rows)
+
+
+# =============================================================================
+# PROFILE CACHE
+# =============================================================================
+
+CACHE_PATH = OUTPUT_PATH / 'cache'
+
+
+def file_fingerprint(path: Path) -> str:
+    """Content hash of a source file (read in 1 MB blocks)."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def column_fingerprint(series: pd.Series) -> str:
+    """Content hash of a parsed column (dtype + values, index ignored)."""
+    digest = hashlib.blake2b(str(series.dtype).encode(), digest_size=16)
+    digest.update(pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ProfileCache:
+    """
+    analyze_dataframe() results cached per (file hash, column name, column hash).
+
+    WHY: During cleaning iterations usually one source changes at a time.
+         An unchanged file (same bytes) reuses its whole entry, without even
+         parsing it in summary mode. A changed file only re-profiles the columns
+         whose content hash moved; whole-frame stats (duplicates, complete
+         rows) are recomputed since any column can change them.
+
+    One pickle per source in eda_output/cache/, holding only its latest version.
+    """
+
+    def __init__(self, path: Path = CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, name: str) -> dict:
+        try:
+            with open(self.path / f'{name}.pkl', 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return {}
+
+    def _store(self, name: str, entry: dict):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / f'{name}.pkl', 'wb') as f:
+            pickle.dump(entry, f)
+
+    def lookup(self, name: str, file_hash: str) -> dict:
+        """Cached results for an unchanged file, else None."""
+        entry = self._load(name)
+        if entry.get('file_hash') != file_hash:
+            return None
+        self.hits += len(entry['results']['column_stats'])
+        return entry['results']
+
+    def analyze(self, df: pd.DataFrame, name: str, file_hash: str) -> dict:
+        """analyze_dataframe(), profiling only columns missing from the cache."""
+        entry = self._load(name)
+        if entry.get('file_hash') == file_hash:
+            self.hits += len(df.columns)
+            return entry['results']
+
+        cached = entry.get('columns', {})
+        keys = {col: (col, column_fingerprint(df[col])) for col in df.columns}
+        stale = [col for col in df.columns if keys[col] not in cached]
+        fresh = dict(zip(stale, profile_columns(df[stale]))) if stale else {}
+        self.hits += len(df.columns) - len(stale)
+        self.misses += len(stale)
+
+        results = analyze_dataframe(df, name, column_stats=[
+            fresh[col] if col in fresh else cached[keys[col]] for col in df.columns
+        ])
+        self._store(name, {
+            'file_hash': file_hash,
+            'results': results,
+            'columns': {keys[col]: stats for col, stats in zip(df.columns, results['column_stats'])},
+        })
+        return results
+
+
+# =============================================================================
+# SAMPLED EDA
+# =============================================================================
+
+def sample_csv(path: Path, size: int, strata_col: str = None, chunksize: int = 100_000,
+               seed: int = SAMPLE_SEED) -> tuple:
+    """
+    Reservoir sample of a CSV in one streaming pass -> (sample_df, population_rows).
+
+    WHY: Chunks are read as raw text so a column is never split into int and
+         str pieces; the sample is then re-parsed like a small CSV, giving the
+         dtypes a full read_csv would give on those rows.
+    """
+    sampler = ReservoirSampler(size, strata_col=strata_col, seed=seed)
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False):
+        sampler.update(chunk)
+    buffer = io.StringIO()
+    sampler.sample().to_csv(buffer, index=False)
+    buffer.seek(0)
+    return pd.read_csv(buffer), sampler.rows
+
+
+def percent_margin(pct: float, n: int, population: int, z: float = SAMPLE_Z) -> float:
+    """
+    Half-width (percentage points) of a Wilson interval for a sampled percentage.
+
+    Uses the finite population correction: the error shrinks to 0 as the
+    sample approaches the whole file.
+    """
+    if n == 0 or pd.isna(pct):
+        return np.nan
+    if population <= n:
+        return 0.0
+    n_eff = n * (population - 1) / (population - n)
+    p = pct / 100
+    denom = 1 + z**2 / n_eff
+    margin = z * np.sqrt(p * (1 - p) / n_eff + z**2 / (4 * n_eff**2)) / denom
+    return round(margin * 100, 2)
+
+
+def add_error_bars(results: dict, population: int):
+    """
+    Annotate analyze_dataframe() results of a sample with +/- margins.
+
+    Adds *_moe columns next to the row-share percentages (null_pct, mode_freq,
+    outlier_pct, complete_rows_pct). unique_pct has no margin: distinct counts
+    do not scale linearly from a sample and describe the sample only.
+    """
+    n = results['rows']
+    results['population_rows'] = population
+    results['complete_rows_pct_moe'] = percent_margin(results['complete_rows_pct'], n, population)
+    for stats in results['column_stats']:
+        stats['null_pct_moe'] = percent_margin(stats['null_pct'], n, population)
+        if 'mode_freq' in stats:
+            stats['mode_freq_moe'] = percent_margin(stats['mode_freq'], n, population)
+        if 'outlier_pct' in stats:
+            # Non-null rows of the file, estimated from the sample share
+            non_null_pop = max(round(population * stats['non_null'] / n), stats['non_null'])
+            stats['outlier_pct_moe'] = percent_margin(stats['outlier_pct'], stats['non_null'],
+                                                      non_null_pop)
+
+
 # =============================================================================
 # MAIN EDA
 # =============================================================================
 
-def main():
+def print_overview(all_results: dict):
+    """Overview summary table (one row per dataset)."""
+    print("\n--- OVERVIEW SUMMARY ---")
+    summary_data = []
+    for name, res in all_results.items():
+        summary_data.append({
+            'Dataset': name,
+            'Rows': res['rows'],
+            'Columns': res['columns'],
+            'Memory (MB)': res['memory_mb'],
+            'Duplicates': res['duplicate_rows'],
+            'Complete %': res['complete_rows_pct']
+        })
+        if 'population_rows' in res:
+            summary_data[-1]['± Complete %'] = res['complete_rows_pct_moe']
+            summary_data[-1]['File rows'] = res['population_rows']
+    summary_df = pd.DataFrame(summary_data)
+    print(summary_df.to_string(index=False))
+
+
+def save_results(all_results: dict, issues: list, output_path: Path = OUTPUT_PATH,
+                 schemas: dict = None, coverage: pd.DataFrame = None):
+    """Write column summaries, quality_issues.csv, the inferred schema and join coverage."""
+    print_section("SAVING RESULTS")
+    output_path.mkdir(exist_ok=True)
+
+    # Save column summaries
+    for name, results in all_results.items():
+        col_df = pd.DataFrame(results['column_stats'])
+        col_df.to_csv(output_path / f'{name}_columns.csv', index=False)
+        print(f"Saved: {name}_columns.csv")
+
+    # Save issues
+    if issues:
+        issues_df = pd.DataFrame(issues)
+        issues_df.to_csv(output_path / 'quality_issues.csv', index=False)
+        print("Saved: quality_issues.csv")
+
+    # Save inferred schema (read by clean_orange_cx.py)
+    if schemas:
+        print(f"Saved: {save_schema(schemas, output_path).name}")
+
+    # Save join coverage
+    if coverage is not None and len(coverage):
+        coverage.to_csv(output_path / 'join_coverage.csv', index=False)
+        print("Saved: join_coverage.csv")
+
+    print(f"\nEDA Complete! Results in: {output_path}")
+    print(f"Finished: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+
+def main_summary(stream: bool = False, chunksize: int = 100_000, use_cache: bool = True):
+    """
+    Quick EDA: phase 1 overview, column stats and quality issues.
+
+    Phases 2-9 need whole dataframes (head(), duplicated rows, joins) and are
+    skipped; run the default mode for those. With the profile cache, unchanged
+    files are not even parsed. With stream=True every file is profiled chunk by
+    chunk in bounded memory (approximate for high-cardinality columns).
+    """
+    cache = ProfileCache() if use_cache and not stream else None
     print_section("ORANGE CX INTELLIGENCE - EXPLORATORY DATA ANALYSIS")
     print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Output directory: {OUTPUT_PATH}")
+    if stream:
+        print(f"Mode: streaming ({chunksize:,} rows per chunk, approximate for high-cardinality columns)")
+    else:
+        print(f"Mode: summary{' (profile cache: ' + str(cache.path) + ')' if cache else ''}")
+
+    print_section("PHASE 1: PROFILE & OVERVIEW")
+
+    all_results = {}
+    for name, filename in FILES.items():
+        filepath = BASE_PATH / filename
+        try:
+            if stream:
+                results = profile_csv_streaming(filepath, name, chunksize=chunksize)
+            elif cache:
+                file_hash = file_fingerprint(filepath)
+                results = cache.lookup(name, file_hash)
+                if results is None:
+                    results = cache.analyze(pd.read_csv(filepath), name, file_hash)
+            else:
+                results = analyze_dataframe(pd.read_csv(filepath), name)
+            all_results[name] = results
+            print(f"✓ {name}: {results['rows']:,} rows × {results['columns']} columns")
+        except Exception as e:
+            print(f"✗ {name}: Error - {e}")
+
+    if cache:
+        print(f"\nProfile cache: {cache.hits} columns reused, {cache.misses} recomputed")
+    print_overview(all_results)
+    print("\nPhases 2-9 need whole dataframes and are skipped in this mode.")
+
+    print_section("PHASE 10: QUALITY ISSUES SUMMARY")
+
+    issues = quality_issues_from_results(all_results)
+    if issues:
+        print(pd.DataFrame(issues).to_string(index=False))
+    else:
+        print("No critical issues found")
+
+    save_results(all_results, issues)
+
+
+def main(parallel: bool = False, workers: int = None, sample_size: int = None,
+         stratify: bool = False, use_cache: bool = True):
+    output_path = OUTPUT_PATH / 'sample' if sample_size else OUTPUT_PATH
+    # Samples change every run; parallel mode profiles everything on the pool
+    cache = ProfileCache() if use_cache and not sample_size and not parallel else None
+    print_section("ORANGE CX INTELLIGENCE - EXPLORATORY DATA ANALYSIS")
+    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Output directory: {output_path}")
+    if parallel:
+        print(f"Mode: parallel profiling ({workers or os.cpu_count()} workers)")
+    if sample_size:
+        kind = "shop-stratified" if stratify else "uniform"
+        print(f"Mode: {kind} reservoir sample of {sample_size:,} rows per file "
+              f"(± = {SAMPLE_Z:g}-sigma error bars)")
 
     # -------------------------------------------------------------------------
     # PHASE 1: DATA LOADING & OVERVIEW
@@ -131,35 +968,42 @@ def main():
 
     dfs = {}
     all_results = {}
+    population = {}
 
     for name, filename in FILES.items():
         filepath = BASE_PATH / filename
         try:
-            df = pd.read_csv(filepath)
+            if sample_size:
+                strata_col = SAMPLE_STRATA.get(name) if stratify else None
+                df, population[name] = sample_csv(filepath, sample_size, strata_col=strata_col)
+                print(f"✓ {name}: {len(df):,} sampled of {population[name]:,} rows × {len(df.columns)} columns")
+            else:
+                df = pd.read_csv(filepath)
+                print(f"✓ {name}: {len(df):,} rows × {len(df.columns)} columns")
             dfs[name] = df
-            print(f"✓ {name}: {len(df):,} rows × {len(df.columns)} columns")
 
-            # Analyze
-            results = analyze_dataframe(df, name)
-            all_results[name] = results
+            # Analyze (parallel mode profiles all files together below)
+            if cache:
+                all_results[name] = cache.analyze(df, name, file_fingerprint(filepath))
+            elif not parallel:
+                results = analyze_dataframe(df, name)
+                all_results[name] = results
 
         except Exception as e:
             print(f"✗ {name}: Error - {e}")
 
+    if parallel:
+        all_results = analyze_dataframes_parallel(dfs, workers=workers)
+
+    for name, rows in population.items():
+        if name in all_results:
+            add_error_bars(all_results[name], rows)
+
+    if cache:
+        print(f"\nProfile cache: {cache.hits} columns reused, {cache.misses} recomputed")
+
     # Summary table
-    print("\n--- OVERVIEW SUMMARY ---")
-    summary_data = []
-    for name, res in all_results.items():
-        summary_data.append({
-            'Dataset': name,
-            'Rows': res['rows'],
-            'Columns': res['columns'],
-            'Memory (MB)': res['memory_mb'],
-            'Duplicates': res['duplicate_rows'],
-            'Complete %': res['complete_rows_pct']
-        })
-    summary_df = pd.DataFrame(summary_data)
-    print(summary_df.to_string(index=False))
+    print_overview(all_results)
 
     # -------------------------------------------------------------------------
     # PHASE 2: COLUMN-LEVEL ANALYSIS
@@ -194,6 +1038,8 @@ def main():
             'missing': missing.values,
             'missing_pct': missing_pct.values
         })
+        if name in population:
+            missing_df['± pct'] = [percent_margin(p, len(df), population[name]) for p in missing_pct]
         missing_df = missing_df[missing_df['missing'] > 0].sort_values('missing_pct', ascending=False)
 
         if len(missing_df) == 0:
@@ -226,27 +1072,29 @@ def main():
     # -------------------------------------------------------------------------
     print_section("PHASE 5: DATA TYPE ISSUES")
 
+    schemas = {}
     for name, df in dfs.items():
         print(f"\n--- {name.upper()} ---")
         issues = []
+        schemas[name] = schema = infer_schema(df)
 
         for col in df.columns:
             dtype = str(df[col].dtype)
+            info = schema[col]
+            if dtype != 'object':
+                continue
 
             # Check for dates stored as strings
-            if 'date' in col.lower() or 'timestamp' in col.lower():
-                if dtype == 'object':
-                    issues.append(f"  '{col}': Date column stored as object (string)")
+            if 'date' in col.lower() or 'timestamp' in col.lower() or info['type'] in TEMPORAL_TYPES:
+                issues.append(f"  '{col}': Date column stored as object (string)"
+                              + (f" - {info['type']}, format {info['format'] or 'mixed'}, "
+                                 f"{info['match_rate']:.0%} parseable"
+                                 if info['type'] in TEMPORAL_TYPES else ""))
 
             # Check for numeric stored as strings
-            if dtype == 'object':
-                sample = df[col].dropna().head(100)
-                try:
-                    numeric_test = pd.to_numeric(sample, errors='coerce')
-                    if numeric_test.notna().mean() > 0.9:  # >90% can be converted
-                        issues.append(f"  '{col}': Possibly numeric, stored as object")
-                except:
-                    pass
+            elif info['type'] in NUMERIC_TYPES:
+                issues.append(f"  '{col}': Possibly numeric ({info['type']}, "
+                              f"{info['match_rate']:.0%} convertible), stored as object")
 
         if issues:
             print("\n".join(issues))
@@ -352,6 +1200,15 @@ def main():
             if sample.notna().any():
                 print(f"  Sample extracted: {sample.dropna().iloc[:3].tolist()}")
 
+    # Coverage of every candidate join, from one key index per file
+    print("\n--- JOIN COVERAGE (left -> right) ---")
+    coverage = join_coverage(dfs)
+    if len(coverage):
+        print(coverage[['left', 'right', 'row_coverage_pct', 'key_coverage_pct', 'orphan_keys',
+                        'orphan_rows', 'max_fan_out', 'safe_lookup']].to_string(index=False))
+        for row in coverage[coverage['orphan_keys'] > 0].itertuples():
+            print(f"  Orphans {row.left} -> {row.right}: {row.orphan_examples}")
+
     # -------------------------------------------------------------------------
     # PHASE 9: DATE/TIME ANALYSIS
     # -------------------------------------------------------------------------
@@ -386,41 +1243,7 @@ def main():
     # -------------------------------------------------------------------------
     print_section("PHASE 10: QUALITY ISSUES SUMMARY")
 
-    issues = []
-
-    # Check each dataset
-    for name, df in dfs.items():
-        # Missing values
-        high_missing = df.isnull().mean()
-        for col in high_missing[high_missing > 0.5].index:
-            issues.append({
-                'Dataset': name,
-                'Issue': f"High missing: {col}",
-                'Severity': 'Major',
-                'Records': f"{df[col].isnull().sum()}/{len(df)}",
-                'Action': 'Consider drop or investigate'
-            })
-
-        # Duplicates
-        if df.duplicated().sum() > 0:
-            issues.append({
-                'Dataset': name,
-                'Issue': 'Exact duplicate rows',
-                'Severity': 'Major',
-                'Records': str(df.duplicated().sum()),
-                'Action': 'Deduplicate'
-            })
-
-        # Empty columns
-        empty_cols = df.columns[df.isnull().all()].tolist()
-        for col in empty_cols:
-            issues.append({
-                'Dataset': name,
-                'Issue': f"Empty column: {col}",
-                'Severity': 'Minor',
-                'Records': str(len(df)),
-                'Action': 'Drop column'
-            })
+    issues = quality_issues_from_results(all_results)
 
     if issues:
         issues_df = pd.DataFrame(issues)
@@ -431,22 +1254,33 @@ def main():
     # -------------------------------------------------------------------------
     # SAVE RESULTS
     # -------------------------------------------------------------------------
-    print_section("SAVING RESULTS")
-
-    # Save column summaries
-    for name, results in all_results.items():
-        col_df = pd.DataFrame(results['column_stats'])
-        col_df.to_csv(OUTPUT_PATH / f'{name}_columns.csv', index=False)
-        print(f"Saved: {name}_columns.csv")
-
-    # Save issues
-    if issues:
-        issues_df.to_csv(OUTPUT_PATH / 'quality_issues.csv', index=False)
-        print("Saved: quality_issues.csv")
-
-    print(f"\nEDA Complete! Results in: {OUTPUT_PATH}")
-    print(f"Finished: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    # A sample's schema would pin types from a subset: only full runs save it
+    save_results(all_results, issues, output_path, schemas=None if sample_size else schemas,
+                 coverage=coverage)
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='EDA for Orange CX source files')
+    parser.add_argument('--parallel', action='store_true',
+                        help='Profile columns and files on a process pool')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Pool size for --parallel (default: CPU count)')
+    parser.add_argument('--sample', type=int, default=None, metavar='N',
+                        help='Run the full EDA on a reservoir sample of N rows per file')
+    parser.add_argument('--stratify', action='store_true',
+                        help='With --sample: sample proportionally within each shop')
+    parser.add_argument('--summary', action='store_true',
+                        help='Overview, column stats and quality issues only (phases 1 and 10)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Recompute every column instead of reusing eda_output/cache')
+    parser.add_argument('--stream', action='store_true',
+                        help='Profile files chunk by chunk with bounded memory (approximate)')
+    parser.add_argument('--chunksize', type=int, default=100_000,
+                        help='Rows per chunk for --stream (default: 100000)')
+    args = parser.parse_args()
+
+    if args.stream or args.summary:
+        main_summary(stream=args.stream, chunksize=args.chunksize, use_cache=not args.no_cache)
+    else:
+        main(parallel=args.parallel, workers=args.workers,
+             sample_size=args.sample, stratify=args.stratify, use_cache=not args.no_cache)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Type Inference: Orange CX Intelligence
+======================================
+Decides each column's likely type (integer, float, boolean, date, datetime,
+text) for the raw CSV exports, where dates and numbers often arrive as strings.
+
+1. Adaptive sample: test a small random sample of distinct values against
+   precompiled patterns; grow the sample (32 -> 2048) only while the verdict
+   is still ambiguous.
+2. Confirm: one vectorized pass of the winning pattern over all distinct
+   values gives the exact match rate (weighted by frequency).
+
+The inferred schema is saved by the EDA (eda_output/inferred_schema.json) and
+used by the clean stage to pin read_csv dtypes.
+
+Used by: eda_orange_cx.py (phase 5), clean_orange_cx.py (load_source)
+"""
+
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+SCHEMA_FILENAME = 'inferred_schema.json'
+MATCH_THRESHOLD = 0.9         # share of values that must match (EDA's ">90% convertible")
+SAMPLE_SIZES = (32, 128, 512, 2048)
+INFERENCE_SEED = 42
+
+# Most specific first: the first type reaching the threshold wins.
+# (type, pattern, strptime format or None)
+PATTERNS = [
+    ('boolean', re.compile(r'(?i)true|false'), None),
+    ('integer', re.compile(r'[+-]?\d+'), None),
+    ('float', re.compile(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?'), None),
+    ('date', re.compile(r'\d{4}-\d{2}-\d{2}'), '%Y-%m-%d'),
+    ('date', re.compile(r'\d{1,2}/\d{1,2}/\d{4}'), '%d/%m/%Y'),
+    ('date', re.compile(r'\d{1,2}\.\d{1,2}\.\d{4}'), '%d.%m.%Y'),
+    ('datetime', re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?'),
+     'ISO8601'),
+    ('datetime', re.compile(r'\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}'), '%d/%m/%Y %H:%M'),
+    ('datetime', re.compile(r'\d{1,2}\.\d{1,2}\.\d{4} \d{1,2}:\d{2}'), '%d.%m.%Y %H:%M'),
+]
+
+TEMPORAL_TYPES = ('date', 'datetime')
+NUMERIC_TYPES = ('integer', 'float')
+NULLABLE_DTYPES = {'int64': 'Int64', 'float64': 'Float64'}  # blank cells load as <NA>
+
+
+# =============================================================================
+# INFERENCE
+# =============================================================================
+
+def _match_rate(values: pd.Series, counts: np.ndarray, pattern: re.Pattern) -> float:
+    """Frequency-weighted share of values that fully match a pattern."""
+    matched = values.str.fullmatch(pattern).to_numpy(dtype=bool, na_value=False)
+    return float(counts[matched].sum() / counts.sum())
+
+
+def infer_column_type(series: pd.Series, threshold: float = MATCH_THRESHOLD,
+                      seed: int = INFERENCE_SEED) -> dict:
+    """
+    Inferred type of one column.
+
+    Returns {'type', 'format', 'match_rate', 'nullable', 'sample_size'}.
+    match_rate is exact (from the confirmation pass); 'text' means no pattern
+    reached the threshold.
+    """
+    nullable = bool(series.isna().any())
+    info = {'type': 'text', 'format': None, 'match_rate': 1.0, 'nullable': nullable,
+            'sample_size': 0}
+
+    # Already parsed by read_csv: no string matching needed
+    if series.isna().all():
+        info['type'] = 'empty'
+        return info
+    if pd.api.types.is_bool_dtype(series):
+        info['type'] = 'boolean'
+        return info
+    if pd.api.types.is_numeric_dtype(series):
+        non_null = series.dropna()
+        integral = pd.api.types.is_integer_dtype(series) or bool((non_null % 1 == 0).all())
+        info['type'] = 'integer' if integral else 'float'
+        return info
+
+    counts = series.dropna().astype(str).str.strip().value_counts()
+    values = pd.Series(counts.index, dtype=object)
+    weights = counts.to_numpy()
+
+    # 1. Adaptive sample of distinct values: stop as soon as one pattern is clear
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(values))
+    candidates = list(range(len(PATTERNS)))
+    for size in SAMPLE_SIZES:
+        sample = order[:size]
+        rates = {i: _match_rate(values.iloc[sample], weights[sample], PATTERNS[i][1])
+                 for i in candidates}
+        candidates = [i for i in candidates if rates[i] >= threshold]
+        info['sample_size'] = len(sample)
+        if not candidates or size >= len(values) or rates[candidates[0]] == 1.0:
+            break
+
+    # 2. Confirm with one vectorized pass over every distinct value
+    for i in candidates:
+        type_name, pattern, fmt = PATTERNS[i]
+        rate = _match_rate(values, weights, pattern)
+        if rate >= threshold:
+            info.update({'type': type_name, 'format': fmt, 'match_rate': round(rate, 4)})
+            break
+    return info
+
+
+def infer_schema(df: pd.DataFrame, threshold: float = MATCH_THRESHOLD) -> dict:
+    """Inferred type for every column: {column: infer_column_type(...)}."""
+    schema = {}
+    for col in df.columns:
+        info = infer_column_type(df[col], threshold=threshold)
+        info['dtype'] = str(df[col].dtype)
+        schema[col] = info
+    return schema
+
+
+# =============================================================================
+# SCHEMA FILE
+# =============================================================================
+
+def save_schema(schemas: dict, output_path: Path) -> Path:
+    """Write {dataset: {column: info}} as JSON."""
+    path = output_path / SCHEMA_FILENAME
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(schemas, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_schema(path: Path) -> dict:
+    """Schemas saved by the EDA, or {} when the EDA has not been run."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def read_dtypes(schema: dict) -> dict:
+    """
+    read_csv dtype pins for one dataset's schema.
+
+    WHY: Pins keep the values read_csv infers on the profiled file, so outputs
+         do not move, while a new drop still loads when it differs: numeric
+         pins are the nullable Int64/Float64, so a blank cell becomes <NA>
+         instead of failing the read. Columns that were all blank are not
+         pinned (the next drop may fill them with text).
+         Partially matching columns (e.g. '5' mixed with free text) and all
+         temporal columns stay text: parsing stays in the cleaning steps.
+    """
+    dtypes = {}
+    for col, info in schema.items():
+        if info['type'] == 'empty':
+            continue
+        if info['dtype'] == 'object':
+            dtypes[col] = 'str'
+        elif info['type'] in NUMERIC_TYPES and info['match_rate'] == 1.0:
+            dtypes[col] = NULLABLE_DTYPES.get(info['dtype'], info['dtype'])
+    return dtypes
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Verbatim Similarity Search: Orange CX Intelligence
+==================================================
+"Find reviews like this one" over all Google and SMS verbatims, locally.
+
+WHY: Similar-feedback lookups (is this complaint isolated? which shops hear
+     the same thing?) should not need an external embedding service.
+
+- Vectors: character 3-5-gram TF-IDF (sublinear tf, smooth idf), feature-hashed
+  with random signs into 1024 float32 dims and L2-normalized, so cosine = dot
+- Storage: one memory-mapped float32 matrix (docs x dims) + metadata CSV
+- Search: top-k cosine by batched matrix products over row blocks
+- Optional IVF index: spherical k-means centroids; a query scores only the
+  lists of its `nprobe` nearest centroids (for corpora too large to scan)
+- Agent tool: find_similar_verbatims(query, k) -> str
+
+Usage:
+    uv run python similarity_orange_cx.py --build [--ivf]
+    uv run python similarity_orange_cx.py --query "attente trop longue" --k 5
+    uv run python similarity_orange_cx.py --like 138390235
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dedup_orange_cx import normalize_text
+from text_orange_cx import load_verbatims
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+INDEX_PATH = Path(__file__).parent / 'clean_output' / 'similarity_index'
+NGRAM_RANGE = (3, 5)
+DIMENSIONS = 1024
+BLOCK_ROWS = 65_536        # rows scored per matrix product
+KMEANS_ITERATIONS = 10
+DEFAULT_NPROBE = 8
+SEED = 42
+
+
+# =============================================================================
+# VECTORIZER
+# =============================================================================
+
+def char_ngrams(text: pd.Series, ngram_range: tuple = NGRAM_RANGE) -> tuple:
+    """(doc ids, 64-bit n-gram hashes) over space-padded normalized text."""
+    lo, hi = ngram_range
+    docs, grams = [], []
+    for i, s in enumerate(normalize_text(text).fillna('').to_numpy()):
+        s = f" {s} "
+        doc_grams = [s[j:j + n] for n in range(lo, hi + 1) for j in range(len(s) - n + 1)]
+        docs.append(np.full(len(doc_grams), i, dtype=np.int64))
+        grams.extend(doc_grams)
+    if not grams:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+    return np.concatenate(docs), pd.util.hash_array(np.asarray(grams, dtype=object))
+
+
+class HashedTfidf:
+    """
+    Character n-gram TF-IDF, feature-hashed to a fixed number of dimensions.
+
+    The idf table is kept per 64-bit n-gram hash (sorted, searched with
+    searchsorted), so hashing collisions only happen in the final projection,
+    where random signs keep dot products unbiased.
+    """
+
+    def __init__(self, dimensions: int = DIMENSIONS):
+        self.dimensions = dimensions
+        self.gram_hashes = np.empty(0, dtype=np.uint64)
+        self.idf = np.empty(0, dtype=np.float32)
+        self.n_docs = 0
+
+    def fit(self, text: pd.Series) -> 'HashedTfidf':
+        doc_ids, hashes = char_ngrams(text)
+        pairs = np.unique(np.column_stack([doc_ids.astype(np.uint64), hashes]), axis=0)
+        self.gram_hashes, doc_freq = np.unique(pairs[:, 1], return_counts=True)
+        self.n_docs = len(text)
+        self.idf = (np.log((1 + self.n_docs) / (1 + doc_freq)) + 1).astype(np.float32)
+        return self
+
+    def transform(self, text: pd.Series) -> np.ndarray:
+        """(len(text), dimensions) float32, rows L2-normalized."""
+        doc_ids, hashes = char_ngrams(text)
+        vectors = np.zeros((len(text), self.dimensions), dtype=np.float32)
+        if len(hashes) == 0:
+            return vectors
+        key, counts = np.unique(np.column_stack([doc_ids.astype(np.uint64), hashes]),
+                                axis=0, return_counts=True)
+        docs, grams = key[:, 0].astype(np.int64), key[:, 1]
+
+        # n-grams never seen at fit time get the idf of df = 0
+        table = np.r_[self.gram_hashes, np.uint64(0)]
+        idf = np.r_[self.idf, np.float32(np.log(1 + self.n_docs) + 1)]
+        pos = np.searchsorted(self.gram_hashes, grams)
+        pos = np.where(table[pos] == grams, pos, len(self.gram_hashes))
+        idf = idf[pos]
+
+        weights = (1 + np.log(counts)) * idf
+        columns = (grams % np.uint64(self.dimensions)).astype(np.int64)
+        signs = np.where((grams >> np.uint64(63)) & np.uint64(1), -1.0, 1.0)
+        np.add.at(vectors, (docs, columns), (weights * signs).astype(np.float32))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+    def save(self, path: Path):
+        np.savez(path / 'vectorizer.npz', gram_hashes=self.gram_hashes, idf=self.idf,
+                 n_docs=self.n_docs, dimensions=self.dimensions)
+
+    @classmethod
+    def load(cls, path: Path) -> 'HashedTfidf':
+        data = np.load(path / 'vectorizer.npz')
+        vectorizer = cls(int(data['dimensions']))
+        vectorizer.gram_hashes, vectorizer.idf = data['gram_hashes'], data['idf']
+        vectorizer.n_docs = int(data['n_docs'])
+        return vectorizer
+
+
+# =============================================================================
+# SEARCH
+# =============================================================================
+
+def top_k_cosine(matrix: np.ndarray, queries: np.ndarray, k: int,
+                 rows: np.ndarray = None, block_rows: int = BLOCK_ROWS) -> tuple:
+    """
+    (indices, scores), each (n_queries, k), best first.
+
+    Scores `queries @ block.T` one block of rows at a time, so a memory-mapped
+    matrix is streamed from disk and memory stays at block_rows x n_queries.
+    `rows` restricts the search to a subset (IVF candidate lists).
+    """
+    n = len(matrix) if rows is None else len(rows)
+    k = min(k, n)
+    best_idx = np.empty((len(queries), 0), dtype=np.int64)
+    best_score = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, n, block_rows):
+        if rows is None:
+            ids = np.arange(start, min(start + block_rows, n))
+            block = matrix[start:start + block_rows]
+        else:
+            ids = np.sort(rows[start:start + block_rows])  # sorted reads on the memmap
+            block = matrix[ids]
+        scores = queries @ block.T
+        idx = np.concatenate([best_idx, np.broadcast_to(ids, scores.shape)], axis=1)
+        scores = np.concatenate([best_score, scores], axis=1)
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k] if scores.shape[1] > k \
+            else np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        best_idx = np.take_along_axis(idx, keep, axis=1)
+        best_score = np.take_along_axis(scores, keep, axis=1)
+    order = np.argsort(-best_score, axis=1, kind='stable')
+    return np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_score, order, axis=1)
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = KMEANS_ITERATIONS,
+                     seed: int = SEED) -> np.ndarray:
+    """Unit-norm centroids maximizing cosine to their members (sampled fit)."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), 50 * n_clusters),
+                                        replace=False))]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        centroids = np.where(empty[:, None], centroids, sums / np.where(norms > 0, norms, 1))
+    return centroids.astype(np.float32)
+
+
+class SimilarityIndex:
+    """Memory-mapped verbatim vectors, their metadata and an optional IVF index."""
+
+    def __init__(self, path: Path = INDEX_PATH):
+        self.path = path
+        self.vectorizer = HashedTfidf.load(path)
+        self.docs = pd.read_csv(path / 'docs.csv', dtype={'record_id': str, 'shop_id': str, 'rating': 'Int64'})
+        self.vectors = np.load(path / 'vectors.npy', mmap_mode='r')
+        self.centroids = self.list_ptr = self.list_rows = None
+        if (path / 'ivf.npz').exists():
+            ivf = np.load(path / 'ivf.npz')
+            self.centroids, self.list_ptr, self.list_rows = \
+                ivf['centroids'], ivf['list_ptr'], ivf['list_rows']
+
+    @staticmethod
+    def build(path: Path = INDEX_PATH, ivf: bool = False, n_lists: int = None,
+              docs: pd.DataFrame = None) -> 'SimilarityIndex':
+        """Vectorize the clean fact verbatims and write the index to `path`."""
+        path.mkdir(parents=True, exist_ok=True)
+        docs = load_verbatims() if docs is None else docs
+        vectorizer = HashedTfidf().fit(docs['text'])
+        vectorizer.save(path)
+
+        # np.save + mmap_mode keeps the float32 matrix on disk, paged in on demand
+        vectors = np.lib.format.open_memmap(path / 'vectors.npy', mode='w+', dtype=np.float32,
+                                            shape=(len(docs), vectorizer.dimensions))
+        for start in range(0, len(docs), BLOCK_ROWS):
+            vectors[start:start + BLOCK_ROWS] = vectorizer.transform(
+                docs['text'].iloc[start:start + BLOCK_ROWS])
+        vectors.flush()
+        docs.to_csv(path / 'docs.csv', index=False)
+
+        if ivf:
+            n_lists = n_lists or max(1, int(np.sqrt(len(docs))))
+            centroids = spherical_kmeans(np.asarray(vectors), n_lists)
+            assign = np.concatenate([
+                np.argmax(vectors[s:s + BLOCK_ROWS] @ centroids.T, axis=1)
+                for s in range(0, len(docs), BLOCK_ROWS)
+            ])
+            list_rows = np.argsort(assign, kind='stable')
+            list_ptr = np.r_[0, np.cumsum(np.bincount(assign, minlength=n_lists))]
+            np.savez(path / 'ivf.npz', centroids=centroids, list_ptr=list_ptr, list_rows=list_rows)
+        elif (path / 'ivf.npz').exists():
+            (path / 'ivf.npz').unlink()
+
+        with open(path / 'index.json', 'w') as f:
+            json.dump({'documents': len(docs), 'dimensions': vectorizer.dimensions,
+                       'ivf_lists': int(n_lists) if ivf else 0}, f, indent=2)
+        return SimilarityIndex(path)
+
+    def _search(self, queries: np.ndarray, k: int, nprobe: int = None) -> list:
+        """Top-k rows per query vector; IVF probing when the index has one."""
+        if self.centroids is None or nprobe == 0:
+            idx, scores = top_k_cosine(self.vectors, queries, k)
+            return list(zip(idx, scores))
+        nprobe = min(nprobe or DEFAULT_NPROBE, len(self.centroids))
+        nearest = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        results = []
+        for query, lists in zip(queries, nearest):
+            rows = np.concatenate([self.list_rows[self.list_ptr[c]:self.list_ptr[c + 1]]
+                                   for c in lists])
+            idx, scores = top_k_cosine(self.vectors, query[None, :], k, rows=rows)
+            results.append((idx[0], scores[0]))
+        return results
+
+    def search(self, texts, k: int = 5, nprobe: int = None) -> list:
+        """One DataFrame of the k most similar verbatims (with 'score') per query text."""
+        texts = pd.Series([texts] if isinstance(texts, str) else list(texts), dtype='string')
+        return [self.docs.iloc[idx].assign(score=np.round(scores, 4))
+                for idx, scores in self._search(self.vectorizer.transform(texts), k, nprobe)]
+
+    def like(self, record_id: str, k: int = 5, nprobe: int = None) -> pd.DataFrame:
+        """Verbatims most similar to a stored review/survey (itself excluded)."""
+        matches = np.flatnonzero(self.docs['record_id'].to_numpy() == str(record_id))
+        if len(matches) == 0:
+            raise KeyError(f"No verbatim with record_id {record_id}")
+        query = np.asarray(self.vectors[matches[:1]])
+        idx, scores = self._search(query, k + 1, nprobe)[0]
+        keep = idx != matches[0]
+        return self.docs.iloc[idx[keep][:k]].assign(score=np.round(scores[keep][:k], 4))
+
+
+# =============================================================================
+# AGENT TOOL
+# =============================================================================
+
+_INDEX = None
+
+
+def find_similar_verbatims(query: str, k: int = 5) -> str:
+    """
+    Find customer verbatims (Google reviews and SMS surveys) similar to a text.
+
+    Args:
+        query: Text to match, e.g. a complaint or a theme ("long waiting time").
+        k: Number of verbatims to return (default 5).
+
+    Returns:
+        One line per match: similarity, source, rating, shop_id, week and text.
+    """
+    global _INDEX
+    if _INDEX is None:
+        # Building vectorizes every verbatim: not something a tool call should trigger
+        if not (INDEX_PATH / 'vectors.npy').exists():
+            raise FileNotFoundError(f"No similarity index at {INDEX_PATH}: "
+                                    f"run `uv run python similarity_orange_cx.py --build` first")
+        _INDEX = SimilarityIndex()
+    matches = _INDEX.search(query, k=k)[0]
+    # Score 0 = no shared n-gram (empty or stopword-only query): not a match
+    matches = matches[matches['score'] > 0]
+    lines = [
+        f"{row.score:.2f} | {row.source} | rating {row.rating} | "
+        f"shop {row.shop_id if pd.notna(row.shop_id) else '-'} | "
+        f"{row.week} | {' '.join(str(row.text).split())[:200]}"
+        for row in matches.itertuples()
+    ]
+    return "\n".join(lines) if lines else "No similar verbatims found."
+
+
+def as_agent_tool():
+    """find_similar_verbatims wrapped as a LangChain tool (needs langchain-core)."""
+    from langchain_core.tools import tool
+    return tool(find_similar_verbatims)
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def print_section(title: str):
+    """Print a formatted section header."""
+    print(f"\n{'='*70}")
+    print(f"  {title}")
+    print(f"{'='*70}\n")
+
+
+def print_matches(matches: pd.DataFrame):
+    for row in matches.itertuples():
+        text = ' '.join(str(row.text).split())
+        print(f"  {row.score:.3f} [{row.source} | rating {row.rating} | {row.week}] {text[:140]}")
+
+
+def main(build: bool = False, ivf: bool = False, query: str = None, like: str = None,
+         k: int = 5, nprobe: int = None):
+    print_section("ORANGE CX INTELLIGENCE - VERBATIM SIMILARITY SEARCH")
+
+    if build or not (INDEX_PATH / 'vectors.npy').exists():
+        index = SimilarityIndex.build(ivf=ivf)
+        print(f"Built index: {len(index.docs):,} verbatims × {index.vectors.shape[1]} dims "
+              f"({index.vectors.nbytes / 1e6:.1f} MB float32, memory-mapped)")
+        if index.centroids is not None:
+            print(f"IVF: {len(index.centroids)} lists")
+        print(f"Saved: {INDEX_PATH}")
+    else:
+        index = SimilarityIndex()
+
+    if query:
+        print_section(f"MOST SIMILAR TO: {query}")
+        print_matches(index.search(query, k=k, nprobe=nprobe)[0])
+    if like:
+        source = index.docs[index.docs['record_id'] == str(like)]
+        print_section(f"MOST SIMILAR TO RECORD {like}")
+        if len(source):
+            print(f"  {' '.join(str(source['text'].iloc[0]).split())[:200]}\n")
+        print_matches(index.like(like, k=k, nprobe=nprobe))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local verbatim similarity search')
+    parser.add_argument('--build', action='store_true', help='(Re)build the index')
+    parser.add_argument('--ivf', action='store_true',
+                        help='With --build: add a coarse-quantization (IVF) index')
+    parser.add_argument('--query', default=None, help='Text to search for')
+    parser.add_argument('--like', default=None, help='review_id / survey_id to find similar to')
+    parser.add_argument('--k', type=int, default=5, help='Matches to return (default: 5)')
+    parser.add_argument('--nprobe', type=int, default=None,
+                        help=f'IVF lists to scan (default: {DEFAULT_NPROBE}; 0 = exact scan)')
+    args = parser.parse_args()
+
+    main(build=args.build, ivf=args.ivf, query=args.query, like=args.like,
+         k=args.k, nprobe=args.nprobe)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Mergeable Streaming Sketches: Orange CX Intelligence
+====================================================
+Bounded-memory accumulators for profiling files larger than RAM.
+
+Each accumulator is fed chunk by chunk (vectorized over the chunk) and can be
+merged with another accumulator of the same kind, so chunks - or whole files
+profiled on different workers - combine into one summary.
+
+- RunningMoments: count / mean / std / min / max (Welford, Chan merge)
+- TDigest:        quantiles and CDF (merging t-digest, k1 scale function)
+- HyperLogLog:    distinct counts (~0.8% error at p=14, 16 KB)
+- MisraGries:     heavy hitters (mode and its frequency)
+- ReservoirSampler: uniform or shop-stratified row sample
+
+Used by: eda_orange_cx.py --stream, eda_orange_cx.py --sample
+"""
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# HASHING
+# =============================================================================
+
+def hash_values(values) -> np.ndarray:
+    """
+    Stable 64-bit hashes for a chunk of values.
+
+    WHY: read_csv infers dtypes per chunk, so the same value may arrive as int
+         in one chunk and float in the next. Numbers are hashed as float64 and
+         everything else as its string form so hashes agree across chunks.
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return pd.util.hash_array(series.to_numpy(dtype=np.float64))
+    return pd.util.hash_array(series.astype(str).to_numpy(dtype=object))
+
+
+# =============================================================================
+# MOMENTS
+# =============================================================================
+
+class RunningMoments:
+    """Count, mean, variance (Welford/Chan) plus min and max."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values)
+        if len(values) == 0:
+            return
+        chunk = RunningMoments()
+        chunk.n = len(values)
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min, chunk.max = values.min(), values.max()
+        self.merge(chunk)
+
+    def merge(self, other: 'RunningMoments'):
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta**2 * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1, as pandas)."""
+        return float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else np.nan
+
+
+# =============================================================================
+# QUANTILES
+# =============================================================================
+
+class TDigest:
+    """
+    Merging t-digest (Dunning & Ertl) for quantiles and CDF.
+
+    Centroids near the tails stay small (k1 scale function), so extreme
+    quantiles - the IQR fences - keep good accuracy with ~`compression`
+    centroids in memory.
+    """
+
+    def __init__(self, compression: float = 200.0, buffer_size: int = 50_000):
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self._buffer = []
+        self._buffered = 0
+
+    @property
+    def count(self) -> float:
+        self._flush()
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        self._buffer.append(values)
+        self._buffered += len(values)
+        if self._buffered >= self.buffer_size:
+            self._flush()
+
+    def merge(self, other: 'TDigest'):
+        other._flush()
+        self._flush()
+        self._compress(np.r_[self.means, other.means], np.r_[self.weights, other.weights])
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        values = np.concatenate(self._buffer)
+        self._buffer, self._buffered = [], 0
+        self._compress(np.r_[self.means, values], np.r_[self.weights, np.ones(len(values))])
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        if total == 0:
+            self.means, self.weights = means, weights
+            return
+
+        # k1 scale: k(q) = delta/(2 pi) * asin(2q - 1). Points whose mid-rank
+        # falls in the same unit of k become one centroid (vectorized merge).
+        scale = self.compression / (2 * np.pi)
+        q_mid = (np.cumsum(weights) - weights / 2) / total
+        k = scale * np.arcsin(2 * q_mid - 1)
+        bins = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q: float) -> float:
+        """Estimated q-quantile (linear interpolation between centroids)."""
+        self._flush()
+        if len(self.means) == 0:
+            return np.nan
+        if len(self.means) == 1:
+            return float(self.means[0])
+        # Each centroid's mass is centred on its mean
+        centers = np.cumsum(self.weights) - self.weights / 2
+        target = q * self.weights.sum()
+        return float(np.interp(target, centers, self.means))
+
+    def cdf(self, x) -> np.ndarray:
+        """Estimated fraction of values <= x."""
+        self._flush()
+        if len(self.means) == 0:
+            return np.zeros_like(np.asarray(x, dtype=np.float64))
+        total = self.weights.sum()
+        centers = (np.cumsum(self.weights) - self.weights / 2) / total
+        return np.interp(x, self.means, centers, left=0.0, right=1.0)
+
+
+# =============================================================================
+# DISTINCT COUNTS
+# =============================================================================
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with linear-counting small-range correction."""
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update_hashes(self, hashes: np.ndarray):
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        # bit_length via frexp: exact, since rest < 2**53
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = ((64 - self.p) - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def update(self, values):
+        self.update_hashes(hash_values(values))
+
+    def merge(self, other: 'HyperLogLog'):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / np.sqrt(self.m)
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m**2 / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros > 0:
+            return int(round(self.m * np.log(self.m / zeros)))
+        return int(round(raw))
+
+
+# =============================================================================
+# HEAVY HITTERS
+# =============================================================================
+
+class MisraGries:
+    """
+    Misra-Gries heavy hitters (mergeable summary, Agarwal et al.).
+
+    Keeps at most k counters; any value with frequency > n/(k+1) is retained
+    and counts are underestimated by at most `error`.
+    """
+
+    def __init__(self, k: int = 1000):
+        self.k = k
+        self.counts = pd.Series(dtype=np.int64)
+        self.n = 0
+        self.error = 0
+
+    def update(self, values):
+        self.update_counts(pd.Series(values).value_counts(dropna=True))
+
+    def update_counts(self, counts: pd.Series):
+        self.n += int(counts.sum())
+        merged = self.counts.add(counts, fill_value=0)
+        self._prune(merged)
+
+    def merge(self, other: 'MisraGries'):
+        self.n += other.n
+        self.error += other.error
+        self._prune(self.counts.add(other.counts, fill_value=0))
+
+    def _prune(self, counts: pd.Series):
+        if len(counts) > self.k:
+            cut = np.partition(counts.to_numpy(), len(counts) - self.k - 1)[len(counts) - self.k - 1]
+            counts = counts - cut
+            counts = counts[counts > 0]
+            self.error += int(cut)
+        self.counts = counts.astype(np.int64)
+
+    def top(self) -> tuple:
+        """(value, count) of the most frequent value; ties -> smallest value."""
+        if self.counts.empty:
+            return None, 0
+        best = self.counts.max()
+        top = self.counts.index[self.counts.to_numpy() == best]
+        try:
+            value = min(top)
+        except TypeError:
+            value = top[0]
+        return value, int(best)  # lower bound; exact while distinct values <= k
+
+
+# =============================================================================
+# SAMPLING
+# =============================================================================
+
+class ReservoirSampler:
+    """
+    Uniform reservoir sample of rows in one pass (bottom-k on random keys).
+
+    Every row gets a uniform random key and the `size` smallest keys are kept,
+    which is a uniform sample without replacement of the rows seen so far;
+    each chunk only needs to be compared against the current cut-off key.
+
+    With `strata_col`, each stratum keeps its own `size` smallest keys and
+    sample() allocates `size` rows proportionally (min 1 row per stratum, as
+    validate_orange_cx.stratified_sample_positions). Memory is then bounded by
+    size x number of strata.
+    """
+
+    def __init__(self, size: int, strata_col: str = None, seed: int = 42):
+        self.size = size
+        self.strata_col = strata_col
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.reservoir = None
+        self.strata_sizes = pd.Series(dtype=np.int64)
+
+    def update(self, chunk: pd.DataFrame):
+        chunk = chunk.assign(_row=np.arange(self.rows, self.rows + len(chunk)),
+                             _key=self.rng.random(len(chunk)))
+        self.rows += len(chunk)
+
+        if self.strata_col is None:
+            if self.reservoir is not None and len(self.reservoir) >= self.size:
+                chunk = chunk[chunk['_key'] < self.reservoir['_key'].iloc[-1]]
+            pool = pd.concat([self.reservoir, chunk]) if self.reservoir is not None else chunk
+            self.reservoir = pool.sort_values('_key', kind='stable').head(self.size)
+            return
+
+        strata = chunk[self.strata_col].fillna('')
+        self.strata_sizes = self.strata_sizes.add(strata.value_counts(), fill_value=0)
+        chunk = chunk.assign(_stratum=strata)
+        pool = pd.concat([self.reservoir, chunk]) if self.reservoir is not None else chunk
+        pool = pool.sort_values('_key', kind='stable')
+        self.reservoir = pool.groupby('_stratum', sort=False).head(self.size)
+
+    def sample(self) -> pd.DataFrame:
+        """The sampled rows in file order (helper columns dropped)."""
+        if self.reservoir is None:
+            return pd.DataFrame()
+        sample = self.reservoir
+        if self.strata_col is not None and self.rows > self.size:
+            quota = np.maximum(1, np.round(self.strata_sizes * self.size / self.rows)).astype(np.int64)
+            rank = sample.groupby('_stratum', sort=False).cumcount()
+            sample = sample[rank.to_numpy() < sample['_stratum'].map(quota).to_numpy()]
+        sample = sample.sort_values('_row')
+        return sample.drop(columns=[c for c in ('_row', '_key', '_stratum') if c in sample.columns])
@@ -0,0 +1,53 @@
+"""
+Tests for the read_csv dtype pins (schema_orange_cx.read_dtypes)
+
+A new drop must load with the profiled schema even when it differs from the
+profiled file: blank cells in numeric columns, text in columns that were
+all blank.
+
+Usage:
+    uv run python -m pytest -q test_schema_orange_cx.py
+"""
+
+import pandas as pd
+
+import clean_orange_cx
+from schema_orange_cx import load_schema, read_dtypes
+
+SCORE = 'Satisfaction score (score on scale from 1 to 5)'
+
+
+def write_drop(path, name: str, rows: list[dict]):
+    """Raw CSV with every schema column, values from `rows` (blank elsewhere)"""
+    columns = list(load_schema(clean_orange_cx.SCHEMA_PATH)[name])
+    df = pd.DataFrame([{col: row.get(col, '') for col in columns} for row in rows], columns=columns)
+    df.to_csv(path / clean_orange_cx.FILES[name], index=False)
+
+
+def test_numeric_pins_are_nullable():
+    schemas = load_schema(clean_orange_cx.SCHEMA_PATH)
+    assert read_dtypes(schemas['sms_surveys'])[SCORE] == 'Int64'
+    assert read_dtypes(schemas['id_business'])['zipcode'] == 'Int64'
+    # All-blank columns in the profiled drop are left to read_csv
+    assert 'Key_Account_Manager_Email' not in read_dtypes(schemas['google_reviews'])
+
+
+def test_new_drop_with_blank_int_and_text_in_empty_column(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean_orange_cx, 'BASE_PATH', tmp_path)
+    write_drop(tmp_path, 'sms_surveys', [{SCORE: '4'}, {SCORE: ''}])
+    write_drop(tmp_path, 'id_business', [{'zipcode': '1000'}, {'zipcode': ''}])
+    write_drop(tmp_path, 'google_reviews', [
+        {'Key_Account_Manager_Email': 'kam@example.com', 'Shop_Manager': 'Jan Peeters'},
+        {},
+    ])
+
+    sms = clean_orange_cx.load_source('sms_surveys')
+    assert str(sms[SCORE].dtype) == 'Int64'
+    assert sms[SCORE].tolist()[0] == 4 and pd.isna(sms[SCORE].iloc[1])
+
+    business = clean_orange_cx.load_source('id_business')
+    assert business['zipcode'].iloc[0] == 1000 and pd.isna(business['zipcode'].iloc[1])
+
+    google = clean_orange_cx.load_source('google_reviews')
+    assert google['Key_Account_Manager_Email'].iloc[0] == 'kam@example.com'
+    assert google['Shop_Manager'].iloc[0] == 'Jan Peeters'
@@ -0,0 +1,49 @@
+"""
+Tests for the similarity agent tool (similarity_orange_cx.find_similar_verbatims)
+
+The tool only answers from a built index: it never builds one itself, drops
+zero-score matches and renders missing metadata readably.
+
+Usage:
+    uv run python -m pytest -q test_similarity_orange_cx.py
+"""
+
+import pandas as pd
+import pytest
+
+import similarity_orange_cx
+from similarity_orange_cx import SimilarityIndex, find_similar_verbatims
+
+DOCS = pd.DataFrame({
+    'source': ['google_reviews', 'sms_surveys', 'sms_surveys'],
+    'record_id': ['1', '2', '3'],
+    'shop_id': ['shop-a', None, 'shop-b'],
+    'date': ['2025-07-01', '2025-07-02', '2025-07-03'],
+    'rating': [1, 2, 5],
+    'text': ['Attente très longue en boutique', "L'attente était beaucoup trop longue", 'Vendeur sympa'],
+    'week': ['2025-06-30', '2025-06-30', '2025-06-30'],
+})
+
+
+@pytest.fixture
+def index_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity_orange_cx, 'INDEX_PATH', tmp_path)
+    monkeypatch.setattr(similarity_orange_cx, '_INDEX', None)
+    return tmp_path
+
+
+def test_missing_index_is_not_built(index_path):
+    with pytest.raises(FileNotFoundError, match='--build'):
+        find_similar_verbatims('attente trop longue')
+    assert not (index_path / 'vectors.npy').exists()
+
+
+def test_matches_skip_zero_scores_and_show_missing_shop(index_path):
+    SimilarityIndex.build(index_path, docs=DOCS)
+
+    lines = find_similar_verbatims('attente trop longue', k=3).splitlines()
+    assert all(float(line.split(' | ')[0]) > 0 for line in lines)
+    assert any('shop - |' in line for line in lines)
+    assert not any('nan' in line for line in lines)
+
+    assert find_similar_verbatims('', k=3) == 'No similar verbatims found.'
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Verbatim Text Analytics: Orange CX Intelligence
+===============================================
+Local term index over fact_google_reviews.verbatim and fact_sms_surveys.verbatim.
+
+WHY: The data-llm report lists verbatim themes as "limited": the only option
+     was sending every verbatim to an LLM. Most theme questions ("what do
+     1-star reviews of this shop talk about?") only need term counts, which a
+     sparse term-document matrix answers locally, without network calls.
+
+- Tokenization: lower-cased word tokens, FR/NL/EN stopwords removed
+- Term-document matrix: CSR (docs x terms) of term counts, numpy only
+- Inverted index: the same matrix transposed (term -> posting list of docs)
+- Queries: top terms per shop / week / rating, keyword drill-down
+
+Usage:
+    uv run python text_orange_cx.py
+    uv run python text_orange_cx.py --by shop_id --top 10
+    uv run python text_orange_cx.py --search "attente,wachten" --rating 1 2
+    uv run python text_orange_cx.py --translated    # English Google translations
+"""
+
+import argparse
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+CLEAN_PATH = Path(__file__).parent / 'clean_output'
+
+TOKEN_RE = re.compile(r"[^\W\d_]{2,}")  # letters only (accents kept), 2+ chars
+
+STOPWORDS = {
+    'en': set("""
+        a about after all also am an and any are as at be been before being but by can
+        could did do does doing don for from had has have having he her here hers him his
+        how if in into is it its just me more most my no nor not now of off on once only or
+        other our ours out over own same she should so some such than that the their theirs
+        them then there these they this those through to too under until up very was we
+        were what when where which while who whom why will with would you your yours ve ll
+        re didn doesn isn wasn weren won wouldn couldn shouldn haven hasn hadn aren im ive
+        get got one even really much still also
+    """.split()),
+    'fr': set("""
+        au aux avec ce ces cet cette dans de des du elle elles en et eux il ils je la le les
+        leur leurs lui ma mais me même mes moi mon ne nos notre nous on ou où par pas pour qu
+        que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous est sont était
+        été être avoir ai as avons avez ont avait fait faire très plus bien tout tous toute
+        toutes aussi comme si sans ça cela ceci là ici alors donc car ni chez encore déjà
+        peu trop y suis es sommes êtes étaient sera serait
+    """.split()),
+    'nl': set("""
+        aan al als bij dan dat de deze die dit door een en er had heb hebben heeft hem het
+        hier hij hoe hun ik in is je kan kon maar me meer men met mij mijn na naar niet nog
+        nu of om omdat ons ook op over te tot u uit van veel voor want was waren wat we wel
+        werd wij wie worden wordt zal ze zei zelf zich zij zijn zo zonder zou geen iets iemand
+        nou toch dus daar heel erg echt jullie hun onze ben bent
+    """.split()),
+}
+ALL_STOPWORDS = frozenset().union(*STOPWORDS.values())
+
+
+# =============================================================================
+# LOADING
+# =============================================================================
+
+def split_google_translation(text: pd.Series) -> pd.DataFrame:
+    """
+    Split Google verbatims into original and translated text.
+
+    Google stores either "(Translated by Google) EN\\n\\n(Original)\\nORIG" or
+    "ORIG\\n\\n(Translated by Google)\\nEN"; untranslated reviews are original.
+    """
+    text = text.astype('string')
+    translated_first = text.str.extract(
+        r'^\(Translated by Google\)\s*(?P<translated>.*?)\s*\(Original\)\s*(?P<original>.*)$',
+        flags=re.S)
+    original_first = text.str.extract(
+        r'^(?P<original>.*?)\s*\(Translated by Google\)\s*(?P<translated>.*)$', flags=re.S)
+    parts = translated_first.fillna(original_first)
+    parts['original'] = parts['original'].fillna(text)
+    parts['translated'] = parts['translated'].fillna(parts['original'])
+    return parts
+
+
+def load_verbatims(clean_path: Path = CLEAN_PATH, translated: bool = False) -> pd.DataFrame:
+    """
+    Non-empty verbatims of both fact tables with their query dimensions.
+
+    Columns: source, record_id, shop_id, date, week, rating, text.
+    """
+    reviews = pd.read_csv(clean_path / 'fact_google_reviews.csv')
+    parts = split_google_translation(reviews['verbatim'])
+    reviews = pd.DataFrame({
+        'source': 'google_reviews',
+        'record_id': reviews['review_id'].astype('Int64').astype(str),
+        'shop_id': reviews['shop_id'],
+        'date': pd.to_datetime(reviews['review_timestamp'], utc=True).dt.tz_localize(None),
+        'rating': reviews['rating'],
+        'text': parts['translated' if translated else 'original'],
+    })
+
+    surveys = pd.read_csv(clean_path / 'fact_sms_surveys.csv')
+    surveys = pd.DataFrame({
+        'source': 'sms_surveys',
+        'record_id': surveys['survey_id'].astype(str),
+        'shop_id': surveys['shop_id'],
+        'date': pd.to_datetime(surveys['interaction_date']),
+        'rating': surveys['rating'],
+        'text': surveys['verbatim'].astype('string'),
+    })
+
+    docs = pd.concat([reviews, surveys], ignore_index=True)
+    docs['rating'] = docs['rating'].astype('Int64')
+    docs['week'] = docs['date'].dt.to_period('W').dt.start_time.dt.strftime('%Y-%m-%d')
+    # '-' and similar placeholders carry no text
+    docs = docs[docs['text'].str.contains(r'[^\W\d_]', regex=True, na=False)]
+    return docs.reset_index(drop=True)
+
+
+# =============================================================================
+# TERM INDEX
+# =============================================================================
+
+def tokenize(text: pd.Series, stopwords: frozenset = ALL_STOPWORDS) -> pd.DataFrame:
+    """
+    (doc, term) pairs for a series of documents, vectorized.
+
+    One findall over the lower-cased series, exploded to one row per token;
+    stopwords are dropped with a single isin().
+    """
+    tokens = text.astype('string').str.lower().str.findall(TOKEN_RE)
+    pairs = tokens.explode().dropna()
+    pairs = pairs[~pairs.isin(stopwords)]
+    return pd.DataFrame({'doc': pairs.index.to_numpy(dtype=np.int64),
+                         'term': pairs.to_numpy(dtype=object)})
+
+
+class TermIndex:
+    """
+    Sparse term-document matrix plus inverted index over verbatims.
+
+    The matrix is CSR (doc_ptr, doc_terms, doc_counts): row d holds the term
+    ids and counts of document d. The inverted index is its transpose
+    (term_ptr, term_docs): the sorted posting list of each term. Both are
+    flat numpy arrays, so memory is ~12 bytes per distinct (doc, term) pair.
+    """
+
+    def __init__(self, docs: pd.DataFrame, stopwords: frozenset = ALL_STOPWORDS):
+        self.docs = docs.reset_index(drop=True)
+        pairs = tokenize(self.docs['text'], stopwords)
+
+        term_ids, self.terms = pd.factorize(pairs['term'], sort=True)
+        self.term_to_id = {term: i for i, term in enumerate(self.terms)}
+        n_docs, n_terms = len(self.docs), len(self.terms)
+
+        # CSR: count each (doc, term) pair once, ordered by doc then term
+        key = pairs['doc'].to_numpy() * n_terms + term_ids
+        key, counts = np.unique(key, return_counts=True)
+        docs_of_pair, terms_of_pair = key // n_terms, key % n_terms
+        self.doc_ptr = np.r_[0, np.cumsum(np.bincount(docs_of_pair, minlength=n_docs))]
+        self.doc_terms = terms_of_pair.astype(np.int32)
+        self.doc_counts = counts.astype(np.int32)
+
+        # Inverted index: same pairs ordered by term (stable keeps docs sorted)
+        order = np.argsort(terms_of_pair, kind='stable')
+        self.term_ptr = np.r_[0, np.cumsum(np.bincount(terms_of_pair, minlength=n_terms))]
+        self.term_docs = docs_of_pair[order].astype(np.int32)
+        self._pair_docs = docs_of_pair.astype(np.int32)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @property
+    def doc_freq(self) -> np.ndarray:
+        """Number of documents containing each term."""
+        return np.diff(self.term_ptr)
+
+    def postings(self, term: str) -> np.ndarray:
+        """Sorted ids of documents containing `term` (empty if unknown)."""
+        i = self.term_to_id.get(term.lower())
+        if i is None:
+            return np.empty(0, dtype=np.int32)
+        return self.term_docs[self.term_ptr[i]:self.term_ptr[i + 1]]
+
+    def doc_mask(self, **filters) -> np.ndarray:
+        """Boolean mask over documents, e.g. shop_id='...', rating=[1, 2]."""
+        mask = np.ones(len(self.docs), dtype=bool)
+        for col, value in filters.items():
+            if value is None:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= self.docs[col].isin(values).to_numpy()
+        return mask
+
+    def top_terms(self, by: str = None, n: int = 10, min_docs: int = 2, **filters) -> pd.DataFrame:
+        """
+        Most frequent terms (by document frequency), overall or per group.
+
+        `by` is a document column (shop_id, week, rating, source). 'lift' is
+        the term's share of documents in the group over its share overall:
+        > 1 means the term is typical of that group rather than of all
+        verbatims. Terms in fewer than `min_docs` group documents are skipped.
+        """
+        mask = self.doc_mask(**filters)
+        keep = mask[self._pair_docs]
+        pair_docs, pair_terms = self._pair_docs[keep], self.doc_terms[keep]
+        overall_share = self.doc_freq / max(len(self.docs), 1)
+
+        if by is None:
+            groups = np.zeros(len(pair_docs), dtype=np.int64)
+            labels, group_sizes = np.array(['all']), np.array([mask.sum()])
+        else:
+            codes, labels = pd.factorize(self.docs[by], sort=True)
+            groups = codes[pair_docs]
+            valid = groups >= 0
+            pair_terms, groups = pair_terms[valid], groups[valid]
+            group_sizes = np.bincount(codes[mask & (codes >= 0)], minlength=len(labels))
+
+        table = pd.DataFrame({'group': groups, 'term': pair_terms})
+        table = table.value_counts().rename('docs').reset_index()
+        table = table[table['docs'] >= min_docs]
+        table['share_pct'] = (table['docs'] / group_sizes[table['group']] * 100).round(2)
+        table['lift'] = (table['share_pct'] / 100 / overall_share[table['term']]).round(2)
+        table = table.sort_values(['group', 'docs', 'term'], ascending=[True, False, True])
+        table = table.groupby('group', sort=True).head(n)
+        table.insert(0, by or 'scope', np.asarray(labels, dtype=object)[table['group']])
+        table['term'] = np.asarray(self.terms, dtype=object)[table['term']]
+        return table.drop(columns='group').reset_index(drop=True)
+
+    def search(self, keywords, match_all: bool = False, **filters) -> pd.DataFrame:
+        """
+        Keyword drill-down: documents containing any (or all) of the keywords.
+
+        Posting lists are merged with numpy set operations; filters restrict
+        to e.g. a shop, week or rating. Matches are most-hits first.
+        """
+        if isinstance(keywords, str):
+            keywords = [k.strip() for k in keywords.split(',') if k.strip()]
+        lists = [self.postings(k) for k in keywords]
+        if not lists:
+            return self.docs.iloc[0:0]
+        if match_all:
+            hits = lists[0]
+            for posting in lists[1:]:
+                hits = np.intersect1d(hits, posting, assume_unique=True)
+            counts = np.full(len(hits), len(lists))
+        else:
+            hits, counts = np.unique(np.concatenate(lists), return_counts=True)
+        keep = self.doc_mask(**filters)[hits]
+        result = self.docs.iloc[hits[keep]].assign(keyword_hits=counts[keep])
+        return result.sort_values(['keyword_hits', 'date'], ascending=[False, False])
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def print_section(title: str):
+    """Print a formatted section header."""
+    print(f"\n{'='*70}")
+    print(f"  {title}")
+    print(f"{'='*70}\n")
+
+
+def main(by: str = 'rating', top: int = 10, search: str = None, ratings: list = None,
+         shop_id: str = None, translated: bool = False):
+    print_section("ORANGE CX INTELLIGENCE - VERBATIM TERM INDEX")
+
+    docs = load_verbatims(translated=translated)
+    index = TermIndex(docs)
+    print(f"Documents: {len(index):,} verbatims "
+          f"({(docs['source'] == 'google_reviews').sum():,} reviews, "
+          f"{(docs['source'] == 'sms_surveys').sum():,} surveys)")
+    print(f"Vocabulary: {len(index.terms):,} terms, {len(index.doc_terms):,} (doc, term) pairs")
+    print(f"Text: {'English translations' if translated else 'original language (FR/NL/EN)'}")
+
+    print_section("TOP TERMS OVERALL")
+    print(index.top_terms(n=top * 2, rating=ratings, shop_id=shop_id).to_string(index=False))
+
+    print_section(f"TOP TERMS BY {by.upper()}")
+    print(index.top_terms(by=by, n=top, rating=ratings, shop_id=shop_id).to_string(index=False))
+
+    if search:
+        print_section(f"DRILL-DOWN: {search}")
+        hits = index.search(search, rating=ratings, shop_id=shop_id)
+        print(f"Matching verbatims: {len(hits):,}")
+        for row in hits.head(top).itertuples():
+            text = ' '.join(str(row.text).split())
+            print(f"  [{row.source} | rating {row.rating} | {row.week}] {text[:150]}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local term index over CX verbatims')
+    parser.add_argument('--by', default='rating', choices=['rating', 'shop_id', 'week', 'source'],
+                        help='Group for the top-terms table (default: rating)')
+    parser.add_argument('--top', type=int, default=10, help='Terms per group (default: 10)')
+    parser.add_argument('--search', default=None,
+                        help='Comma-separated keywords to drill down on')
+    parser.add_argument('--rating', type=int, nargs='+', default=None,
+                        help='Only verbatims with these ratings')
+    parser.add_argument('--shop-id', default=None, help='Only verbatims of this shop')
+    parser.add_argument('--translated', action='store_true',
+                        help='Use Google English translations instead of original text')
+    args = parser.parse_args()
+
+    main(by=args.by, top=args.top, search=args.search, ratings=args.rating,
+         shop_id=args.shop_id, translated=args.translated)
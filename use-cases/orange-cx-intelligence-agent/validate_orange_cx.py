@@ -12,18 +12,49 @@ Validates 4 dimensions:
 
 Pass threshold: 95% per dimension (configurable)
 
+Checks are declared per table in validation_spec.json and compiled into a
+deduplicated plan grouped by column; checks on the same column share one
+value_counts() pass and one date parse.
+
+With --fail-fast, checks are scheduled up front and the run stops as soon as
+any dimension can no longer reach the threshold (exit code 1).
+
+With --sample N, per-row checks run on a stratified sample of N rows per
+table (strata = shop_id). Pass rates get Wilson confidence intervals and a
+dimension certifies on its interval's lower bound. Exact checks re-run only
+for dimensions the sample cannot decide.
+
+Every check records its wall time, rows/second and peak allocation
+(validation_results.csv + cost summary); --profile writes a cProfile trace.
+
+Failing rows of every check are kept as compact row bitmaps and a bounded
+sample of them is written to validation_output/failing_rows/ for debugging.
+
 Usage:
     uv run python validate_orange_cx.py
     uv run python validate_orange_cx.py --threshold 0.99
+    uv run python validate_orange_cx.py --spec my_spec.json
+    uv run python validate_orange_cx.py --fail-fast
+    uv run python validate_orange_cx.py --sample 2000 --confidence 0.99
+    uv run python validate_orange_cx.py --max-failing-rows 0   # all failing rows
+    uv run python validate_orange_cx.py --profile gate.prof    # then: python -m pstats gate.prof
 """
 
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
+from statistics import NormalDist
 from typing import Callable
 import argparse
+import cProfile
+import json
+import pstats
+import re
+import sys
+import time
+import tracemalloc
 
 # =============================================================================
 # CONFIGURATION
@@ -33,12 +64,87 @@ CLEAN_PATH = Path(__file__).parent / 'clean_output'
 OUTPUT_PATH = Path(__file__).parent / 'validation_output'
 OUTPUT_PATH.mkdir(exist_ok=True)
 
+DEFAULT_SPEC_PATH = Path(__file__).parent / 'validation_spec.json'
+
 DEFAULT_THRESHOLD = 0.95  # 95% pass rate required
+DEFAULT_MAX_FAILING_ROWS = 100  # rows written per failed check (0 = all)
+FAILING_ROWS_PATH = OUTPUT_PATH / 'failing_rows'
+DEFAULT_CONFIDENCE = 0.95  # confidence level for --sample intervals
+SAMPLE_SEED = 42
 
 # =============================================================================
 # VALIDATION FRAMEWORK
 # =============================================================================
 
+class RowBitmap:
+    """
+    Compressed set of failing row positions (roaring-style container choice).
+
+    WHY: validation_failures.csv only has counts. Keeping the failing rows lets
+         us extract them without re-running ad hoc filters, but a bool mask per
+         check costs 1 byte/row. We store whichever is smaller:
+         - 'array':  sorted uint32 positions (4 bytes per failing row)
+         - 'bitmap': packed bits (1 bit per row)
+    """
+
+    __slots__ = ('kind', 'data', 'n_rows', '_count')
+
+    def __init__(self, kind: str, data: np.ndarray, n_rows: int, count: int):
+        self.kind = kind
+        self.data = data
+        self.n_rows = n_rows
+        self._count = count
+
+    @classmethod
+    def from_mask(cls, mask) -> 'RowBitmap':
+        """Build from a boolean mask aligned with the table rows."""
+        mask = np.asarray(mask, dtype=bool)
+        n_rows = len(mask)
+        count = int(np.count_nonzero(mask))
+        if count * 4 < (n_rows + 7) // 8:
+            return cls('array', np.flatnonzero(mask).astype(np.uint32), n_rows, count)
+        return cls('bitmap', np.packbits(mask), n_rows, count)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def indices(self, limit: int = None) -> np.ndarray:
+        """Positions of failing rows, optionally only the first `limit`."""
+        if self.kind == 'array':
+            return self.data if limit is None else self.data[:limit]
+        # Unpack in chunks so a bounded sample never materializes the full mask
+        chunk_bytes = 1 << 17  # 1M rows per chunk
+        found = []
+        remaining = self._count if limit is None else min(limit, self._count)
+        for start in range(0, len(self.data), chunk_bytes):
+            if remaining <= 0:
+                break
+            bits = np.unpackbits(self.data[start:start + chunk_bytes])
+            pos = np.flatnonzero(bits)[:remaining] + start * 8
+            pos = pos[pos < self.n_rows]
+            found.append(pos)
+            remaining -= len(pos)
+        return np.concatenate(found).astype(np.uint32) if found else np.empty(0, np.uint32)
+
+    def remap(self, positions: np.ndarray, n_rows: int) -> 'RowBitmap':
+        """Translate positions in a sample back to positions in the full table."""
+        mask = np.zeros(n_rows, dtype=bool)
+        mask[positions[self.indices()]] = True
+        return RowBitmap.from_mask(mask)
+
+    def to_mask(self) -> np.ndarray:
+        """Expand back into a boolean mask."""
+        if self.kind == 'array':
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[self.data] = True
+            return mask
+        return np.unpackbits(self.data, count=self.n_rows).astype(bool)
+
+
 @dataclass
 class ValidationResult:
     """Result of a single validation check."""
@@ -49,66 +155,282 @@ class ValidationResult:
     failed: int
     total: int
     details: str = ""
+    failing_rows: RowBitmap = field(default=None, repr=False)
+    sample_rate: float = 1.0  # fraction of table rows checked (< 1 in --sample mode)
+    # Rows the check read; 0 for schema-only checks (column names)
+    rows_scanned: int = 0
+    # Cost, filled in by PendingCheck.run(). Shared intermediates (ColumnCache)
+    # are charged to the first check of the column that builds them.
+    elapsed_s: float = 0.0
+    peak_bytes: int = 0
 
     @property
     def pass_rate(self) -> float:
         return self.passed / self.total if self.total > 0 else 1.0
 
+    @property
+    def rows_per_s(self) -> float:
+        """Scan throughput; NaN for schema-only checks (no rows read)."""
+        if not self.rows_scanned:
+            return float('nan')
+        return self.rows_scanned / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    @property
+    def is_sampled(self) -> bool:
+        return self.sample_rate < 1.0
+
     @property
     def is_pass(self) -> bool:
         return self.failed == 0
 
 
+def wilson_interval(passed: int, total: int, z: float) -> tuple:
+    """Wilson score interval for a pass rate (well-behaved near 0% and 100%)."""
+    if total == 0:
+        return 1.0, 1.0
+    p = passed / total
+    denom = 1 + z**2 / total
+    center = (p + z**2 / (2 * total)) / denom
+    margin = z * np.sqrt(p * (1 - p) / total + z**2 / (4 * total**2)) / denom
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def stratified_sample_positions(df: pd.DataFrame, n: int, strata_col: str = 'shop_id',
+                                seed: int = SAMPLE_SEED) -> np.ndarray:
+    """
+    Row positions of a stratified random sample of ~n rows.
+
+    WHY: Failures cluster by shop (one bad export, one unmapped chain). Proportional
+         allocation per shop_id (NULL = its own stratum, min 1 row per stratum)
+         keeps every shop represented instead of trusting a plain random draw.
+    """
+    if n >= len(df):
+        return np.arange(len(df))
+    rng = np.random.default_rng(seed)
+    if strata_col in df.columns:
+        codes, _ = pd.factorize(df[strata_col], use_na_sentinel=False)
+    else:
+        codes = np.zeros(len(df), dtype=np.intp)
+    sizes = np.bincount(codes)
+    quota = np.maximum(1, np.round(sizes * n / len(df))).astype(np.intp)
+
+    # Shuffle within strata, then keep the first `quota` rows of each stratum
+    order = np.lexsort((rng.random(len(df)), codes))
+    sorted_codes = codes[order]
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    rank = np.arange(len(df)) - starts[sorted_codes]
+    return np.sort(order[rank < quota[sorted_codes]])
+
+
+@dataclass
+class PendingCheck:
+    """A scheduled check that has not run yet."""
+    table: str
+    dimension: str
+    max_total: int  # upper bound on the check's `total`
+    check_fn: Callable
+    df: pd.DataFrame = field(repr=False)
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    cache: 'ColumnCache' = field(default=None, repr=False)  # shared with the table's other checks
+    sample_positions: np.ndarray = field(default=None, repr=False)
+
+    def run(self) -> ValidationResult:
+        cache = self.cache or ColumnCache(self.df)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        result = self.check_fn(cache.df, *self.args, table=self.table, cache=cache,
+                               **self.kwargs)
+        result.elapsed_s = time.perf_counter() - start
+        if tracing:
+            result.peak_bytes = tracemalloc.get_traced_memory()[1] - base
+        if self.sample_positions is None:
+            return result
+        # cache.df is the sample here (see ValidationReport.run_sampled)
+        result.sample_rate = len(cache.df) / len(self.df)
+        if result.failing_rows is not None:
+            result.failing_rows = result.failing_rows.remap(self.sample_positions, len(self.df))
+        return result
+
+
 @dataclass
 class ValidationReport:
     """Aggregated validation results."""
     results: list = field(default_factory=list)
     threshold: float = DEFAULT_THRESHOLD
+    fail_fast: bool = False
+    confidence: float = DEFAULT_CONFIDENCE
+    pending: list = field(default_factory=list)
+    skipped: int = 0
+    aborted: str = ""
+
+    def schedule(self, check_fn: Callable, df: pd.DataFrame, *args, table: str,
+                 cache: 'ColumnCache' = None, **kwargs):
+        """Queue a check; it runs later in run_pending()."""
+        max_total = len(df.columns) if check_fn is check_column_names_valid else len(df)
+        self.pending.append(PendingCheck(
+            table=table,
+            dimension=CHECK_DIMENSIONS[check_fn],
+            max_total=max_total,
+            check_fn=check_fn,
+            df=df,
+            args=args,
+            kwargs=kwargs,
+            cache=cache
+        ))
+
+    def run_pending(self):
+        """
+        Run scheduled checks in order.
+
+        In fail-fast mode, stop once a dimension's best-case score (every
+        remaining check passing all its rows) is below threshold: no outcome of
+        the remaining checks can certify the data any more.
+        """
+        current_table = None
+        while self.pending:
+            check = self.pending.pop(0)
+            if check.table != current_table:
+                current_table = check.table
+                print(f"\n--- Validating {current_table} ---")
+            self.add(check.run())
+
+            if self.fail_fast:
+                dimensions = set(r.dimension for r in self.results)
+                doomed = [d for d in sorted(dimensions)
+                          if self.best_case_score(d) < self.threshold]
+                if doomed:
+                    self.skipped = len(self.pending)
+                    self.pending.clear()
+                    self.aborted = f"{', '.join(doomed)} cannot reach threshold"
+                    print(f"\n  ✗ FAIL-FAST: {self.aborted}; "
+                          f"skipped {self.skipped} remaining checks")
+
+    def run_sampled(self, sample_size: int):
+        """
+        Run per-row checks on a stratified sample, the rest exactly.
+
+        A dimension is decided by the sample when its whole confidence interval
+        sits on one side of the threshold. Sampled checks of undecided
+        dimensions are then re-run on the full tables.
+        """
+        scheduled, self.pending = self.pending, []
+        samples = {}  # table -> (positions, cache over the sampled rows)
+        sampled = []  # exact versions of the checks that run on a sample
+        for check in scheduled:
+            if check.check_fn in SAMPLEABLE_CHECKS and len(check.df) > sample_size:
+                key = id(check.df)
+                if key not in samples:
+                    positions = stratified_sample_positions(check.df, sample_size)
+                    profiled = check.cache.profiled if check.cache else ()
+                    samples[key] = positions, ColumnCache(check.df.iloc[positions], profiled)
+                positions, cache = samples[key]
+                sampled.append(check)
+                check = replace(check, sample_positions=positions, cache=cache)
+            self.pending.append(check)
+
+        # Bounds on sampled scores are not best-case bounds: fail-fast waits for exact checks
+        fail_fast, self.fail_fast = self.fail_fast, False
+        self.run_pending()
+        self.fail_fast = fail_fast
+
+        dimensions = sorted(set(r.dimension for r in self.results))
+        inconclusive = []
+        for d in dimensions:
+            low, high = self.dimension_bounds(d)
+            if low < self.threshold <= high:
+                inconclusive.append(d)
+        if not inconclusive:
+            print(f"\n  Sample conclusive for all dimensions "
+                  f"({self.confidence*100:.0f}% confidence)")
+            return
+
+        print(f"\n  Sample inconclusive for {', '.join(inconclusive)}: running exact checks")
+        self.results = [r for r in self.results
+                        if not (r.is_sampled and r.dimension in inconclusive)]
+        self.pending = [c for c in sampled if c.dimension in inconclusive]
+        self.run_pending()
+
+    def pass_rate_interval(self, result: ValidationResult) -> tuple:
+        """Confidence interval of a result's pass rate (a point for exact checks)."""
+        if not result.is_sampled:
+            return result.pass_rate, result.pass_rate
+        z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        return wilson_interval(result.passed, result.total, z)
 
     def add(self, result: ValidationResult):
         self.results.append(result)
         status = "✓" if result.is_pass else "✗"
         rate = f"{result.pass_rate*100:.1f}%"
+        if result.is_sampled:
+            low, high = self.pass_rate_interval(result)
+            rate += f" [{low*100:.1f}%, {high*100:.1f}%] sample n={result.total}"
         print(f"  {status} [{result.dimension}] {result.check_name}: {rate} ({result.failed} failures)")
         if result.details and result.failed > 0:
             print(f"      {result.details}")
 
+    @staticmethod
+    def _score(results: list) -> float:
+        """Pooled pass rate; sampled results are scaled up to full-table counts."""
+        if not results:
+            return 1.0
+        total_passed = sum(r.passed / r.sample_rate for r in results)
+        total_records = sum(r.total / r.sample_rate for r in results)
+        return total_passed / total_records if total_records > 0 else 1.0
+
     def dimension_score(self, dimension: str) -> float:
         """Calculate pass rate for a dimension."""
+        return self._score([r for r in self.results if r.dimension == dimension])
+
+    def dimension_bounds(self, dimension: str) -> tuple:
+        """
+        (low, high) bounds of a dimension score.
+
+        Sampled checks are weighted by their estimated full-table total and
+        contribute their interval ends; exact checks contribute their pass
+        rate, so with no sampled checks both bounds equal dimension_score().
+        """
         dim_results = [r for r in self.results if r.dimension == dimension]
-        if not dim_results:
-            return 1.0
-        total_passed = sum(r.passed for r in dim_results)
-        total_records = sum(r.total for r in dim_results)
+        weights = [r.total / r.sample_rate for r in dim_results]
+        total_weight = sum(weights)
+        if total_weight == 0:
+            return 1.0, 1.0
+        intervals = [self.pass_rate_interval(r) for r in dim_results]
+        low = sum(w * lo for w, (lo, _) in zip(weights, intervals)) / total_weight
+        high = sum(w * hi for w, (_, hi) in zip(weights, intervals)) / total_weight
+        return low, high
+
+    def best_case_score(self, dimension: str) -> float:
+        """Upper bound on the final dimension score given the pending checks."""
+        dim_results = [r for r in self.results if r.dimension == dimension]
+        headroom = sum(p.max_total for p in self.pending if p.dimension == dimension)
+        total_passed = sum(r.passed for r in dim_results) + headroom
+        total_records = sum(r.total for r in dim_results) + headroom
         return total_passed / total_records if total_records > 0 else 1.0
 
     def table_score(self, table: str) -> float:
         """Calculate pass rate for a table."""
-        table_results = [r for r in self.results if r.table == table]
-        if not table_results:
-            return 1.0
-        total_passed = sum(r.passed for r in table_results)
-        total_records = sum(r.total for r in table_results)
-        return total_passed / total_records if total_records > 0 else 1.0
+        return self._score([r for r in self.results if r.table == table])
 
     @property
     def overall_score(self) -> float:
         """Overall pass rate across all checks."""
-        if not self.results:
-            return 1.0
-        total_passed = sum(r.passed for r in self.results)
-        total_records = sum(r.total for r in self.results)
-        return total_passed / total_records if total_records > 0 else 1.0
+        return self._score(self.results)
 
     @property
     def is_certified(self) -> bool:
-        """True if all dimensions pass threshold."""
+        """True if all dimensions pass threshold (lower bound for sampled checks)."""
+        if self.aborted:
+            return False
         dimensions = set(r.dimension for r in self.results)
-        return all(self.dimension_score(d) >= self.threshold for d in dimensions)
+        return all(self.dimension_bounds(d)[0] >= self.threshold for d in dimensions)
 
     def to_dataframe(self) -> pd.DataFrame:
         """Export results as DataFrame."""
-        return pd.DataFrame([
+        df = pd.DataFrame([
             {
                 'table': r.table,
                 'dimension': r.dimension,
@@ -117,183 +439,285 @@ class ValidationReport:
                 'failed': r.failed,
                 'total': r.total,
                 'pass_rate': r.pass_rate,
-                'details': r.details
+                'details': r.details,
+                'elapsed_ms': round(r.elapsed_s * 1000, 3),
+                'rows_scanned': r.rows_scanned,
+                'rows_per_s': round(r.rows_per_s) if r.rows_scanned else np.nan,
+                'peak_mb': round(r.peak_bytes / 1e6, 3)
             }
             for r in self.results
         ])
+        if any(r.is_sampled for r in self.results):
+            intervals = [self.pass_rate_interval(r) for r in self.results]
+            df['sample_rate'] = [r.sample_rate for r in self.results]
+            df['ci_low'] = [lo for lo, _ in intervals]
+            df['ci_high'] = [hi for _, hi in intervals]
+        return df
 
 
 # =============================================================================
 # VALIDATION CHECKS
 # =============================================================================
 
-def check_not_null(df: pd.DataFrame, column: str, table: str) -> ValidationResult:
+class ColumnCache:
+    """
+    Per-table intermediates shared by all checks of a compiled plan.
+
+    WHY: Checks used to rescan (and copy) the table independently: `rating` was
+         filtered by not_null, range and distribution alike. Now each column is
+         hashed once into value_counts(), which answers null counts, duplicates,
+         FK/set membership, ranges and the mode. Date columns are parsed once.
+         Row-level masks are only built for checks that actually fail.
+    """
+
+    def __init__(self, df: pd.DataFrame, profiled: set = ()):
+        self.df = df
+        self.profiled = set(profiled)  # columns whose value_counts() the plan shares
+        self._counts = {}
+        self._datetimes = {}
+
+    def value_counts(self, column: str) -> pd.Series:
+        if column not in self._counts:
+            self._counts[column] = self.df[column].value_counts(dropna=True)
+        return self._counts[column]
+
+    def null_count(self, column: str) -> int:
+        if column in self.profiled or column in self._counts:
+            return len(self.df) - int(self.value_counts(column).sum())
+        return int(self.df[column].isna().sum())
+
+    def datetime(self, column: str) -> pd.Series:
+        if column not in self._datetimes:
+            self._datetimes[column] = pd.to_datetime(self.df[column], errors='coerce', utc=True)
+        return self._datetimes[column]
+
+
+def _fail_mask(values) -> np.ndarray:
+    """Normalize a boolean Series (possibly nullable) into a numpy mask."""
+    if isinstance(values, pd.Series):
+        return values.to_numpy(dtype=bool, na_value=False)
+    return np.asarray(values, dtype=bool)
+
+
+def check_not_null(df: pd.DataFrame, column: str, table: str,
+                   cache: ColumnCache = None) -> ValidationResult:
     """Check that a column has no null values."""
+    cache = cache or ColumnCache(df)
     total = len(df)
-    nulls = df[column].isna().sum()
+    nulls = cache.null_count(column)
     return ValidationResult(
         check_name=f"{column} not null",
         dimension="COMPLETENESS",
         table=table,
+        rows_scanned=len(df),
         passed=total - nulls,
         failed=nulls,
         total=total,
-        details=f"{nulls} null values" if nulls > 0 else ""
+        details=f"{nulls} null values" if nulls > 0 else "",
+        failing_rows=RowBitmap.from_mask(_fail_mask(df[column].isna())) if nulls else None
     )
 
 
-def check_unique(df: pd.DataFrame, column: str, table: str) -> ValidationResult:
+def check_unique(df: pd.DataFrame, column: str, table: str,
+                 cache: ColumnCache = None) -> ValidationResult:
     """Check that a column has unique values (primary key check)."""
+    cache = cache or ColumnCache(df)
     total = len(df)
-    dupes = df[column].duplicated().sum()
+    # Every row beyond the first of each distinct value (NULLs count as one value)
+    has_nulls = cache.null_count(column) > 0
+    dupes = total - len(cache.value_counts(column)) - int(has_nulls)
     return ValidationResult(
         check_name=f"{column} unique",
         dimension="UNIQUENESS",
         table=table,
+        rows_scanned=len(df),
         passed=total - dupes,
         failed=dupes,
         total=total,
-        details=f"{dupes} duplicate values" if dupes > 0 else ""
+        details=f"{dupes} duplicate values" if dupes > 0 else "",
+        failing_rows=RowBitmap.from_mask(_fail_mask(df[column].duplicated())) if dupes else None
     )
 
 
 def check_foreign_key(df: pd.DataFrame, column: str, valid_values: set,
-                      table: str, allow_null: bool = True) -> ValidationResult:
+                      table: str, allow_null: bool = True,
+                      cache: ColumnCache = None) -> ValidationResult:
     """Check that foreign key values exist in reference set."""
+    cache = cache or ColumnCache(df)
+    counts = cache.value_counts(column)
+    nulls = cache.null_count(column)
+    invalid = int(counts[~counts.index.isin(valid_values)].sum())
     if allow_null:
-        mask = df[column].notna()
-        subset = df[mask]
+        total = len(df) - nulls
     else:
-        subset = df
-
-    total = len(subset)
-    invalid = (~subset[column].isin(valid_values)).sum()
+        total = len(df)
+        invalid += nulls
+
+    failing_rows = None
+    if invalid:
+        fail = ~_fail_mask(df[column].isin(valid_values))
+        if allow_null:
+            fail &= _fail_mask(df[column].notna())
+        failing_rows = RowBitmap.from_mask(fail)
     return ValidationResult(
         check_name=f"{column} FK valid",
         dimension="UNIQUENESS",
         table=table,
+        rows_scanned=len(df),
         passed=total - invalid,
         failed=invalid,
         total=total,
-        details=f"{invalid} invalid FK references" if invalid > 0 else ""
+        details=f"{invalid} invalid FK references" if invalid > 0 else "",
+        failing_rows=failing_rows
     )
 
 
 def check_range(df: pd.DataFrame, column: str, min_val, max_val,
-                table: str) -> ValidationResult:
+                table: str, cache: ColumnCache = None) -> ValidationResult:
     """Check that numeric values are within expected range."""
-    subset = df[df[column].notna()]
-    total = len(subset)
-    out_of_range = ((subset[column] < min_val) | (subset[column] > max_val)).sum()
+    cache = cache or ColumnCache(df)
+    counts = cache.value_counts(column)
+    total = int(counts.sum())
+    out_of_range = int(counts[(counts.index < min_val) | (counts.index > max_val)].sum())
+
+    failing_rows = None
+    if out_of_range:
+        values = df[column]
+        failing_rows = RowBitmap.from_mask(_fail_mask((values < min_val) | (values > max_val)))
     return ValidationResult(
         check_name=f"{column} in [{min_val}, {max_val}]",
         dimension="VALIDITY",
         table=table,
+        rows_scanned=len(df),
         passed=total - out_of_range,
         failed=out_of_range,
         total=total,
-        details=f"{out_of_range} out of range" if out_of_range > 0 else ""
+        details=f"{out_of_range} out of range" if out_of_range > 0 else "",
+        failing_rows=failing_rows
     )
 
 
 def check_date_range(df: pd.DataFrame, column: str, min_date: str, max_date: str,
-                     table: str) -> ValidationResult:
+                     table: str, cache: ColumnCache = None) -> ValidationResult:
     """Check that dates are within expected range."""
-    subset = df[df[column].notna()].copy()
-    subset[column] = pd.to_datetime(subset[column], errors='coerce', utc=True)
-    subset = subset[subset[column].notna()]
+    cache = cache or ColumnCache(df)
+    parsed = cache.datetime(column)
+    mask = _fail_mask(parsed.notna())
 
-    total = len(subset)
+    total = int(mask.sum())
     min_dt = pd.to_datetime(min_date, utc=True)
     max_dt = pd.to_datetime(max_date, utc=True)
-    out_of_range = ((subset[column] < min_dt) | (subset[column] > max_dt)).sum()
+    fail = mask & _fail_mask((parsed < min_dt) | (parsed > max_dt))
+    out_of_range = int(fail.sum())
     return ValidationResult(
         check_name=f"{column} in [{min_date[:10]}, {max_date[:10]}]",
         dimension="VALIDITY",
         table=table,
+        rows_scanned=len(df),
         passed=total - out_of_range,
         failed=out_of_range,
         total=total,
-        details=f"{out_of_range} out of range" if out_of_range > 0 else ""
+        details=f"{out_of_range} out of range" if out_of_range > 0 else "",
+        failing_rows=RowBitmap.from_mask(fail)
     )
 
 
 def check_values_in_set(df: pd.DataFrame, column: str, valid_values: set,
-                        table: str) -> ValidationResult:
+                        table: str, cache: ColumnCache = None) -> ValidationResult:
     """Check that categorical values are in allowed set."""
-    subset = df[df[column].notna()]
-    total = len(subset)
-    invalid = (~subset[column].isin(valid_values)).sum()
+    cache = cache or ColumnCache(df)
+    counts = cache.value_counts(column)
+    total = int(counts.sum())
+    invalid = int(counts[~counts.index.isin(valid_values)].sum())
+
+    failing_rows = None
+    if invalid:
+        values = df[column]
+        failing_rows = RowBitmap.from_mask(
+            _fail_mask(values.notna()) & ~_fail_mask(values.isin(valid_values))
+        )
     return ValidationResult(
         check_name=f"{column} values valid",
         dimension="VALIDITY",
         table=table,
+        rows_scanned=len(df),
         passed=total - invalid,
         failed=invalid,
         total=total,
-        details=f"{invalid} invalid values" if invalid > 0 else ""
+        details=f"{invalid} invalid values" if invalid > 0 else "",
+        failing_rows=failing_rows
     )
 
 
 def check_distribution_not_constant(df: pd.DataFrame, column: str, table: str,
-                                     max_single_value_pct: float = 0.99) -> ValidationResult:
+                                     max_single_value_pct: float = 0.99,
+                                     cache: ColumnCache = None) -> ValidationResult:
     """Check that a column isn't constant (>99% same value)."""
-    subset = df[df[column].notna()]
-    total = len(subset)
+    cache = cache or ColumnCache(df)
+    counts = cache.value_counts(column)
+    total = int(counts.sum())
 
     if total == 0:
         return ValidationResult(
             check_name=f"{column} distribution varies",
             dimension="CONSISTENCY",
             table=table,
+            rows_scanned=len(df),
             passed=0, failed=0, total=0,
             details="No non-null values"
         )
 
-    mode_count = subset[column].value_counts().iloc[0]
+    mode_value, mode_count = counts.index[0], counts.iloc[0]
     mode_pct = mode_count / total
 
     if mode_pct > max_single_value_pct:
+        # Failing rows = the rows holding the dominant value
         return ValidationResult(
             check_name=f"{column} distribution varies",
             dimension="CONSISTENCY",
             table=table,
+            rows_scanned=len(df),
             passed=0, failed=total, total=total,
-            details=f"{mode_pct*100:.1f}% same value (suspiciously uniform)"
+            details=f"{mode_pct*100:.1f}% same value (suspiciously uniform)",
+            failing_rows=RowBitmap.from_mask(_fail_mask(df[column] == mode_value))
         )
 
     return ValidationResult(
         check_name=f"{column} distribution varies",
         dimension="CONSISTENCY",
         table=table,
+        rows_scanned=len(df),
         passed=total, failed=0, total=total
     )
 
 
 def check_temporal_order(df: pd.DataFrame, before_col: str, after_col: str,
-                         table: str) -> ValidationResult:
+                         table: str, cache: ColumnCache = None) -> ValidationResult:
     """Check that timestamp A <= timestamp B."""
-    subset = df[df[before_col].notna() & df[after_col].notna()].copy()
-    subset[before_col] = pd.to_datetime(subset[before_col], errors='coerce', utc=True)
-    subset[after_col] = pd.to_datetime(subset[after_col], errors='coerce', utc=True)
-    subset = subset[subset[before_col].notna() & subset[after_col].notna()]
-
-    total = len(subset)
-    violations = (subset[before_col] > subset[after_col]).sum()
+    cache = cache or ColumnCache(df)
+    before = cache.datetime(before_col)
+    after = cache.datetime(after_col)
+    mask = _fail_mask(before.notna() & after.notna())
+
+    total = int(mask.sum())
+    fail = mask & _fail_mask(before > after)
+    violations = int(fail.sum())
     return ValidationResult(
         check_name=f"{before_col} <= {after_col}",
         dimension="CONSISTENCY",
         table=table,
+        rows_scanned=len(df),
         passed=total - violations,
         failed=violations,
         total=total,
-        details=f"{violations} temporal violations" if violations > 0 else ""
+        details=f"{violations} temporal violations" if violations > 0 else "",
+        failing_rows=RowBitmap.from_mask(fail)
     )
 
 
-def check_column_names_valid(df: pd.DataFrame, table: str) -> ValidationResult:
+def check_column_names_valid(df: pd.DataFrame, table: str,
+                             cache: ColumnCache = None) -> ValidationResult:
     """Check that column names are valid BigQuery identifiers."""
-    import re
     pattern = re.compile(r'^[a-z][a-z0-9_]*$')
     total = len(df.columns)
     invalid = [c for c in df.columns if not pattern.match(c)]
@@ -308,91 +732,156 @@ def check_column_names_valid(df: pd.DataFrame, table: str) -> ValidationResult:
     )
 
 
-# =============================================================================
-# TABLE-SPECIFIC VALIDATION
-# =============================================================================
-
-def validate_dim_shops(df: pd.DataFrame, report: ValidationReport):
-    """Validate dim_shops table."""
-    print("\n--- Validating dim_shops ---")
-
-    # Schema
-    report.add(check_column_names_valid(df, "dim_shops"))
-
-    # Completeness
-    report.add(check_not_null(df, "shop_id", "dim_shops"))
-    report.add(check_not_null(df, "mobis_code", "dim_shops"))
-    report.add(check_not_null(df, "shop_name", "dim_shops"))
-
-    # Uniqueness
-    report.add(check_unique(df, "shop_id", "dim_shops"))
-    report.add(check_unique(df, "mobis_code", "dim_shops"))
+CHECK_DIMENSIONS = {
+    check_not_null: "COMPLETENESS",
+    check_unique: "UNIQUENESS",
+    check_foreign_key: "UNIQUENESS",
+    check_range: "VALIDITY",
+    check_date_range: "VALIDITY",
+    check_values_in_set: "VALIDITY",
+    check_column_names_valid: "VALIDITY",
+    check_distribution_not_constant: "CONSISTENCY",
+    check_temporal_order: "CONSISTENCY",
+}
+
+# Per-row checks whose pass rate can be estimated from a sample. Uniqueness
+# and distribution checks depend on the whole column and always run exactly.
+SAMPLEABLE_CHECKS = {
+    check_not_null,
+    check_foreign_key,
+    check_range,
+    check_date_range,
+    check_values_in_set,
+    check_temporal_order,
+}
 
-    # Validity
-    if 'language' in df.columns:
-        report.add(check_values_in_set(df, "language", {"NL", "FR", "BI"}, "dim_shops"))
 
+# =============================================================================
+# FAILING ROW EXTRACTION
+# =============================================================================
 
-def validate_fact_google_reviews(df: pd.DataFrame, report: ValidationReport,
-                                  valid_shop_ids: set):
-    """Validate fact_google_reviews table."""
-    print("\n--- Validating fact_google_reviews ---")
-
-    # Schema
-    report.add(check_column_names_valid(df, "fact_google_reviews"))
-
-    # Completeness
-    report.add(check_not_null(df, "review_id", "fact_google_reviews"))
-    report.add(check_not_null(df, "shop_id", "fact_google_reviews"))
-    report.add(check_not_null(df, "rating", "fact_google_reviews"))
-
-    # Uniqueness
-    report.add(check_unique(df, "review_id", "fact_google_reviews"))
-    report.add(check_foreign_key(df, "shop_id", valid_shop_ids, "fact_google_reviews",
-                                  allow_null=False))
-
-    # Validity
-    report.add(check_range(df, "rating", 1, 5, "fact_google_reviews"))
-    report.add(check_date_range(df, "review_timestamp", "2025-01-01", "2025-12-31",
-                                 "fact_google_reviews"))
-
-    # Consistency
-    report.add(check_distribution_not_constant(df, "rating", "fact_google_reviews"))
-    if 'response_timestamp' in df.columns:
-        report.add(check_temporal_order(df, "review_timestamp", "response_timestamp",
-                                         "fact_google_reviews"))
-
-
-def validate_fact_sms_surveys(df: pd.DataFrame, report: ValidationReport,
-                               valid_shop_ids: set):
-    """Validate fact_sms_surveys table."""
-    print("\n--- Validating fact_sms_surveys ---")
-
-    # Schema
-    report.add(check_column_names_valid(df, "fact_sms_surveys"))
-
-    # Completeness
-    report.add(check_not_null(df, "survey_id", "fact_sms_surveys"))
-    report.add(check_not_null(df, "rating", "fact_sms_surveys"))
-    # Note: shop_id CAN be null (unmapped records)
+def failing_rows_filename(result: ValidationResult) -> str:
+    """Side-file name for a check, e.g. fact_google_reviews__review_id_unique.csv"""
+    slug = re.sub(r'[^a-z0-9]+', '_', result.check_name.lower()).strip('_')
+    return f"{result.table}__{slug}.csv"
+
+
+def extract_failing_rows(report: 'ValidationReport', tables: dict,
+                         max_rows: int = DEFAULT_MAX_FAILING_ROWS,
+                         output_path: Path = FAILING_ROWS_PATH) -> dict:
+    """
+    Write the offending rows of each failed check to a side file.
+
+    Only the first `max_rows` positions are decoded from the bitmap, so the
+    cost is bounded by the sample size, not by the number of failures.
+    Returns {(table, check_name): filename}.
+    """
+    output_path.mkdir(parents=True, exist_ok=True)
+    for stale in output_path.glob('*.csv'):
+        stale.unlink()
+
+    written = {}
+    for r in report.results:
+        if r.failed == 0 or r.failing_rows is None or r.table not in tables:
+            continue
+        positions = r.failing_rows.indices(limit=max_rows or None)
+        rows = tables[r.table].iloc[positions]
+        rows.insert(0, 'row_number', positions)
+        filename = failing_rows_filename(r)
+        rows.to_csv(output_path / filename, index=False)
+        written[(r.table, r.check_name)] = filename
+    return written
 
-    # Uniqueness
-    report.add(check_unique(df, "survey_id", "fact_sms_surveys"))
-    # FK check only for records that have shop_id
-    report.add(check_foreign_key(df, "shop_id", valid_shop_ids, "fact_sms_surveys",
-                                  allow_null=True))
 
-    # Validity
-    report.add(check_range(df, "rating", 1, 5, "fact_sms_surveys"))
-    report.add(check_date_range(df, "interaction_date", "2025-01-01", "2025-12-31",
-                                 "fact_sms_surveys"))
-    report.add(check_date_range(df, "response_date", "2025-01-01", "2025-12-31",
-                                 "fact_sms_surveys"))
+# =============================================================================
+# VALIDATION PLAN
+# =============================================================================
 
-    # Consistency
-    report.add(check_distribution_not_constant(df, "rating", "fact_sms_surveys"))
-    report.add(check_temporal_order(df, "interaction_date", "response_date",
-                                     "fact_sms_surveys"))
+# Spec name -> check function (see validation_spec.json)
+CHECKS = {
+    'not_null': check_not_null,
+    'unique': check_unique,
+    'foreign_key': check_foreign_key,
+    'range': check_range,
+    'date_range': check_date_range,
+    'values_in_set': check_values_in_set,
+    'distribution_not_constant': check_distribution_not_constant,
+    'temporal_order': check_temporal_order,
+    'column_names_valid': check_column_names_valid,
+}
+
+# Checks answered from the shared value_counts() of their column
+PROFILED_CHECKS = {
+    check_unique,
+    check_foreign_key,
+    check_range,
+    check_values_in_set,
+    check_distribution_not_constant,
+}
+
+
+def load_spec(path: Path = DEFAULT_SPEC_PATH) -> dict:
+    """Load the declarative validation spec."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def _check_columns(params: dict) -> list:
+    """Columns a spec entry reads."""
+    return [params[k] for k in ('column', 'before_col', 'after_col') if k in params]
+
+
+def compile_plan(spec: dict, tables: dict, report: ValidationReport):
+    """
+    Compile the spec into scheduled checks on the report.
+
+    - Duplicate entries (same check, same parameters) are dropped.
+    - Checks are grouped by column so each column's intermediates are built
+      once in a shared ColumnCache (one per table).
+    - `optional` entries are skipped when their columns are absent.
+    - `references: "table.column"` resolves to the set of non-null values of
+      that column, computed once per reference.
+    """
+    references = {}
+    for table, table_spec in spec['tables'].items():
+        df = tables[table]
+        seen = set()
+        entries = []
+        for entry in table_spec['checks']:
+            params = {k: v for k, v in entry.items() if k not in ('check', 'optional')}
+            key = (entry['check'], json.dumps(params, sort_keys=True))
+            if key in seen:
+                continue
+            seen.add(key)
+            if entry.get('optional') and not all(c in df.columns for c in _check_columns(params)):
+                continue
+
+            if 'references' in params:
+                ref = params.pop('references')
+                if ref not in references:
+                    ref_table, ref_column = ref.split('.')
+                    references[ref] = set(tables[ref_table][ref_column].dropna())
+                params['valid_values'] = references[ref]
+            elif 'valid_values' in params:
+                params['valid_values'] = set(params['valid_values'])
+            entries.append((CHECKS[entry['check']], params))
+
+        # Table-level checks first, then one group per column in spec order
+        column_order = {}
+        for check_fn, params in entries:
+            for column in _check_columns(params):
+                column_order.setdefault(column, len(column_order))
+        entries.sort(key=lambda e: min((column_order[c] for c in _check_columns(e[1])),
+                                       default=-1))
+
+        profiled = {p['column'] for fn, p in entries if fn in PROFILED_CHECKS}
+        cache = ColumnCache(df, profiled)
+        for check_fn, params in entries:
+            report.schedule(check_fn, df, table=table, cache=cache, **params)
+
+        dropped = len(table_spec['checks']) - len(entries)
+        print(f"  {table}: {len(entries)} checks over {len(column_order)} columns"
+              + (f" ({dropped} skipped/duplicate)" if dropped else ""))
 
 
 # =============================================================================
@@ -405,30 +894,40 @@ def print_section(title: str):
     print(f"{'='*70}")
 
 
-def main(threshold: float = DEFAULT_THRESHOLD):
+def main(threshold: float = DEFAULT_THRESHOLD,
+         max_failing_rows: int = DEFAULT_MAX_FAILING_ROWS,
+         fail_fast: bool = False,
+         sample_size: int = None,
+         confidence: float = DEFAULT_CONFIDENCE,
+         spec_path: Path = DEFAULT_SPEC_PATH):
     print_section("ORANGE CX INTELLIGENCE - DATA VALIDATION GATE")
     print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Threshold: {threshold*100:.0f}% per dimension")
+    if fail_fast:
+        print("Mode: fail-fast")
+    if sample_size:
+        print(f"Mode: sample ({sample_size:,} rows/table, {confidence*100:.0f}% confidence)")
 
     # Load tables
     print_section("LOADING TABLES")
-    dim_shops = pd.read_csv(CLEAN_PATH / 'dim_shops.csv')
-    fact_google_reviews = pd.read_csv(CLEAN_PATH / 'fact_google_reviews.csv')
-    fact_sms_surveys = pd.read_csv(CLEAN_PATH / 'fact_sms_surveys.csv')
-
-    print(f"dim_shops: {len(dim_shops):,} rows")
-    print(f"fact_google_reviews: {len(fact_google_reviews):,} rows")
-    print(f"fact_sms_surveys: {len(fact_sms_surveys):,} rows")
+    spec = load_spec(spec_path)
+    tables = {}
+    for table, table_spec in spec['tables'].items():
+        tables[table] = pd.read_csv(CLEAN_PATH / table_spec['file'])
+        print(f"{table}: {len(tables[table]):,} rows")
 
     # Initialize report
-    report = ValidationReport(threshold=threshold)
-    valid_shop_ids = set(dim_shops['shop_id'].dropna())
+    report = ValidationReport(threshold=threshold, fail_fast=fail_fast,
+                              confidence=confidence)
 
     # Run validations
     print_section("RUNNING VALIDATION CHECKS")
-    validate_dim_shops(dim_shops, report)
-    validate_fact_google_reviews(fact_google_reviews, report, valid_shop_ids)
-    validate_fact_sms_surveys(fact_sms_surveys, report, valid_shop_ids)
+    print(f"Plan ({Path(spec_path).name}):")
+    compile_plan(spec, tables, report)
+    if sample_size:
+        report.run_sampled(sample_size)
+    else:
+        report.run_pending()
 
     # Summary
     print_section("VALIDATION SUMMARY")
@@ -437,18 +936,24 @@ def main(threshold: float = DEFAULT_THRESHOLD):
     print("\nBy Dimension:")
     for dim in ["COMPLETENESS", "UNIQUENESS", "VALIDITY", "CONSISTENCY"]:
         score = report.dimension_score(dim)
-        status = "✓" if score >= threshold else "✗"
-        print(f"  {status} {dim}: {score*100:.1f}%")
+        low, high = report.dimension_bounds(dim)
+        status = "✓" if low >= threshold else "✗"
+        if low < high:
+            print(f"  {status} {dim}: {score*100:.1f}% [{low*100:.1f}%, {high*100:.1f}%]")
+        else:
+            print(f"  {status} {dim}: {score*100:.1f}%")
 
     # By table
     print("\nBy Table:")
-    for table in ["dim_shops", "fact_google_reviews", "fact_sms_surveys"]:
+    for table in tables:
         score = report.table_score(table)
         status = "✓" if score >= threshold else "✗"
         print(f"  {status} {table}: {score*100:.1f}%")
 
     # Overall
     print(f"\nOverall Score: {report.overall_score*100:.1f}%")
+    if report.aborted:
+        print(f"Fail-fast: {report.aborted} ({report.skipped} checks skipped)")
 
     # Certification
     print_section("CERTIFICATION")
@@ -484,8 +989,25 @@ def main(threshold: float = DEFAULT_THRESHOLD):
     # Failed checks detail
     failed = results_df[results_df['failed'] > 0]
     if len(failed) > 0:
+        # Offending rows per check (bounded sample) for debugging
+        written = extract_failing_rows(report, tables, max_rows=max_failing_rows)
+        failed = failed.assign(failing_rows_file=[
+            written.get((t, c), '') for t, c in zip(failed['table'], failed['check'])
+        ])
         failed.to_csv(OUTPUT_PATH / 'validation_failures.csv', index=False)
         print(f"✓ validation_failures.csv: {len(failed)} failed checks")
+        print(f"✓ failing_rows/: {len(written)} side files "
+              f"(max {max_failing_rows or 'all'} rows each)")
+
+    # Cost summary: which checks dominate the gate's runtime (schema-only
+    # checks read no rows and have no throughput to compare)
+    print_section("CHECK COST")
+    scans = results_df[results_df['rows_scanned'] > 0].astype({'rows_per_s': 'int64'})
+    cost = scans.sort_values('elapsed_ms', ascending=False)
+    print(cost[['table', 'check', 'rows_scanned', 'elapsed_ms', 'rows_per_s', 'peak_mb']]
+          .to_string(index=False))
+    print(f"\nTotal check time: {results_df['elapsed_ms'].sum():.1f} ms "
+          f"(peak allocation of a single check: {results_df['peak_mb'].max():.1f} MB)")
 
     print(f"\nCompleted: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
@@ -496,6 +1018,36 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Validate clean data tables')
     parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
                         help=f'Pass threshold (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--max-failing-rows', type=int, default=DEFAULT_MAX_FAILING_ROWS,
+                        help=f'Failing rows written per check, 0 = all '
+                             f'(default: {DEFAULT_MAX_FAILING_ROWS})')
+    parser.add_argument('--fail-fast', action='store_true',
+                        help='Stop as soon as a dimension cannot reach the threshold')
+    parser.add_argument('--sample', type=int, default=None, metavar='N',
+                        help='Pre-flight gate: run per-row checks on a stratified '
+                             'sample of N rows per table')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE,
+                        help=f'Confidence level for --sample intervals '
+                             f'(default: {DEFAULT_CONFIDENCE})')
+    parser.add_argument('--spec', type=Path, default=DEFAULT_SPEC_PATH,
+                        help=f'Validation spec (default: {DEFAULT_SPEC_PATH.name})')
+    parser.add_argument('--profile', type=Path, default=None, metavar='PATH',
+                        help='Write a cProfile trace of the whole gate run to PATH')
     args = parser.parse_args()
 
-    main(threshold=args.threshold)
+    # Peak allocation per check (see PendingCheck.run)
+    tracemalloc.start()
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+
+    report = main(threshold=args.threshold, max_failing_rows=args.max_failing_rows,
+                  fail_fast=args.fail_fast, sample_size=args.sample,
+                  confidence=args.confidence, spec_path=args.spec)
+
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print(f"\n✓ Profile trace: {args.profile}")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+    sys.exit(0 if report.is_certified else 1)